@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dictgen.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после настройки Django: модуль использует модели
+from main.live_feedback import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # WebSocket (живая проверка диктанта) обслуживается отдельно от HTTP
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 import os
 from datetime import timedelta
 
@@ -50,14 +50,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.RequestIdMiddleware',  # ID запроса для логов
+    'main.middleware.RequestMetricsMiddleware',  # Метрики запросов (в начале: учитывает весь стек)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.middleware.ReplicaRoutingMiddleware',  # Чтение списков и статистики с реплик БД
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main.profiling.ProfilingMiddleware',  # Профилирование запросов по запросу администратора
 ]
 
 ROOT_URLCONF = 'dictgen.urls'
@@ -78,6 +82,123 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'dictgen.wsgi.application'
+ASGI_APPLICATION = 'dictgen.asgi.application'
+
+# Количество процессов для проверки попыток в асинхронных представлениях
+SCORING_WORKERS = config('SCORING_WORKERS', default=2, cast=int)
+
+# Выравнивание токенов при проверке: indel, levenshtein или difflib (как раньше)
+ALIGNMENT_ALGORITHM = config('ALIGNMENT_ALGORITHM', default='indel')
+# Сколько заданий хранят отсортированный рейтинг в памяти процесса (таблицы лидеров)
+LEADERBOARD_CACHE_TASKS = config('LEADERBOARD_CACHE_TASKS', default=256, cast=int)
+# Хранение ошибок попыток: rows (строка Error на ошибку) или packed (одно поле попытки)
+ERROR_STORAGE = config('ERROR_STORAGE', default='rows')
+# Почти одинаковые тексты заданий: оценка сходства Жаккара по MinHash, начиная с которой текст - дубликат
+NEAR_DUPLICATE_THRESHOLD = config('NEAR_DUPLICATE_THRESHOLD', default=0.7, cast=float)
+# Генерация с reuse: доля запрошенных терминов, которую должно покрывать готовое задание
+TERM_COVERAGE_REUSE_THRESHOLD = config('TERM_COVERAGE_REUSE_THRESHOLD', default=1.0, cast=float)
+
+# Перепроверка попыток после изменения текста задания: фоновый поток,
+# размер порции, пауза после порции (доля от времени ее обработки) и число
+# попыток, одновременно переданных в пул проверки (остальные процессы пула
+# остаются свободными для живых попыток)
+RESCORE_IN_BACKGROUND = config('RESCORE_IN_BACKGROUND', default=True, cast=bool)
+RESCORE_CHUNK_SIZE = config('RESCORE_CHUNK_SIZE', default=100, cast=int)
+RESCORE_THROTTLE = config('RESCORE_THROTTLE', default=1.0, cast=float)
+RESCORE_MAX_IN_FLIGHT = config('RESCORE_MAX_IN_FLIGHT', default=max(1, SCORING_WORKERS - 1), cast=int)
+
+# Живая проверка по WebSocket: запас окна выравнивания (токенов),
+# предельная длина текста попытки и сообщения (символов)
+LIVE_ALIGNMENT_CONTEXT = config('LIVE_ALIGNMENT_CONTEXT', default=16, cast=int)
+LIVE_MAX_TEXT_LENGTH = config('LIVE_MAX_TEXT_LENGTH', default=60000, cast=int)
+LIVE_MAX_MESSAGE_SIZE = config('LIVE_MAX_MESSAGE_SIZE', default=65536, cast=int)
+
+# Метрики Prometheus (/metrics): каталог файлов метрик процессов, интервал
+# их сброса фоновым потоком (сек.), срок, после которого не обновлявшийся файл
+# удаляется (сек., 0 - не удалять), и токен доступа. Без токена эндпоинт
+# отвечает 404, если явно не разрешен открытый доступ (METRICS_PUBLIC)
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_DIR = config('METRICS_DIR', default=str(BASE_DIR / 'metrics'))
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=1.0, cast=float)
+METRICS_FILE_TTL = config('METRICS_FILE_TTL', default=300.0, cast=float)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_PUBLIC = config('METRICS_PUBLIC', default=False, cast=bool)
+
+# Логирование: каталог, уровень, формат (text или json), запись через
+# очередь в отдельном потоке, ротация файла по размеру (байт) или по
+# времени (LOG_ROTATE_WHEN, например midnight), число архивных файлов
+LOG_DIR = config('LOG_DIR', default='logs')
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_FORMAT = config('LOG_FORMAT', default='text')
+LOG_QUEUE = config('LOG_QUEUE', default=True, cast=bool)
+LOG_MAX_BYTES = config('LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+LOG_ROTATE_WHEN = config('LOG_ROTATE_WHEN', default='')
+LOG_BACKUP_COUNT = config('LOG_BACKUP_COUNT', default=5, cast=int)
+# Выборка записей ниже WARNING для шумных логгеров: логгер=доля через запятую,
+# например main.generation_backends.prompt=0.01,main.llm_generator=0.1
+LOG_SAMPLING = config('LOG_SAMPLING', default='', cast=Csv())
+
+# Профилирование запросов: включение, заголовок для администраторов, доля
+# случайно профилируемых запросов, каталог профилей и лимиты его объема
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_HEADER = config('PROFILING_HEADER', default='X-Profile')
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILE_MAX_FILES = config('PROFILE_MAX_FILES', default=200, cast=int)
+PROFILE_MAX_MB = config('PROFILE_MAX_MB', default=200, cast=int)
+
+# Клиент BotHub API: таймауты (сек.), повторы, пул соединений и выключатель
+BOTHUB_BASE_URL = config('BOTHUB_BASE_URL', default='https://bothub.chat/api/v2/openai/v1')
+BOTHUB_CONNECT_TIMEOUT = config('BOTHUB_CONNECT_TIMEOUT', default=5.0, cast=float)
+BOTHUB_READ_TIMEOUT = config('BOTHUB_READ_TIMEOUT', default=30.0, cast=float)
+BOTHUB_MAX_RETRIES = config('BOTHUB_MAX_RETRIES', default=2, cast=int)
+BOTHUB_POOL_SIZE = config('BOTHUB_POOL_SIZE', default=20, cast=int)
+BOTHUB_BREAKER_THRESHOLD = config('BOTHUB_BREAKER_THRESHOLD', default=3, cast=int)
+BOTHUB_BREAKER_RECOVERY = config('BOTHUB_BREAKER_RECOVERY', default=30.0, cast=float)
+
+# Ожидаемый SHA-256 файла локальной модели (если пусто - берется из заголовков Hugging Face)
+LOCAL_MODEL_SHA256 = config('LOCAL_MODEL_SHA256', default='')
+
+# Останавливать генерацию, как только текст удовлетворяет требованиям
+GENERATION_EARLY_STOP = config('GENERATION_EARLY_STOP', default=True, cast=bool)
+
+# Переиспользовать KV-кэш статической части промпта локальной модели
+LOCAL_PREFIX_CACHE = config('LOCAL_PREFIX_CACHE', default=True, cast=bool)
+
+# Бэкенды генерации в порядке предпочтения: bothub, local, transformers, stub
+GENERATION_BACKENDS = config('GENERATION_BACKENDS', default='bothub,local', cast=Csv())
+# Окно статистики задержек для выбора бэкенда (число последних запросов)
+GENERATION_ROUTING_WINDOW = config('GENERATION_ROUTING_WINDOW', default=50, cast=int)
+# Через сколько секунд без первого токена запускать запасной бэкенд (0 - не хеджировать)
+GENERATION_HEDGE_AFTER = config('GENERATION_HEDGE_AFTER', default=0.0, cast=float)
+# Сколько раз пройти по всем бэкендам, прежде чем вернуть ошибку
+GENERATION_MAX_ATTEMPTS = config('GENERATION_MAX_ATTEMPTS', default=3, cast=int)
+# Пул заранее сгенерированных текстов для популярных наборов терминов:
+# выдача из пула и его фоновое пополнение (по умолчанию выключены; пополнение
+# после запроса - только в часы работы планировщика и в пределах бюджета CPU),
+# текстов на набор, число наборов, часы работы планировщика (например 1-6,
+# пусто - круглосуточно), бюджет процессорного времени на цикл и на одно
+# пополнение после запроса (сек.; ограничивает локальную генерацию, удаленную
+# ограничивает только число текстов на набор) и срок хранения текстов (дней)
+GENERATION_POOL_ENABLED = config('GENERATION_POOL_ENABLED', default=False, cast=bool)
+GENERATION_POOL_REFILL = config('GENERATION_POOL_REFILL', default=False, cast=bool)
+GENERATION_POOL_SIZE = config('GENERATION_POOL_SIZE', default=3, cast=int)
+GENERATION_POOL_SETS = config('GENERATION_POOL_SETS', default=20, cast=int)
+GENERATION_POOL_HOURS = config('GENERATION_POOL_HOURS', default='1-6')
+GENERATION_POOL_CPU_BUDGET = config('GENERATION_POOL_CPU_BUDGET', default=600.0, cast=float)
+GENERATION_POOL_MAX_AGE_DAYS = config('GENERATION_POOL_MAX_AGE_DAYS', default=30, cast=int)
+# Модель Hugging Face transformers для бэкенда transformers
+HF_MODEL_ID = config('HF_MODEL_ID', default='')
+
+# Заглушка генерации (бэкенд stub): seed, токенов в секунду (0 - без задержки),
+# задержка первого токена (сек.), доля ошибок и текстов без терминов,
+# либо фиксированная последовательность исходов (ok, error, midstream, invalid)
+STUB_SEED = config('STUB_SEED', default=0, cast=int)
+STUB_TOKEN_RATE = config('STUB_TOKEN_RATE', default=0.0, cast=float)
+STUB_FIRST_TOKEN_DELAY = config('STUB_FIRST_TOKEN_DELAY', default=0.0, cast=float)
+STUB_FAILURE_RATE = config('STUB_FAILURE_RATE', default=0.0, cast=float)
+STUB_INVALID_RATE = config('STUB_INVALID_RATE', default=0.0, cast=float)
+STUB_PATTERN = config('STUB_PATTERN', default='', cast=Csv())
 
 
 # Database
@@ -95,6 +216,16 @@ DATABASES = {
     }
 }
 
+# Реплики основной БД только для чтения: хосты через запятую (имя БД и учетные данные те же)
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='', cast=Csv())
+for index, host in enumerate(DB_REPLICA_HOSTS, start=1):
+    DATABASES[f'replica{index}'] = dict(DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+# Псевдонимы реплик, с которых читают представления с декоратором read_replica
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['main.db_routing.ReplicaRouter']
+# Сколько секунд после записи пользователь читает только из основной БД (задержка репликации)
+DB_REPLICA_PIN_SECONDS = config('DB_REPLICA_PIN_SECONDS', default=5, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -5,10 +5,19 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
-    }
+    },
+    # Вторая БД для тестов маршрутизации чтения на реплики
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
 }
+# Реплика включается в тестах маршрутизации
+DATABASE_REPLICAS = []
 
 # Disable password hashing for faster tests
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
-] 
\ No newline at end of file
+] 
+# Keep metrics in memory during tests
+METRICS_ENABLED = False
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
-from main import views
+from main import views, async_views
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -27,11 +27,21 @@ api_patterns = [
     
     # Задания
     path('tasks/', views.TaskListView.as_view(), name='task-list'),
+    path('tasks/coverage/', views.TaskCoverageView.as_view(), name='task-coverage'),
     path('tasks/<int:id>/', views.TaskDetailView.as_view(), name='task-detail'),
+    path('tasks/<int:id>/rescore/', views.TaskRescoreStatusView.as_view(), name='task-rescore-status'),
+    path('tasks/<int:id>/assign/', views.TaskAssignView.as_view(), name='task-assign'),
+    path('tasks/<int:id>/leaderboard/', views.TaskLeaderboardView.as_view(), name='task-leaderboard'),
+
+    # Группы учеников
+    path('cohorts/', views.CohortListView.as_view(), name='cohort-list'),
+    path('cohorts/<int:id>/', views.CohortDetailView.as_view(), name='cohort-detail'),
     
     # Попытки выполнения
     path('attempts/', views.AttemptListView.as_view(), name='attempt-list'),
     path('attempts/<int:id>/', views.AttemptDetailView.as_view(), name='attempt-detail'),
+    # Асинхронная отправка попытки (ASGI)
+    path('attempts/async/', async_views.AsyncAttemptSubmitView.as_view(), name='attempt-submit-async'),
 ]
 
 urlpatterns = [
@@ -40,6 +50,9 @@ urlpatterns = [
     
     # Админка
     path('admin/', admin.site.urls),
+
+    # Метрики Prometheus
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
     
     # API endpoints
     path('api/', include([
@@ -49,5 +62,9 @@ urlpatterns = [
         path('', include(router.urls)),
         # Генерация текста
         path('generate-text/', views.GenerateTextView.as_view(), name='generate-text'),
+        # Асинхронная генерация текста (ASGI)
+        path('generate-text/async/', async_views.AsyncGenerateTextView.as_view(), name='generate-text-async'),
+        # Состояние генератора для мониторинга
+        path('generate-text/status/', views.GenerationStatusView.as_view(), name='generate-text-status'),
     ])),
 ]
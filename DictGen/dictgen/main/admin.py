@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Task, Term, Attempt, Error, Metric, TaskTerm
+from .models import User, Task, Term, Attempt, Error, Metric, TaskTerm, RescoreJob, Cohort, TaskAssignment
 
 # Регистрация моделей
 admin.site.register(User)
@@ -8,4 +8,7 @@ admin.site.register(Term)
 admin.site.register(Attempt)
 admin.site.register(Error)
 admin.site.register(Metric)
-admin.site.register(TaskTerm)
\ No newline at end of file
+admin.site.register(TaskTerm)
+admin.site.register(RescoreJob)
+admin.site.register(Cohort)
+admin.site.register(TaskAssignment)
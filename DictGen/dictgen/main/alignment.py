@@ -0,0 +1,74 @@
+"""
+Выравнивание последовательностей токенов задания и попытки.
+
+Возвращает опкоды в формате difflib.SequenceMatcher.get_opcodes():
+(tag, i1, i2, j1, j2), где tag - equal, replace, delete или insert.
+
+Алгоритмы:
+indel - наибольшая общая подпоследовательность (RapidFuzz, C++): совпадает
+максимум слов, вставки и удаления рядом объединяются в замены;
+levenshtein - минимальное число правок (RapidFuzz), предпочитает замены
+слово в слово, даже если соседнее слово при этом перестает совпадать;
+difflib - SequenceMatcher, как раньше (режим совместимости).
+
+Для indel и levenshtein соседние неравные опкоды объединяются в один блок,
+как это делает difflib: замена нескольких слов подряд дает один replace.
+"""
+import difflib
+from typing import List, Sequence, Tuple
+from rapidfuzz.distance import Indel, Levenshtein as TokenLevenshtein
+
+Opcode = Tuple[str, int, int, int, int]
+
+ALGORITHMS = ('indel', 'levenshtein', 'difflib')
+DEFAULT_ALGORITHM = 'indel'
+
+
+def _group(opcodes) -> List[Opcode]:
+    """Объединяет подряд идущие неравные опкоды в блоки replace/delete/insert"""
+    result = []
+    block = None  # [i1, i2, j1, j2] текущего неравного блока
+
+    def flush():
+        i1, i2, j1, j2 = block
+        if i1 < i2 and j1 < j2:
+            tag = 'replace'
+        elif i1 < i2:
+            tag = 'delete'
+        else:
+            tag = 'insert'
+        result.append((tag, i1, i2, j1, j2))
+
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            if block:
+                flush()
+                block = None
+            if i1 >= i2:
+                continue
+            if result and result[-1][0] == 'equal' and result[-1][2] == i1:
+                # Смежные совпадения (после склейки выравниваний) объединяются
+                result[-1] = ('equal', result[-1][1], i2, result[-1][3], j2)
+            else:
+                result.append(('equal', i1, i2, j1, j2))
+        elif block:
+            block[1], block[3] = i2, j2
+        else:
+            block = [i1, i2, j1, j2]
+    if block:
+        flush()
+    return result
+
+
+def align(a: Sequence[str], b: Sequence[str], algorithm: str = None) -> List[Opcode]:
+    """Опкоды превращения последовательности a в b"""
+    algorithm = algorithm or DEFAULT_ALGORITHM
+    if algorithm == 'difflib':
+        return difflib.SequenceMatcher(None, a, b).get_opcodes()
+    if algorithm == 'levenshtein':
+        opcodes = TokenLevenshtein.opcodes(a, b)
+    elif algorithm == 'indel':
+        opcodes = Indel.opcodes(a, b)
+    else:
+        raise ValueError(f"Неизвестный алгоритм выравнивания: {algorithm}")
+    return _group((op.tag, op.src_start, op.src_end, op.dest_start, op.dest_end) for op in opcodes)
@@ -0,0 +1,179 @@
+"""
+Асинхронные (ASGI) версии тяжелых представлений.
+
+Генерация текста ожидает ответ LLM без занятия потока, а CPU-нагруженная
+проверка попытки выполняется в пуле процессов. Поэтому под ASGI-сервером
+один процесс обслуживает сотни одновременных генераций и продолжает
+быстро принимать попытки учеников.
+"""
+import asyncio
+import json
+import logging
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .models import Term, Task, Attempt, Metric
+from .error_storage import store_errors
+from .leaderboard import refresh_entry
+from .serializers import AttemptSerializer
+from .scoring import grade_texts
+from .utils import get_scoring_executor
+from .telemetry import stage
+from .llm_generator import get_generator
+from .term_coverage import best_covering_task, reused_task_response
+from .near_duplicates import find_near_duplicates
+from . import generation_pool
+
+logger = logging.getLogger(__name__)
+
+
+@transaction.atomic
+def save_grading(attempt, errors, metric_values):
+    """Сохраняет ошибки и метрики попытки одной транзакцией"""
+    with stage('scoring.db_write'):
+        store_errors({attempt.id: errors}, replace=False)
+        Metric.objects.update_or_create(attempt=attempt, defaults=metric_values)
+    refresh_entry(attempt.task_id, attempt.student_id)
+
+
+class AsyncAPIView(View):
+    """Базовое асинхронное представление с JWT-аутентификацией, как у DRF"""
+    authentication = JWTAuthentication()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Как и APIView, API работает по JWT и не использует CSRF
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def authenticate(self, request):
+        """Возвращает пользователя или выбрасывает исключение аутентификации DRF"""
+        result = await sync_to_async(self.authentication.authenticate)(request)
+        if result is None:
+            raise NotAuthenticated()
+        return result[0]
+
+    def parse_json(self, request):
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+
+    def respond(self, data, status=200):
+        return JsonResponse(data, status=status, safe=False, json_dumps_params={'ensure_ascii': False})
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await self.authenticate(request)
+        except (AuthenticationFailed, NotAuthenticated) as e:
+            return self.respond({'detail': str(e.detail)}, status=e.status_code)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncGenerateTextView(AsyncAPIView):
+    async def post(self, request):
+        data = self.parse_json(request)
+        if data is None:
+            return self.respond({"error": "Некорректный JSON"}, status=400)
+
+        # Получаем термины из запроса
+        term_ids = data.get('terms', [])
+        if not term_ids:
+            return self.respond({"error": "Не указаны термины для генерации"}, status=400)
+
+        terms = [term async for term in Term.objects.filter(id__in=term_ids)]
+        if not terms:
+            return self.respond({"error": "Термины не найдены"}, status=404)
+
+        found_ids = [term.id for term in terms]
+
+        # Готовое задание покрывает термины - текст не генерируется
+        if data.get('reuse'):
+            try:
+                threshold = float(data.get('reuse_threshold', settings.TERM_COVERAGE_REUSE_THRESHOLD))
+            except (TypeError, ValueError):
+                return self.respond({"error": "Некорректный reuse_threshold"}, status=400)
+            task = await sync_to_async(best_covering_task)(
+                found_ids, Task.visible_to(request.user), threshold
+            )
+            if task is not None:
+                logger.info(f"Генерация заменена готовым заданием {task.id}: покрыто {task.matched} из {len(terms)} терминов")
+                await sync_to_async(generation_pool.log_request)(found_ids, request.user, 'reused')
+                return self.respond(reused_task_response(task, len(terms)))
+
+        # Готовый текст из пула выдается сразу, пул пополняется в фоне
+        start_time = time.time()
+        if settings.GENERATION_POOL_ENABLED:
+            pooled_text = await sync_to_async(generation_pool.take)(found_ids)
+            if pooled_text is not None:
+                await sync_to_async(generation_pool.log_request)(found_ids, request.user, 'pool')
+                await sync_to_async(generation_pool.schedule_refill)(found_ids)
+                return self.respond({
+                    "text": pooled_text,
+                    "execution_time": time.time() - start_time,
+                    "from_pool": True,
+                    "near_duplicates": await sync_to_async(find_near_duplicates)(
+                        pooled_text, Task.visible_to(request.user)
+                    ),
+                })
+
+        logger.info(f"Начало асинхронной генерации текста. Термины: {[term.content for term in terms]}")
+
+        try:
+            response_text = await get_generator().agenerate(terms)
+        except Exception as e:
+            logger.error(f"Ошибка при генерации текста: {str(e)}")
+            return self.respond({"error": f"Ошибка генерации текста: {str(e)}"}, status=500)
+
+        execution_time = time.time() - start_time
+        logger.info(f"Генерация текста завершена. Время выполнения: {execution_time:.2f} сек.")
+        await sync_to_async(generation_pool.log_request)(found_ids, request.user, 'generated')
+
+        return self.respond({
+            "text": response_text,
+            "execution_time": execution_time,
+            # Похожие задания, к которым у пользователя есть доступ
+            "near_duplicates": await sync_to_async(find_near_duplicates)(
+                response_text, Task.visible_to(request.user)
+            ),
+        })
+
+
+class AsyncAttemptSubmitView(AsyncAPIView):
+    async def post(self, request):
+        data = self.parse_json(request)
+        if data is None:
+            return self.respond({"error": "Некорректный JSON"}, status=400)
+
+        serializer = AttemptSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return self.respond(serializer.errors, status=400)
+
+        # Проверяем, что студент создает попытку только для своего задания
+        task = serializer.validated_data['task']
+        student = None
+        if request.user.role == 'student':
+            if not await sync_to_async(task.is_assigned_to)(request.user):
+                return self.respond(
+                    {'error': 'Вы можете создавать попытки только для своих заданий'},
+                    status=403
+                )
+            student = request.user
+
+        attempt = await Attempt.objects.acreate(**serializer.validated_data, student=student)
+
+        # Проверка попытки нагружает CPU - выполняем ее вне цикла событий
+        loop = asyncio.get_running_loop()
+        errors, metric_values = await loop.run_in_executor(
+            get_scoring_executor(), grade_texts, task.content, attempt.content, settings.ALIGNMENT_ALGORITHM
+        )
+        await sync_to_async(save_grading)(attempt, errors, metric_values)
+
+        response_data = await sync_to_async(lambda: AttemptSerializer(attempt).data)()
+        return self.respond(response_data, status=201)
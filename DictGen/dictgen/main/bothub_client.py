@@ -0,0 +1,248 @@
+"""
+Клиент BotHub API (OpenAI-совместимый) с таймаутами, пулом соединений,
+повторами с джиттером и автоматическим выключателем (circuit breaker).
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, List
+import httpx
+import openai
+from openai import OpenAI, AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых имеет смысл повторить запрос
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # включает APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+    httpx.TransportError,  # обрыв или таймаут уже во время чтения потока
+)
+
+
+class CircuitOpenError(Exception):
+    """Выключатель разомкнут: удаленный сервис считается недоступным"""
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель.
+    closed - запросы идут как обычно;
+    open - после failure_threshold ошибок подряд запросы сразу отклоняются;
+    half_open - через recovery_timeout секунд пропускается один пробный запрос.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 3, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._total_failures = 0
+        self._total_successes = 0
+        self._total_rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Можно ли сейчас обращаться к сервису"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._total_rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("BotHub снова доступен, выключатель замкнут")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+            self._total_successes += 1
+
+    def release(self) -> None:
+        """Запрос отменен клиентом: результат пробы неизвестен"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._total_failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"BotHub недоступен ({self._failures} ошибок подряд), выключатель разомкнут")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        """Состояние для мониторинга"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+            if state == self.OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'retry_in': retry_in,
+                'total_failures': self._total_failures,
+                'total_successes': self._total_successes,
+                'total_rejected': self._total_rejected,
+            }
+
+
+class BotHubClient:
+    """
+    Потоковые запросы chat.completions с общим пулом keep-alive соединений.
+    Повтор выполняется только до получения первого токена, чтобы не дублировать текст.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 5.0,
+        pool_size: int = 20,
+        breaker: CircuitBreaker = None,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=60.0,
+        )
+        # Повторы делаем сами, поэтому встроенные повторы openai отключены
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            timeout=timeout,
+            http_client=httpx.Client(timeout=timeout, limits=limits),
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            timeout=timeout,
+            http_client=httpx.AsyncClient(timeout=timeout, limits=limits),
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        """Экспоненциальная задержка с полным джиттером"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _check_breaker(self) -> None:
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("BotHub временно отключен выключателем")
+
+    def _record_api_error(self, error: openai.APIError) -> None:
+        """Ошибка без повтора: ответы 4xx - ошибка запроса, сервис при этом доступен"""
+        if isinstance(error, openai.APIStatusError) and error.status_code < 500:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def stream_chat(self, messages: List[Dict[str, str]], **params) -> Iterator[str]:
+        """
+        Потоковая генерация: возвращает фрагменты текста.
+        Выключатель проверяется один раз на запрос, ошибка учитывается после всех повторов.
+        """
+        self._check_breaker()
+        attempt = 0
+        while True:
+            received = False
+            try:
+                stream = self.client.chat.completions.create(messages=messages, stream=True, **params)
+                with stream:
+                    for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content is not None:
+                            received = True
+                            yield chunk.choices[0].delta.content
+                self.breaker.record_success()
+                return
+            except GeneratorExit:
+                # Потребитель прекратил чтение потока
+                if received:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.release()
+                raise
+            except RETRYABLE_ERRORS as e:
+                if received or attempt >= self.max_retries:
+                    self.breaker.record_failure()
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                logger.warning(f"Ошибка BotHub API ({type(e).__name__}), повтор {attempt}/{self.max_retries} через {delay:.2f} сек.")
+                time.sleep(delay)
+            except openai.APIError as e:
+                # Ошибки запроса (4xx) повторять бесполезно
+                self._record_api_error(e)
+                raise
+
+    async def astream_chat(self, messages: List[Dict[str, str]], **params) -> AsyncIterator[str]:
+        """Асинхронная версия stream_chat()"""
+        self._check_breaker()
+        attempt = 0
+        while True:
+            received = False
+            try:
+                stream = await self.async_client.chat.completions.create(messages=messages, stream=True, **params)
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content is not None:
+                            received = True
+                            yield chunk.choices[0].delta.content
+                self.breaker.record_success()
+                return
+            except (GeneratorExit, asyncio.CancelledError):
+                if received:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.release()
+                raise
+            except RETRYABLE_ERRORS as e:
+                if received or attempt >= self.max_retries:
+                    self.breaker.record_failure()
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                logger.warning(f"Ошибка BotHub API ({type(e).__name__}), повтор {attempt}/{self.max_retries} через {delay:.2f} сек.")
+                await asyncio.sleep(delay)
+            except openai.APIError as e:
+                self._record_api_error(e)
+                raise
@@ -45,4 +45,20 @@ ERROR_TYPES_CHOICES = [
     ('punctuation', 'Пунктуационная ошибка'),
     ('missing', 'Пропущенное слово'),
     ('extra', 'Лишнее слово'),
-]
\ No newline at end of file
+]
+
+# Статусы задания на перепроверку попыток
+RESCORE_STATUS_CHOICES = [
+    ('queued', 'В очереди'),
+    ('running', 'Выполняется'),
+    ('completed', 'Завершено'),
+    ('failed', 'Ошибка'),
+    ('superseded', 'Заменено новым'),
+]
+
+# Откуда взят текст в ответе на запрос генерации
+GENERATION_SOURCE_CHOICES = [
+    ('generated', 'Сгенерирован'),
+    ('pool', 'Из пула готовых текстов'),
+    ('reused', 'Готовое задание'),
+]
@@ -0,0 +1,186 @@
+"""
+Синтетический корпус диктантов для измерения производительности проверки.
+
+Из реальных текстов заданий собирается текст нужного объема, а в копию
+для попытки вносятся ошибки заданных типов с заданной частотой (доля слов).
+Генерация детерминирована seed, поэтому корпус воспроизводим между запусками.
+"""
+import random
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+from .scoring import PUNCTUATION, morph, tokenize
+
+# Тексты по умолчанию (если заданий в БД нет)
+SAMPLE_TEXTS = [
+    'Квантовая механика описывает поведение материи на атомном и субатомном уровнях. Основные принципы '
+    'включают принцип неопределенности Гейзенберга и принцип дополнительности Бора. Эти концепции '
+    'противоречат классической физике.',
+    'Осенний лес был полон красок. Золотые листья кружились в воздухе, создавая причудливые узоры. '
+    'Вдалеке слышался шум ручья, а птицы пели свои прощальные песни.',
+    'В библиотеке можно найти множество интересных книг. Чтение развивает воображение и расширяет '
+    'кругозор. Каждый день появляются новые произведения.',
+    'Энтропия характеризует меру беспорядка термодинамической системы. При теплообмене теплота '
+    'самопроизвольно переходит от горячего тела к холодному, и энтропия изолированной системы возрастает. '
+    'Поэтому вечный двигатель второго рода невозможен.',
+    'Фотосинтез протекает в хлоропластах растительных клеток. Под действием света углекислый газ и вода '
+    'превращаются в глюкозу, а в атмосферу выделяется кислород. Без этого процесса жизнь на Земле была бы '
+    'невозможна.',
+]
+
+# Объемы текстов в словах: от абзаца до десяти страниц (~300 слов на страницу)
+SIZES = {
+    'paragraph': 80,
+    'page': 300,
+    'five_pages': 1500,
+    'ten_pages': 3000,
+}
+
+ERROR_TYPES = ('spelling', 'grammar', 'punctuation', 'missing', 'extra')
+
+# Частоты ошибок по умолчанию (доля слов текста)
+DEFAULT_RATES = {
+    'spelling': 0.03,
+    'grammar': 0.02,
+    'punctuation': 0.02,
+    'missing': 0.01,
+    'extra': 0.01,
+}
+
+WORD_RE = re.compile(r'\w+')
+SENTENCE_RE = re.compile(r'[^.!?…]+[.!?…]+')
+EXTRA_WORDS = ['очень', 'также', 'именно', 'всегда', 'просто', 'как', 'бы']
+VOWELS = 'аеиоуыэюя'
+
+
+def build_text(base_texts: List[str], words: int, rng: random.Random) -> str:
+    """Собирает текст не короче words слов из случайных предложений базовых текстов"""
+    sentences = [s.strip() for text in base_texts for s in SENTENCE_RE.findall(text)]
+    if not sentences:
+        raise ValueError("В базовых текстах нет предложений")
+    result, count = [], 0
+    while count < words:
+        sentence = rng.choice(sentences)
+        result.append(sentence)
+        count += len(WORD_RE.findall(sentence))
+    return ' '.join(result)
+
+
+def _misspell(word: str, rng: random.Random) -> str:
+    """Орфографическая ошибка: замена гласной или перестановка соседних букв"""
+    positions = [i for i, c in enumerate(word) if c.lower() in VOWELS]
+    if positions:
+        i = rng.choice(positions)
+        replacement = rng.choice([v for v in VOWELS if v != word[i].lower()])
+        return word[:i] + replacement + word[i + 1:]
+    if len(word) > 2:
+        i = rng.randrange(len(word) - 1)
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word + word[-1]
+
+
+def _inflect(word: str, rng: random.Random) -> Optional[str]:
+    """Грамматическая ошибка: другая форма того же слова"""
+    forms = {
+        f.word for f in morph.parse(word.lower())[0].lexeme
+        if f.word != word.lower() and f.word.isalpha()
+    }
+    if not forms:
+        return None
+    form = rng.choice(sorted(forms))
+    return form.capitalize() if word[0].isupper() else form
+
+
+def inject_errors(text: str, rates: Dict[str, float], rng: random.Random) -> Tuple[str, Dict[str, int]]:
+    """
+    Вносит в текст ошибки с частотами rates (доля слов).
+    Возвращает текст попытки и число внесенных ошибок каждого типа.
+    """
+    tokens = tokenize(text)
+    injected = {t: 0 for t in ERROR_TYPES}
+    words = [i for i, t in enumerate(tokens) if t[0] not in PUNCTUATION]
+
+    # Изменения по индексам токенов: новое значение или None (удаление)
+    changes = {}
+    inserts = {}
+
+    def pick():
+        free = [i for i in words if i not in changes]
+        return rng.choice(free) if free else None
+
+    for error_type in ERROR_TYPES:
+        for _ in range(round(len(words) * rates.get(error_type, 0))):
+            if error_type == 'punctuation':
+                # Пропущенная или лишняя запятая
+                commas = [i for i, t in enumerate(tokens) if t == ',' and i not in changes]
+                if commas and rng.random() < 0.5:
+                    changes[rng.choice(commas)] = None
+                else:
+                    i = pick()
+                    if i is None:
+                        break
+                    inserts.setdefault(i, []).append(',')
+                injected[error_type] += 1
+                continue
+
+            i = pick()
+            if i is None:
+                break
+            if error_type == 'spelling':
+                changes[i] = _misspell(tokens[i], rng)
+            elif error_type == 'grammar':
+                form = _inflect(tokens[i], rng)
+                if form is None:
+                    continue
+                changes[i] = form
+            elif error_type == 'missing':
+                changes[i] = None
+            elif error_type == 'extra':
+                inserts.setdefault(i, []).append(rng.choice(EXTRA_WORDS))
+            injected[error_type] += 1
+
+    result = []
+    for i, token in enumerate(tokens):
+        token = changes.get(i, token)
+        if token is not None:
+            result.append(token)
+        result.extend(inserts.get(i, []))
+    return _join_tokens(result), injected
+
+
+def _join_tokens(tokens: Iterable[str]) -> str:
+    """Собирает текст из токенов: пробел перед словами, знаки - вплотную"""
+    text = ''
+    for token in tokens:
+        if text and token[0] not in PUNCTUATION:
+            text += ' '
+        text += token
+    return text
+
+
+def make_corpus(
+    base_texts: Optional[List[str]] = None,
+    sizes: Optional[Iterable[str]] = None,
+    samples_per_size: int = 5,
+    rates: Optional[Dict[str, float]] = None,
+    seed: int = 0,
+) -> List[Dict]:
+    """
+    Корпус пар (задание, попытка). Каждый элемент - словарь с полями
+    size, words, task_text, attempt_text и injected (число ошибок по типам).
+    """
+    base_texts = base_texts or SAMPLE_TEXTS
+    rates = DEFAULT_RATES if rates is None else rates
+    rng = random.Random(seed)
+    corpus = []
+    for size in sizes or SIZES:
+        for _ in range(samples_per_size):
+            task_text = build_text(base_texts, SIZES[size], rng)
+            attempt_text, injected = inject_errors(task_text, rates, rng)
+            corpus.append({
+                'size': size,
+                'words': len(WORD_RE.findall(task_text)),
+                'task_text': task_text,
+                'attempt_text': attempt_text,
+                'injected': injected,
+            })
+    return corpus
@@ -0,0 +1,115 @@
+"""
+Чтение с реплик БД.
+
+Обработчики GET, отмеченные декоратором read_replica (списки, статистика),
+читают с одной из реплик DATABASE_REPLICAS; все записи и остальные чтения
+идут в основную БД (default). Выбор делает ReplicaRouter по состоянию
+текущего запроса, которое ставит ReplicaRoutingMiddleware.
+
+Чтение своих записей: после запроса, изменившего данные, пользователь
+DB_REPLICA_PIN_SECONDS секунд читает только из основной БД (задержка
+репликации). Отметка передается клиенту в подписанной cookie с ID
+пользователя и сроком действия, поэтому ее видит любой процесс сервера
+без общего кэша.
+"""
+import contextvars
+import random
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+# Состояние текущего запроса: {'replica': псевдоним или None, 'wrote': bool}
+routing_state = contextvars.ContextVar('routing_state', default=None)
+
+# Cookie закрепления за основной БД и соль ее подписи
+PIN_COOKIE = 'db_pin'
+PIN_SALT = 'main.db_routing.pin'
+
+
+def read_replica(handler):
+    """Обработчик только читает и допускает отставание реплики на несколько секунд"""
+    handler.read_replica = True
+    return handler
+
+
+def _handler(view_func, method: str):
+    """Метод представления, который обработает запрос"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return None
+    method = 'get' if method == 'head' else method
+    actions = getattr(view_func, 'actions', None)  # ViewSet: метод HTTP -> действие
+    name = actions.get(method) if actions else method
+    return getattr(cls, name, None) if name else None
+
+
+def client_key(request):
+    """
+    ID пользователя запроса без обращения к БД: из JWT или сессии
+    (DRF проверяет JWT позже, в представлении)
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is not None:
+        try:
+            return str(authentication.get_validated_token(raw_token)[api_settings.USER_ID_CLAIM])
+        except Exception:
+            return None
+    session = getattr(request, 'session', None)
+    return session.get('_auth_user_id') if session is not None else None
+
+
+def is_pinned(request, key) -> bool:
+    """Пользователь недавно писал: подписанная cookie с его ID еще не истекла"""
+    if key is None or settings.DB_REPLICA_PIN_SECONDS <= 0:
+        return False
+    value = request.get_signed_cookie(
+        PIN_COOKIE, default=None, salt=PIN_SALT, max_age=settings.DB_REPLICA_PIN_SECONDS
+    )
+    return value == key
+
+
+def pin(response, key) -> None:
+    if key is not None and settings.DB_REPLICA_PIN_SECONDS > 0:
+        response.set_signed_cookie(
+            PIN_COOKIE, key, salt=PIN_SALT, max_age=settings.DB_REPLICA_PIN_SECONDS,
+            httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+        )
+
+
+def choose_replica(request, view_func):
+    """Реплика для запроса или None, если читать нужно из основной БД"""
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas or request.method not in ('GET', 'HEAD'):
+        return None
+    handler = _handler(view_func, request.method.lower())
+    if not getattr(handler, 'read_replica', False):
+        return None
+    if is_pinned(request, client_key(request)):
+        return None
+    return random.choice(replicas)
+
+
+class ReplicaRouter:
+    """Чтения отмеченных обработчиков - на реплику, все записи - в основную БД"""
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is None or state['wrote']:
+            return 'default'
+        return state['replica'] or 'default'
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            # Дальше в этом запросе читаем то, что только что записали
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,117 @@
+"""
+Хранение ошибок попыток.
+
+Режим ERROR_STORAGE='rows' - строка Error на каждую ошибку. Режим 'packed' -
+все ошибки попытки одним двоичным полем Attempt.packed_errors: массивы типов,
+начал, концов и индексов верного варианта плюс таблица строк, в которой
+повторяющиеся варианты хранятся один раз. Число ошибок по типам в обоих
+режимах денормализовано в Metric.
+
+Код читает и пишет ошибки только через load_errors и store_errors; обе
+функции возвращают объекты Error (в режиме packed - не сохраненные в БД),
+поэтому вызывающему коду режим хранения не важен.
+"""
+import struct
+from typing import Dict, Iterable, List
+from django.conf import settings
+from .constants import ERROR_TYPES_CHOICES
+from .models import Attempt, Error
+
+# Формат упакованных ошибок (первый байт)
+PACK_VERSION = 1
+ERROR_TYPES = [value for value, _ in ERROR_TYPES_CHOICES]
+_TYPE_CODES = {value: code for code, value in enumerate(ERROR_TYPES)}
+
+_HEADER = struct.Struct('<BII')  # версия, число ошибок, число строк
+
+
+def pack_errors(errors: Iterable[Dict]) -> bytes:
+    """Упаковывает ошибки (словари полей Error) в байты"""
+    types, starts, ends, variants = [], [], [], []
+    strings = {}
+    for error in errors:
+        types.append(_TYPE_CODES[error['error_type']])
+        starts.append(error['position_start'])
+        ends.append(error['position_end'])
+        variants.append(strings.setdefault(error['true_variant'], len(strings)))
+    encoded = [s.encode('utf-8') for s in strings]
+    count = len(types)
+    return b''.join([
+        _HEADER.pack(PACK_VERSION, count, len(encoded)),
+        bytes(types),
+        struct.pack(f'<{count}I', *starts),
+        struct.pack(f'<{count}I', *ends),
+        struct.pack(f'<{count}I', *variants),
+        struct.pack(f'<{len(encoded)}I', *map(len, encoded)),
+        *encoded,
+    ])
+
+
+def unpack_errors(data: bytes) -> List[Dict]:
+    """Словари полей Error из упакованных байтов"""
+    data = bytes(data)  # Postgres возвращает memoryview
+    version, count, string_count = _HEADER.unpack_from(data)
+    if version != PACK_VERSION:
+        raise ValueError(f"Неизвестная версия упакованных ошибок: {version}")
+    offset = _HEADER.size
+    types = data[offset:offset + count]
+    offset += count
+    starts = struct.unpack_from(f'<{count}I', data, offset)
+    offset += 4 * count
+    ends = struct.unpack_from(f'<{count}I', data, offset)
+    offset += 4 * count
+    variants = struct.unpack_from(f'<{count}I', data, offset)
+    offset += 4 * count
+    lengths = struct.unpack_from(f'<{string_count}I', data, offset)
+    offset += 4 * string_count
+    strings = []
+    for length in lengths:
+        strings.append(data[offset:offset + length].decode('utf-8'))
+        offset += length
+    return [
+        {
+            'error_type': ERROR_TYPES[types[i]],
+            'position_start': starts[i],
+            'position_end': ends[i],
+            'true_variant': strings[variants[i]],
+        }
+        for i in range(count)
+    ]
+
+
+def load_errors(attempt) -> List[Error]:
+    """Ошибки попытки в любом режиме хранения, по порядку позиций"""
+    if attempt.packed_errors is not None:
+        return [Error(attempt=attempt, **error) for error in unpack_errors(attempt.packed_errors)]
+    return list(Error.objects.filter(attempt=attempt).order_by('position_start', 'id'))
+
+
+def store_errors(errors_by_attempt: Dict[int, List[Dict]], replace: bool = True) -> List[Error]:
+    """
+    Сохраняет ошибки попыток {ID попытки: [словари полей Error]} в режиме
+    ERROR_STORAGE. replace - заменить прежние ошибки (не нужно для новых попыток).
+    Вызывается внутри транзакции, если нужна атомарность с метриками.
+    """
+    ids = list(errors_by_attempt)
+    if settings.ERROR_STORAGE == 'packed':
+        Attempt.objects.bulk_update(
+            [Attempt(id=attempt_id, packed_errors=pack_errors(errors)) for attempt_id, errors in errors_by_attempt.items()],
+            ['packed_errors'],
+        )
+        if replace:
+            # Строки, оставшиеся от режима rows
+            Error.objects.filter(attempt_id__in=ids).delete()
+        return [
+            Error(attempt_id=attempt_id, **error)
+            for attempt_id, errors in errors_by_attempt.items()
+            for error in errors
+        ]
+
+    if replace:
+        Error.objects.filter(attempt_id__in=ids).delete()
+        Attempt.objects.filter(id__in=ids, packed_errors__isnull=False).update(packed_errors=None)
+    return Error.objects.bulk_create([
+        Error(attempt_id=attempt_id, **error)
+        for attempt_id, errors in errors_by_attempt.items()
+        for error in errors
+    ])
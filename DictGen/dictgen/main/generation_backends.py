@@ -0,0 +1,468 @@
+"""
+Бэкенды генерации текста.
+
+Бэкенд отдает текст потоком фрагментов (stream) и прекращает генерацию,
+как только выставлено событие отмены или генератор закрыт. Новые бэкенды
+регистрируются декоратором register_backend и включаются настройкой
+GENERATION_BACKENDS (имена через запятую, в порядке предпочтения).
+"""
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterable, Iterator, List
+from ctransformers import AutoModelForCausalLM
+from django.conf import settings
+from .models import Term
+from .bothub_client import BotHubClient, CircuitBreaker, CircuitOpenError
+from .model_download import check_model_file, download_model
+from .prefix_cache import PromptPrefixCache
+from .prompts import STOP_SEQUENCES, build_messages, create_prompt, prompt_prefix, prompt_suffix
+from . import telemetry
+
+logger = logging.getLogger(__name__)
+# Полные промпты - отдельный логгер, чтобы их можно было прореживать (LOG_SAMPLING)
+prompt_logger = logging.getLogger(f'{__name__}.prompt')
+
+# Параметры сэмплирования, общие для локальных моделей
+SAMPLING = dict(
+    temperature=0.8,
+    top_k=40,
+    top_p=0.9,
+    repetition_penalty=1.15
+)
+MAX_NEW_TOKENS = 512
+
+
+@contextmanager
+def queued(lock: threading.Lock, backend: str):
+    """Захват блокировки модели с учетом времени ожидания в очереди"""
+    start = time.perf_counter()
+    with lock:
+        telemetry.observe('generation_queue_wait_seconds', time.perf_counter() - start, backend=backend)
+        yield
+
+
+class GenerationError(RuntimeError):
+    """Ни один бэкенд не сгенерировал текст, прошедший проверку"""
+
+
+class BackendUnavailableError(Exception):
+    """Бэкенд временно недоступен (например, разомкнут выключатель)"""
+
+
+class GenerationBackend:
+    """Базовый класс бэкенда генерации"""
+    name = None
+    # Бэкенд умеет отдавать поток без занятия потока ОС (astream)
+    supports_async = False
+
+    @property
+    def configured(self) -> bool:
+        """Бэкенд настроен и в принципе может работать"""
+        return True
+
+    def available(self) -> bool:
+        """Бэкенд готов принять запрос прямо сейчас"""
+        return self.configured
+
+    def load(self) -> None:
+        """Предварительная загрузка (модели, соединения)"""
+
+    def stream(self, terms: List[Term], cancel: threading.Event) -> Iterator[str]:
+        raise NotImplementedError
+
+    async def astream(self, terms: List[Term]) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    def status(self) -> Dict:
+        return {'configured': self.configured, 'available': self.available()}
+
+
+# Реестр бэкендов: имя -> класс
+BACKENDS: Dict[str, type] = {}
+
+
+def register_backend(cls):
+    """Декоратор регистрации бэкенда по его имени"""
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def create_backends(names: Iterable[str]) -> List[GenerationBackend]:
+    """Создает бэкенды по именам, пропуская ненастроенные"""
+    backends = []
+    for name in names:
+        name = name.strip()
+        if not name:
+            continue
+        if name not in BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд генерации: {name}")
+        backend = BACKENDS[name]()
+        if not backend.configured:
+            logger.warning(f"Бэкенд генерации {name} не настроен и будет пропущен")
+            continue
+        backends.append(backend)
+    return backends
+
+
+@register_backend
+class OpenAICompatibleBackend(GenerationBackend):
+    """Удаленный OpenAI-совместимый API (BotHub)"""
+    name = 'bothub'
+    supports_async = True
+
+    def __init__(self):
+        self.api_key = os.getenv('BOTHUB_API_KEY')
+        self.model = "gpt-4o-mini"
+        self.client = None
+        if self.api_key:
+            # Таймауты, пул соединений, повторы и выключатель
+            self.client = BotHubClient(
+                api_key=self.api_key,
+                base_url=settings.BOTHUB_BASE_URL,
+                connect_timeout=settings.BOTHUB_CONNECT_TIMEOUT,
+                read_timeout=settings.BOTHUB_READ_TIMEOUT,
+                max_retries=settings.BOTHUB_MAX_RETRIES,
+                pool_size=settings.BOTHUB_POOL_SIZE,
+                breaker=CircuitBreaker(
+                    failure_threshold=settings.BOTHUB_BREAKER_THRESHOLD,
+                    recovery_timeout=settings.BOTHUB_BREAKER_RECOVERY,
+                ),
+            )
+
+    @property
+    def configured(self) -> bool:
+        return self.client is not None
+
+    def available(self) -> bool:
+        return self.configured and self.client.breaker.state != CircuitBreaker.OPEN
+
+    def _request(self, terms: List[Term]) -> Dict:
+        return dict(
+            model=self.model,
+            temperature=0.8,
+            max_tokens=MAX_NEW_TOKENS,
+            top_p=0.9
+        )
+
+    def stream(self, terms: List[Term], cancel: threading.Event) -> Iterator[str]:
+        chunks = self.client.stream_chat(build_messages(terms), **self._request(terms))
+        try:
+            for chunk in chunks:
+                if cancel.is_set():
+                    break
+                yield chunk
+        except CircuitOpenError as e:
+            raise BackendUnavailableError(str(e)) from e
+        finally:
+            # Закрытие потока прекращает HTTP-запрос
+            chunks.close()
+
+    async def astream(self, terms: List[Term]) -> AsyncIterator[str]:
+        chunks = self.client.astream_chat(build_messages(terms), **self._request(terms))
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except CircuitOpenError as e:
+            raise BackendUnavailableError(str(e)) from e
+        finally:
+            await chunks.aclose()
+
+    def status(self) -> Dict:
+        status = super().status()
+        status['breaker'] = self.client.breaker.snapshot() if self.client else None
+        return status
+
+
+@register_backend
+class CTransformersBackend(GenerationBackend):
+    """Локальная GGUF-модель через ctransformers"""
+    name = 'local'
+
+    def __init__(self):
+        self.model = None
+        self.repo_id = "TheBloke/Llama-2-7B-Chat-GGUF"
+        self.model_file = "llama-2-7b-chat.Q4_K_M.gguf"
+        self.model_url = "https://huggingface.co/TheBloke/Llama-2-7B-Chat-GGUF/resolve/main/llama-2-7b-chat.Q4_K_M.gguf"
+        self.cache_dir = "S:/diplom_model/cache"
+        # Локальная модель не потокобезопасна: генерации выполняются по очереди
+        self._model_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # KV-кэш статической части промпта
+        self.prefix_cache = None
+
+    def _download_model(self) -> str:
+        """Скачивание модели (с докачкой, блокировкой и проверкой хэша)"""
+        model_path = os.path.join(self.cache_dir, self.model_file)
+        try:
+            return download_model(self.model_url, model_path, expected_sha256=settings.LOCAL_MODEL_SHA256 or None)
+        except Exception as e:
+            # Недокачанный .part-файл сохраняется для последующей докачки
+            logger.error(f"Ошибка при скачивании модели: {str(e)}")
+            raise
+
+    def load(self) -> None:
+        """Загрузка модели"""
+        with self._load_lock:
+            if self.model is not None:
+                return
+            self._load_model()
+
+    def _load_model(self) -> None:
+        logger.info(f"Загрузка модели {self.repo_id}")
+
+        # Путь к файлу модели
+        model_path = os.path.join(self.cache_dir, self.model_file)
+
+        # Если модель не существует или не прошла проверку - скачиваем
+        # (проверка и скачивание выполняются под одной блокировкой файла)
+        if not check_model_file(model_path, settings.LOCAL_MODEL_SHA256 or None, self.model_url):
+            logger.info(f"Модель не найдена или повреждена в {model_path}")
+            model_path = self._download_model()
+
+        try:
+            model = self._create_model(model_path)
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке модели: {str(e)}")
+            # Проверенный файл не скачиваем заново: ошибка не связана с его содержимым
+            if check_model_file(model_path, settings.LOCAL_MODEL_SHA256 or None, self.model_url):
+                raise
+            logger.info("Файл модели поврежден, повторное скачивание")
+            model_path = self._download_model()
+            model = self._create_model(model_path)
+
+        # Один раз вычисляем статическую часть промпта
+        if settings.LOCAL_PREFIX_CACHE:
+            self.prefix_cache = PromptPrefixCache(model, prompt_prefix())
+            with self._model_lock:
+                self.prefix_cache.warm()
+
+        self.model = model
+        logger.info("Модель успешно загружена")
+
+    def _create_model(self, model_path: str):
+        """Создание объекта локальной модели"""
+        return AutoModelForCausalLM.from_pretrained(
+            model_path_or_repo_id=model_path,
+            model_type="llama",
+            gpu_layers=0,  # CPU режим
+            context_length=2048,
+            batch_size=1,
+            threads=8  # Используем 8 потоков CPU
+        )
+
+    def stream(self, terms: List[Term], cancel: threading.Event) -> Iterator[str]:
+        self.load()
+        if prompt_logger.isEnabledFor(logging.DEBUG):
+            prompt_logger.debug(f"Промпт: {create_prompt(terms)}")
+        with queued(self._model_lock, self.name):
+            if self.prefix_cache:
+                # Вычисляется только часть промпта после кэшированного префикса
+                chunks = self.prefix_cache.generate(
+                    prompt_suffix(terms), max_new_tokens=MAX_NEW_TOKENS, stop=STOP_SEQUENCES, **SAMPLING
+                )
+            else:
+                chunks = self.model(
+                    create_prompt(terms), max_new_tokens=MAX_NEW_TOKENS, stop=STOP_SEQUENCES, stream=True, **SAMPLING
+                )
+            try:
+                for chunk in chunks:
+                    if cancel.is_set():
+                        break
+                    yield chunk
+            finally:
+                chunks.close()
+
+    def status(self) -> Dict:
+        status = super().status()
+        status['loaded'] = self.model is not None
+        status['busy'] = self._model_lock.locked()
+        status['prefix_cache'] = self.prefix_cache.snapshot() if self.prefix_cache else None
+        return status
+
+
+@register_backend
+class TransformersBackend(GenerationBackend):
+    """Модель Hugging Face transformers (HF_MODEL_ID), при установленном пакете transformers"""
+    name = 'transformers'
+
+    def __init__(self):
+        self.model_id = settings.HF_MODEL_ID
+        self.model = None
+        self.tokenizer = None
+        self._model_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        if not self.model_id:
+            return False
+        try:
+            import transformers  # noqa: F401
+        except ImportError:
+            logger.warning("Пакет transformers не установлен")
+            return False
+        return True
+
+    def load(self) -> None:
+        with self._load_lock:
+            if self.model is not None:
+                return
+            import transformers
+            logger.info(f"Загрузка модели {self.model_id}")
+            self.tokenizer = transformers.AutoTokenizer.from_pretrained(self.model_id)
+            self.model = transformers.AutoModelForCausalLM.from_pretrained(self.model_id, device_map='auto')
+            logger.info("Модель успешно загружена")
+
+    def stream(self, terms: List[Term], cancel: threading.Event) -> Iterator[str]:
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+        self.load()
+
+        stop = threading.Event()
+
+        class Cancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return stop.is_set() or cancel.is_set()
+
+        inputs = self.tokenizer(create_prompt(terms), return_tensors='pt').to(self.model.device)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        with queued(self._model_lock, self.name):
+            # generate() блокирующий: запускаем его в потоке и читаем текст из streamer
+            worker = threading.Thread(
+                target=self.model.generate,
+                kwargs=dict(
+                    **inputs,
+                    streamer=streamer,
+                    max_new_tokens=MAX_NEW_TOKENS,
+                    do_sample=True,
+                    stopping_criteria=StoppingCriteriaList([Cancelled()]),
+                    **SAMPLING
+                ),
+                daemon=True,
+            )
+            worker.start()
+            try:
+                for chunk in streamer:
+                    if cancel.is_set():
+                        break
+                    if chunk:
+                        yield chunk
+            finally:
+                stop.set()
+                worker.join()
+
+    def status(self) -> Dict:
+        status = super().status()
+        status['model_id'] = self.model_id
+        status['loaded'] = self.model is not None
+        return status
+
+
+@register_backend
+class StubBackend(GenerationBackend):
+    """
+    Детерминированная заглушка без сети и модели: по предложению на группу
+    терминов и вывод. Скорость выдачи токенов и исходы запросов задаются
+    параметрами (по умолчанию - настройками STUB_*), поэтому заглушка годится
+    для тестов и измерения производительности генератора.
+
+    Исходы запроса:
+    ok - корректный текст;
+    error - ошибка до первого токена;
+    midstream - обрыв после нескольких токенов;
+    invalid - текст без терминов (не пройдет проверку).
+    Если задан pattern, исходы берутся из него по кругу, иначе разыгрываются
+    с вероятностями failure_rate (поровну error и midstream) и invalid_rate.
+    """
+    name = 'stub'
+    OUTCOMES = ('ok', 'error', 'midstream', 'invalid')
+
+    def __init__(
+        self,
+        seed: int = None,
+        token_rate: float = None,
+        first_token_delay: float = None,
+        failure_rate: float = None,
+        invalid_rate: float = None,
+        pattern: List[str] = None,
+        name: str = None,
+    ):
+        self.seed = settings.STUB_SEED if seed is None else seed
+        self.token_rate = settings.STUB_TOKEN_RATE if token_rate is None else token_rate
+        self.first_token_delay = settings.STUB_FIRST_TOKEN_DELAY if first_token_delay is None else first_token_delay
+        self.failure_rate = settings.STUB_FAILURE_RATE if failure_rate is None else failure_rate
+        self.invalid_rate = settings.STUB_INVALID_RATE if invalid_rate is None else invalid_rate
+        self.pattern = list(settings.STUB_PATTERN if pattern is None else pattern)
+        unknown = set(self.pattern) - set(self.OUTCOMES)
+        if unknown:
+            raise ValueError(f"Неизвестные исходы заглушки: {sorted(unknown)}")
+        if name:
+            # Несколько заглушек с разными параметрами в одном маршрутизаторе
+            self.name = name
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._outcomes = {outcome: 0 for outcome in self.OUTCOMES}
+
+    def next_outcome(self) -> str:
+        """Исход очередного запроса (детерминирован номером запроса и seed)"""
+        with self._lock:
+            index = self._requests
+            self._requests += 1
+        if self.pattern:
+            outcome = self.pattern[index % len(self.pattern)]
+        else:
+            draw = random.Random(f"{self.seed}:{index}").random()
+            if draw < self.failure_rate:
+                outcome = 'error' if draw < self.failure_rate / 2 else 'midstream'
+            elif draw < self.failure_rate + self.invalid_rate:
+                outcome = 'invalid'
+            else:
+                outcome = 'ok'
+        with self._lock:
+            self._outcomes[outcome] += 1
+        return outcome
+
+    def text(self, terms: List[Term], valid: bool = True) -> str:
+        rng = random.Random(f"{self.seed}:{','.join(t.content for t in terms)}")
+        openings = ["Обратите внимание", "Давайте рассмотрим", "Как вы можете видеть", "Итак"]
+        if valid:
+            # Не больше четырех предложений с терминами, чтобы уложиться в лимит
+            groups = [terms[i::4] for i in range(min(len(terms), 4))]
+            sentences = [
+                f"{rng.choice(openings)}, {', '.join(t.content for t in group)} - важная часть темы лекции."
+                for group in groups
+            ]
+        else:
+            sentences = [f"{rng.choice(openings)}, тема лекции очень обширна."]
+        while len(sentences) < 2:
+            sentences.append(f"{rng.choice(openings)}, это следует запомнить.")
+        sentences.append("Таким образом, все эти понятия тесно связаны между собой.")
+        return ' '.join(sentences)
+
+    def stream(self, terms: List[Term], cancel: threading.Event) -> Iterator[str]:
+        outcome = self.next_outcome()
+        if self.first_token_delay and cancel.wait(self.first_token_delay):
+            return
+        if outcome == 'error':
+            raise RuntimeError("Заглушка: ошибка до первого токена")
+
+        words = self.text(terms, valid=outcome != 'invalid').split(' ')
+        for i, word in enumerate(words):
+            if i and self.token_rate and cancel.wait(1 / self.token_rate):
+                return
+            if cancel.is_set():
+                return
+            if outcome == 'midstream' and i == len(words) // 2:
+                raise RuntimeError("Заглушка: обрыв потока")
+            yield word if i == 0 else ' ' + word
+
+    def status(self) -> Dict:
+        status = super().status()
+        with self._lock:
+            status['requests'] = self._requests
+            status['outcomes'] = dict(self._outcomes)
+        return status
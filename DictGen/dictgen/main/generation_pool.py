@@ -0,0 +1,191 @@
+"""
+Пул заранее сгенерированных текстов для популярных наборов терминов.
+
+Каждый запрос генерации записывается в GenerationRequest. Планировщик
+(команда pregenerate_pool) в часы GENERATION_POOL_HOURS выбирает наборы
+терминов, которые чаще всего запрашивали за последние дни и которые чаще
+всего встречаются в недавних заданиях (TaskTerm), и догенерирует для них
+до GENERATION_POOL_SIZE проверенных текстов, пока не израсходован бюджет
+процессорного времени цикла.
+
+/api/generate-text/ отдает текст из пула сразу (каждый текст - одному
+запросу) и в часы GENERATION_POOL_HOURS пополняет пул этого набора
+в фоновом потоке. Выдача и пополнение включаются настройками
+GENERATION_POOL_ENABLED и GENERATION_POOL_REFILL.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+from .llm_generator import get_generator
+from .models import GenerationRequest, PooledText, Task, TaskTerm, Term
+
+logger = logging.getLogger(__name__)
+
+# Очередь пополнения и фоновый поток (один на процесс)
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+_pending = set()
+
+
+def term_key(term_ids: Iterable[int]) -> str:
+    """Ключ набора терминов: ID по возрастанию через запятую"""
+    return ','.join(str(term_id) for term_id in sorted(set(int(term_id) for term_id in term_ids)))
+
+
+def key_term_ids(key: str) -> List[int]:
+    return [int(term_id) for term_id in key.split(',') if term_id]
+
+
+def log_request(term_ids: Iterable[int], user, source: str) -> None:
+    """
+    Записывает запрос генерации в журнал. Журнал вспомогательный:
+    ошибка записи не должна превращать готовый ответ в ошибку запроса.
+    """
+    try:
+        # Точка сохранения: ошибка не прерывает транзакцию запроса
+        with transaction.atomic():
+            GenerationRequest.objects.create(
+                term_key=term_key(term_ids),
+                # Несохраненный пользователь (бенчмарк) записывается как анонимный
+                user=user if user and user.is_authenticated and user.pk else None,
+                source=source,
+            )
+    except Exception as e:
+        logger.warning(f"Не удалось записать запрос генерации в журнал: {str(e)}")
+
+
+def take(term_ids: Iterable[int]) -> Optional[str]:
+    """Забирает из пула самый старый текст набора или возвращает None"""
+    key = term_key(term_ids)
+    for text_id, content in PooledText.objects.filter(term_key=key).order_by('creation_date', 'id').values_list('id', 'content')[:5]:
+        # Текст отдается только тому запросу, который успел его удалить
+        deleted, _ = PooledText.objects.filter(id=text_id).delete()
+        if deleted:
+            return content
+    return None
+
+
+def fill(key: str, size: int, generator=None, deadline: Optional[float] = None, clock=time.process_time) -> int:
+    """
+    Догенерирует тексты набора до size. deadline - предел clock(), после
+    которого новые генерации не начинаются. Возвращает число новых текстов.
+    Бюджет CPU ограничивает локальную генерацию; удаленный бэкенд почти
+    не тратит процессорное время, и генерации ограничены только size.
+    """
+    terms = list(Term.objects.filter(id__in=key_term_ids(key)))
+    if len(terms) != len(key_term_ids(key)):
+        logger.warning(f"Пул [{key}]: часть терминов удалена, набор пропущен")
+        return 0
+    if generator is None:
+        generator = get_generator()
+
+    added = 0
+    while PooledText.objects.filter(term_key=key).count() < size:
+        if deadline is not None and clock() >= deadline:
+            break
+        # generate() возвращает только прошедший проверку текст
+        PooledText.objects.create(term_key=key, content=generator.generate(terms))
+        added += 1
+    return added
+
+
+def _work():
+    while True:
+        key = _queue.get()
+        try:
+            # Пополнение после запроса ограничено тем же бюджетом CPU, что и цикл планировщика.
+            # В веб-процессе process_time() учитывает и потоки запросов - считаем время только этого потока
+            fill(
+                key, settings.GENERATION_POOL_SIZE,
+                deadline=time.thread_time() + settings.GENERATION_POOL_CPU_BUDGET, clock=time.thread_time,
+            )
+        except Exception as e:
+            logger.error(f"Ошибка пополнения пула [{key}]: {str(e)}")
+        finally:
+            with _worker_lock:
+                _pending.discard(key)
+            # Поток живет долго: закрываем устаревшие соединения с БД
+            close_old_connections()
+
+
+def _submit(key: str) -> None:
+    global _worker
+    with _worker_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name='generation-pool-worker', daemon=True)
+            _worker.start()
+    _queue.put(key)
+
+
+def schedule_refill(term_ids: Iterable[int]) -> None:
+    """Пополняет пул набора в фоновом потоке (после фиксации транзакции) в часы GENERATION_POOL_HOURS"""
+    if settings.GENERATION_POOL_REFILL and in_pool_hours():
+        key = term_key(term_ids)
+        transaction.on_commit(lambda: _submit(key))
+
+
+def popular_term_sets(days: int = 14, limit: int = 20) -> List[Tuple[str, int]]:
+    """
+    Популярные наборы терминов: [(ключ, вес)] по убыванию веса. Вес - число
+    запросов генерации набора плюс число недавних заданий ровно с этими терминами.
+    """
+    since = timezone.now() - timedelta(days=days)
+    weights = Counter(dict(
+        GenerationRequest.objects.filter(creation_date__gte=since)
+        .values('term_key').annotate(count=Count('id')).values_list('term_key', 'count')
+    ))
+    links = (
+        TaskTerm.objects.filter(task__in=Task.objects.filter(creation_date__gte=since).values('id'))
+        .order_by('task_id').values_list('task_id', 'term_id')
+    )
+    for _, group in groupby(links.iterator(), key=lambda link: link[0]):
+        weights[term_key(term_id for _, term_id in group)] += 1
+    return sorted(weights.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def in_pool_hours(now=None, hours: Optional[str] = None) -> bool:
+    """Текущий час попадает в GENERATION_POOL_HOURS ('1-6'; '22-4' - через полночь; пусто - всегда)"""
+    hours = settings.GENERATION_POOL_HOURS if hours is None else hours
+    if not hours:
+        return True
+    start, end = (int(value) for value in hours.split('-'))
+    hour = timezone.localtime(now).hour
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def prune(max_age_days: int) -> int:
+    """Удаляет устаревшие тексты пула"""
+    deleted, _ = PooledText.objects.filter(creation_date__lt=timezone.now() - timedelta(days=max_age_days)).delete()
+    return deleted
+
+
+def run_cycle(cpu_budget: float, size: int, sets: int, generator=None) -> Dict:
+    """Один цикл планировщика: пополнить пулы популярных наборов в пределах бюджета CPU (сек.)"""
+    start = time.process_time()
+    deadline = start + cpu_budget
+    stats = {'sets': 0, 'generated': 0, 'failed': 0, 'pruned': prune(settings.GENERATION_POOL_MAX_AGE_DAYS)}
+    for key, weight in popular_term_sets(limit=sets):
+        if time.process_time() >= deadline:
+            break
+        stats['sets'] += 1
+        try:
+            stats['generated'] += fill(key, size, generator, deadline)
+        except Exception as e:
+            stats['failed'] += 1
+            logger.error(f"Ошибка генерации для пула [{key}]: {str(e)}")
+    stats['cpu_seconds'] = round(time.process_time() - start, 2)
+    logger.info(f"Цикл пула завершен: {stats}")
+    return stats
@@ -0,0 +1,261 @@
+"""
+Выбор бэкенда генерации по живой статистике задержек и хеджирование запросов.
+
+LatencyRouter держит скользящее окно последних запросов каждого бэкенда
+(время до первого токена, полное время, успех) и упорядочивает бэкенды по
+p95 полного времени с поправкой на долю ошибок. Пока у бэкенда мало данных,
+сохраняется порядок из настроек.
+
+HedgedStream запускает основной бэкенд и, если первый токен не пришел за
+hedge_after секунд, параллельно запасной. Побеждает бэкенд, первым
+отдавший токен; проигравший отменяется.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from .generation_backends import BackendUnavailableError, GenerationBackend
+from .stats import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class BackendStats:
+    """Скользящее окно последних запросов одного бэкенда"""
+
+    def __init__(self, window: int = 50):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)  # (ttft, total, ok)
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, ttft: Optional[float], total: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((ttft, total, ok))
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            samples = list(self._samples)
+        ttft = [s[0] for s in samples if s[2] and s[0] is not None]
+        total = [s[1] for s in samples if s[2]]
+        return {
+            'samples': len(samples),
+            'requests': self.requests,
+            'errors': self.errors,
+            'error_rate': sum(1 for s in samples if not s[2]) / len(samples) if samples else 0.0,
+            'ttft_p50': percentile(ttft, 50),
+            'ttft_p95': percentile(ttft, 95),
+            'total_p50': percentile(total, 50),
+            'total_p95': percentile(total, 95),
+        }
+
+
+class LatencyRouter:
+    def __init__(self, backends: List[GenerationBackend], window: int = 50, min_samples: int = 5):
+        self.backends = list(backends)
+        self.min_samples = min_samples
+        self.stats = {b.name: BackendStats(window) for b in self.backends}
+
+    def record(self, name: str, ttft: Optional[float], total: float, ok: bool) -> None:
+        self.stats[name].record(ttft, total, ok)
+
+    def score(self, name: str) -> Optional[float]:
+        """Ожидаемая стоимость запроса (меньше - лучше); None, если данных мало"""
+        stats = self.stats[name].snapshot()
+        if stats['samples'] < self.min_samples:
+            return None
+        if stats['total_p95'] is None:
+            # Все запросы в окне закончились ошибкой
+            return float('inf')
+        # Ошибка стоит повторного запроса: делим на долю успешных
+        return stats['total_p95'] / max(1.0 - stats['error_rate'], 0.05)
+
+    def order(self) -> List[GenerationBackend]:
+        """
+        Бэкенды в порядке попыток: сначала доступные с измеренной задержкой
+        (по возрастанию стоимости), затем доступные без статистики (в порядке
+        настроек), в конце - недоступные.
+        """
+        def key(item):
+            index, backend = item
+            if not backend.available():
+                return (2, index)
+            score = self.score(backend.name)
+            if score is None:
+                return (1, index)
+            return (0, score)
+
+        return [b for _, b in sorted(enumerate(self.backends), key=key)]
+
+    def snapshot(self) -> Dict:
+        return {
+            'order': [b.name for b in self.order()],
+            'backends': {name: stats.snapshot() for name, stats in self.stats.items()},
+        }
+
+
+class TimedStream:
+    """Поток одного бэкенда с учетом задержек в маршрутизаторе"""
+
+    def __init__(self, backend: GenerationBackend, terms, router: LatencyRouter):
+        self.backend = backend
+        self.router = router
+        self.winner = backend.name
+        self.started = [backend.name]
+        self.first_token_at = None
+        self._cancel = threading.Event()
+        self._chunks = self._run(terms)
+
+    def _run(self, terms):
+        start = time.monotonic()
+        ttft = None
+        ok = True
+        chunks = self.backend.stream(terms, self._cancel)
+        try:
+            for chunk in chunks:
+                if ttft is None:
+                    self.first_token_at = time.monotonic()
+                    ttft = self.first_token_at - start
+                yield chunk
+        except BackendUnavailableError:
+            # Недоступность не характеризует задержку бэкенда
+            ok = None
+            raise
+        except Exception:
+            ok = False
+            raise
+        finally:
+            chunks.close()
+            # Досрочное закрытие потока верификатором - успешный запрос
+            if ok is not None:
+                self.router.record(self.backend.name, ttft, time.monotonic() - start, ok=ok)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return next(self._chunks)
+
+    def close(self) -> None:
+        self._cancel.set()
+        self._chunks.close()
+
+
+class HedgedStream:
+    """
+    Хеджированный поток: основной бэкенд, а при задержке первого токена
+    дольше hedge_after секунд - параллельно следующий. Каждый бэкенд читается
+    в своем потоке; фрагменты передаются через общую очередь.
+    """
+
+    def __init__(self, backends: List[GenerationBackend], terms, router: LatencyRouter, hedge_after: float):
+        self.backends = list(backends)
+        self.terms = terms
+        self.router = router
+        self.hedge_after = hedge_after
+        self.winner = None
+        self.started = []
+        self.first_token_at = None
+        self._queue = queue.Queue()
+        self._cancel = {b.name: threading.Event() for b in self.backends}
+        self._chunks = self._run()
+
+    def _worker(self, backend: GenerationBackend) -> None:
+        cancel = self._cancel[backend.name]
+        start = time.monotonic()
+        ttft = None
+        ok = False
+        chunks = backend.stream(self.terms, cancel)
+        try:
+            for chunk in chunks:
+                if cancel.is_set():
+                    break
+                if ttft is None:
+                    ttft = time.monotonic() - start
+                self._queue.put(('chunk', backend.name, chunk))
+            ok = True
+            self._queue.put(('end', backend.name, None))
+        except Exception as e:
+            self._queue.put(('error', backend.name, e))
+            if isinstance(e, BackendUnavailableError):
+                # Недоступность не характеризует задержку бэкенда
+                ok = None
+        finally:
+            chunks.close()
+            # Отмененный проигравший ничего не говорит о задержке
+            if ok is not None and (not cancel.is_set() or backend.name == self.winner):
+                self.router.record(backend.name, ttft, time.monotonic() - start, ok=ok)
+
+    def _start_next(self, reason: str = '') -> bool:
+        if len(self.started) == len(self.backends):
+            return False
+        backend = self.backends[len(self.started)]
+        if reason:
+            logger.info(f"{reason}, запускаем {backend.name}")
+        self.started.append(backend.name)
+        threading.Thread(target=self._worker, args=(backend,), daemon=True).start()
+        return True
+
+    def _run(self):
+        self._start_next()
+        running = set(self.started)
+        deadline = time.monotonic() + self.hedge_after
+        last_error = None
+        while True:
+            timeout = None
+            if self.winner is None and len(self.started) < len(self.backends):
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                kind, name, payload = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._start_next(f"Нет первого токена за {self.hedge_after:.2f} сек.")
+                running.add(self.started[-1])
+                continue
+
+            if self.winner is None:
+                if kind == 'chunk':
+                    # Первый токен определяет победителя, остальные отменяются
+                    self.winner = name
+                    self.first_token_at = time.monotonic()
+                    for other, cancel in self._cancel.items():
+                        if other != name:
+                            cancel.set()
+                    yield payload
+                    continue
+                running.discard(name)
+                if kind == 'error':
+                    logger.warning(f"Бэкенд {name} завершился ошибкой: {payload}")
+                    last_error = payload
+                # Бэкенд закончил без текста - сразу запускаем следующий
+                if not running:
+                    if not self._start_next(f"Бэкенд {name} не дал текста"):
+                        if last_error is not None:
+                            raise last_error
+                        return
+                    running.add(self.started[-1])
+                continue
+
+            if name != self.winner:
+                continue
+            if kind == 'chunk':
+                yield payload
+            elif kind == 'end':
+                return
+            else:
+                raise payload
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return next(self._chunks)
+
+    def close(self) -> None:
+        for cancel in self._cancel.values():
+            cancel.set()
+        self._chunks.close()
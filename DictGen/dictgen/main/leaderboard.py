@@ -0,0 +1,160 @@
+"""
+Таблицы лидеров заданий.
+
+В LeaderboardEntry хранится лучшая попытка каждого ученика задания; запись
+обновляется при проверке попытки (refresh_entry) и пересчитывается целиком
+после перепроверки задания (rebuild). Порядок: точность по убыванию, затем
+время первой проверки, затем ID попытки - равные результаты не меняют
+порядок между запросами.
+
+Первые N мест читаются из БД по индексу порядка. Место ученика ищется
+двоичным поиском в отсортированных ключах задания, которые процесс хранит
+в памяти (LEADERBOARD_CACHE_TASKS заданий). Ключи сверяются с
+Task.leaderboard_version, поэтому изменения из других процессов видны сразу.
+"""
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import LeaderboardEntry, Metric, Task
+
+ORDERING = ('-accuracy', 'achieved_at', 'attempt_id')
+
+_lock = threading.Lock()
+# ID задания -> TaskRanking, по порядку использования
+_rankings = OrderedDict()
+
+
+def sort_key(accuracy: float, achieved_at, attempt_id: int) -> Tuple:
+    """Ключ места в рейтинге: меньше - выше"""
+    return -accuracy, achieved_at.timestamp(), attempt_id
+
+
+class TaskRanking:
+    """Отсортированные ключи записей одного задания"""
+
+    def __init__(self, version: int, rows):
+        self.version = version
+        self.by_student: Dict[int, Tuple] = {}
+        for student_id, accuracy, achieved_at, attempt_id in rows:
+            self.by_student[student_id] = sort_key(accuracy, achieved_at, attempt_id)
+        self.keys: List[Tuple] = sorted(self.by_student.values())
+
+    def rank(self, student_id: int) -> Optional[int]:
+        key = self.by_student.get(student_id)
+        return None if key is None else bisect_left(self.keys, key) + 1
+
+    def update(self, student_id: int, key: Optional[Tuple]) -> None:
+        old = self.by_student.pop(student_id, None)
+        if old is not None:
+            del self.keys[bisect_left(self.keys, old)]
+        if key is not None:
+            self.by_student[student_id] = key
+            insort(self.keys, key)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _load(task_id: int, version: int) -> TaskRanking:
+    rows = LeaderboardEntry.objects.filter(task_id=task_id).values_list(
+        'student_id', 'accuracy', 'achieved_at', 'attempt_id'
+    )
+    return TaskRanking(version, rows)
+
+
+def get_ranking(task_id: int) -> TaskRanking:
+    """Рейтинг задания из кэша процесса или из БД, если в БД он новее"""
+    version = Task.objects.filter(id=task_id).values_list('leaderboard_version', flat=True).first() or 0
+    with _lock:
+        ranking = _rankings.get(task_id)
+        if ranking is not None and ranking.version == version:
+            _rankings.move_to_end(task_id)
+            return ranking
+    ranking = _load(task_id, version)
+    with _lock:
+        _rankings[task_id] = ranking
+        _rankings.move_to_end(task_id)
+        while len(_rankings) > settings.LEADERBOARD_CACHE_TASKS:
+            _rankings.popitem(last=False)
+    return ranking
+
+
+def _bump_version(task_id: int, student_id: int, key: Optional[Tuple]) -> None:
+    """Новая версия рейтинга задания; после фиксации кэш процесса обновляется без перечитывания"""
+    Task.objects.filter(id=task_id).update(leaderboard_version=F('leaderboard_version') + 1)
+    version = Task.objects.filter(id=task_id).values_list('leaderboard_version', flat=True).first()
+
+    def update_cache():
+        with _lock:
+            ranking = _rankings.get(task_id)
+            if ranking is None:
+                return
+            if ranking.version == version - 1:
+                ranking.update(student_id, key)
+                ranking.version = version
+            else:
+                # Пропущены изменения из других процессов - перечитаем при запросе
+                del _rankings[task_id]
+
+    transaction.on_commit(update_cache)
+
+
+def _best_metric(task_id: int, student_id: int):
+    return (
+        Metric.objects.filter(attempt__task_id=task_id, attempt__student_id=student_id)
+        .order_by('-accuracy', 'creation_date', 'attempt_id')
+        .values('attempt_id', 'accuracy', 'creation_date').first()
+    )
+
+
+def refresh_entry(task_id: int, student_id: Optional[int]) -> None:
+    """Пересчитывает запись ученика после проверки, изменения или удаления его попытки"""
+    if student_id is None:
+        return
+    with transaction.atomic():
+        best = _best_metric(task_id, student_id)
+        entry = LeaderboardEntry.objects.select_for_update().filter(task_id=task_id, student_id=student_id).first()
+        if best is None:
+            if entry is None:
+                return
+            entry.delete()
+            key = None
+        else:
+            values = {'attempt_id': best['attempt_id'], 'accuracy': best['accuracy'], 'achieved_at': best['creation_date']}
+            if entry is not None and all(getattr(entry, k) == v for k, v in values.items()):
+                return
+            LeaderboardEntry.objects.update_or_create(task_id=task_id, student_id=student_id, defaults=values)
+            key = sort_key(best['accuracy'], best['creation_date'], best['attempt_id'])
+        _bump_version(task_id, student_id, key)
+
+
+def rebuild(task_id: int) -> int:
+    """Пересчитывает таблицу лидеров задания целиком (после перепроверки); возвращает число записей"""
+    metrics = (
+        Metric.objects.filter(attempt__task_id=task_id, attempt__student__isnull=False)
+        .order_by('attempt__student_id', '-accuracy', 'creation_date', 'attempt_id')
+        .values_list('attempt__student_id', 'attempt_id', 'accuracy', 'creation_date')
+    )
+    entries = {}
+    for student_id, attempt_id, accuracy, created in metrics.iterator():
+        if student_id not in entries:
+            entries[student_id] = LeaderboardEntry(
+                task_id=task_id, student_id=student_id, attempt_id=attempt_id, accuracy=accuracy, achieved_at=created
+            )
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(task_id=task_id).delete()
+        LeaderboardEntry.objects.bulk_create(entries.values(), batch_size=500)
+        Task.objects.filter(id=task_id).update(leaderboard_version=F('leaderboard_version') + 1)
+    return len(entries)
+
+
+def top(task_id: int, offset: int = 0, limit: int = 10):
+    """Записи с мест offset + 1 ... offset + limit"""
+    return (
+        LeaderboardEntry.objects.filter(task_id=task_id).select_related('student')
+        .order_by(*ORDERING)[offset:offset + limit]
+    )
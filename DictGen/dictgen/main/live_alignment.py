@@ -0,0 +1,147 @@
+"""
+Инкрементальная проверка попытки во время набора текста.
+
+LiveAlignmentSession хранит текст попытки, его токены с позициями и
+выравнивание с токенами задания. Правка (замена символов [start, end) на
+text) перетокенизирует только затронутые токены и заново выравнивает окно
+вокруг них в пределах LIVE_ALIGNMENT_CONTEXT токенов; остальное выравнивание
+сдвигается без пересчета. Границы окна выбираются внутри совпадающих блоков,
+поэтому неравные блоки не разрезаются.
+
+Модуль, как и scoring, не обращается к БД.
+"""
+import bisect
+from functools import lru_cache
+from typing import List, Tuple
+from .alignment import _group, align
+from .scoring import errors_from_opcodes, tokenize, tokenize_with_offsets
+
+
+@lru_cache(maxsize=64)
+def task_tokens(task_text: str) -> Tuple[str, ...]:
+    """Токены задания; общий кэш для всех соединений (тексты заданий повторяются)"""
+    return tuple(tokenize(task_text.lower()))
+
+
+class TextTooLongError(ValueError):
+    """Текст попытки длиннее max_length: повторная отправка текста не поможет"""
+
+
+class LiveAlignmentSession:
+    def __init__(self, task_text: str, algorithm: str = None, context: int = 16, max_length: int = 60000):
+        self.task_tokens = task_tokens(task_text)
+        self.algorithm = algorithm
+        self.context = context
+        self.max_length = max_length
+        self.reset('')
+
+    def reset(self, text: str) -> None:
+        """Полная проверка текста (начало сессии или рассинхронизация с клиентом)"""
+        self._check_length(len(text))
+        self.text = text
+        self.spans = tokenize_with_offsets(text)
+        self._set_opcodes(align(self.task_tokens, [t for t, _, _ in self.spans], self.algorithm))
+
+    def _set_opcodes(self, opcodes) -> None:
+        """
+        Сохраняет выравнивание без еще не набранного хвоста задания: конечный
+        пропуск отбрасывается, конечная замена укорачивается до длины набранного.
+        pending - индекс первого токена задания, до которого ученик не дошел
+        """
+        opcodes = _group(opcodes)
+        if opcodes and opcodes[-1][0] == 'delete':
+            opcodes.pop()
+        elif opcodes and opcodes[-1][0] == 'replace':
+            tag, i1, i2, j1, j2 = opcodes[-1]
+            opcodes[-1] = (tag, i1, min(i2, i1 + j2 - j1), j1, j2)
+        self.opcodes = opcodes
+        self.pending = opcodes[-1][2] if opcodes else 0
+
+    def _check_length(self, length: int) -> None:
+        if length > self.max_length:
+            raise TextTooLongError(f"Текст длиннее {self.max_length} символов")
+
+    def apply(self, start: int, end: int, text: str) -> Tuple[int, int]:
+        """
+        Заменяет символы [start, end) на text и обновляет выравнивание.
+        Возвращает диапазон заново выровненных токенов попытки.
+        """
+        if not 0 <= start <= end <= len(self.text):
+            raise ValueError(f"Неверный диапазон правки: {start}-{end}")
+        delta = len(text) - (end - start)
+        self._check_length(len(self.text) + delta)
+        self.text = self.text[:start] + text + self.text[end:]
+
+        # Затронутые токены: пересекаются с правкой или касаются ее границ
+        spans = self.spans
+        lo = bisect.bisect_left(spans, start, key=lambda s: s[2])
+        hi = bisect.bisect_right(spans, end, key=lambda s: s[1])
+        window_start = min(start, spans[lo][1]) if lo < hi else start
+        window_end = (max(end, spans[hi - 1][2]) if lo < hi else end) + delta
+        new_spans = [
+            (token, s + window_start, e + window_start)
+            for token, s, e in tokenize_with_offsets(self.text[window_start:window_end])
+        ]
+        self.spans = spans[:lo] + new_spans + [(t, s + delta, e + delta) for t, s, e in spans[hi:]]
+        return self._realign(lo, hi, lo + len(new_spans))
+
+    def _task_index(self, j: int, left: bool) -> Tuple[int, int]:
+        """
+        Граница окна в задании для границы j в попытке. Внутри совпадающего
+        блока граница точная, неравный блок включается в окно целиком
+        """
+        for tag, i1, i2, j1, j2 in self.opcodes:
+            if tag == 'equal' and j1 <= j <= j2:
+                return i1 + (j - j1), j
+            if tag != 'equal' and j1 < j < j2:
+                return (i1, j1) if left else (i2, j2)
+        return (0, 0) if left else (len(self.task_tokens), j)
+
+    def _realign(self, lo: int, old_hi: int, new_hi: int) -> Tuple[int, int]:
+        old_count = len(self.spans) - (new_hi - old_hi)
+        shift = new_hi - old_hi
+
+        # Окно в старых индексах попытки с запасом context токенов
+        ia, ja = (0, 0) if lo - self.context <= 0 else self._task_index(lo - self.context, True)
+        tail = old_hi + self.context >= old_count
+        if tail:
+            # Окно доходит до конца попытки: задание берется лишь немного дальше
+            # набранного, иначе короткое окно выровнялось бы с далекими повторами слов
+            jb = old_count
+            ib = min(len(self.task_tokens), max(self.pending, ia + jb + shift - ja + self.context))
+        else:
+            ib, jb = self._task_index(old_hi + self.context, False)
+
+        window = align(
+            self.task_tokens[ia:ib],
+            [t for t, _, _ in self.spans[ja:jb + shift]],
+            self.algorithm,
+        )
+        before, after = [], []
+        for tag, i1, i2, j1, j2 in self.opcodes:
+            if j2 <= ja and i2 <= ia:
+                before.append((tag, i1, i2, j1, j2))
+                continue
+            # Совпадающий блок на границе окна режется по ней
+            if tag == 'equal' and j1 < ja:
+                before.append(('equal', i1, ia, j1, ja))
+            if tail:
+                continue
+            if j1 >= jb and i1 >= ib:
+                after.append((tag, i1, i2, j1 + shift, j2 + shift))
+            elif tag == 'equal' and j2 > jb:
+                after.append(('equal', ib, i2, jb + shift, j2 + shift))
+        middle = [(tag, i1 + ia, i2 + ia, j1 + ja, j2 + ja) for tag, i1, i2, j1, j2 in window]
+        self._set_opcodes(before + middle + after)
+        return ja, jb + shift
+
+    def errors(self, final: bool = False) -> List[dict]:
+        """
+        Ошибки текущего текста в формате scoring.find_errors. Пока текст
+        набирается, ненабранный хвост задания ошибкой не считается (final=False)
+        """
+        opcodes = self.opcodes
+        if final and self.pending < len(self.task_tokens):
+            end = len(self.spans)
+            opcodes = opcodes + [('delete', self.pending, len(self.task_tokens), end, end)]
+        return errors_from_opcodes(self.task_tokens, self.spans, _group(opcodes))
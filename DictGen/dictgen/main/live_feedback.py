@@ -0,0 +1,166 @@
+"""
+WebSocket живой проверки диктанта: ws/attempts/live/?task=<id>&token=<JWT access>.
+
+Клиент присылает правки набираемого текста, сервер отвечает ошибками
+текущего текста. Сообщения клиента (JSON):
+    {"type": "reset", "text": "..."}                        - весь текст
+    {"type": "edit", "start": 5, "end": 7, "text": "ы", "length": 120, "seq": 3}
+start/end - диапазон замены в символах текущего текста, length - длина
+текста после правки (проверка синхронизации), seq - возвращается в ответе,
+"final": true - считать ошибками и пропуск ненабранного конца задания.
+Ответ: {"type": "errors", "seq": 3, "errors": [...], "pending": 40, "elapsed_ms": 0.8}
+При рассинхронизации сервер отвечает {"type": "resync"}, и клиент присылает reset.
+Если текст длиннее LIVE_MAX_TEXT_LENGTH, сервер отвечает {"type": "too_large"}
+и закрывает соединение с кодом 4413.
+
+Небольшие правки выравниваются прямо в цикле событий; reset, final и крупные
+вставки (полная проверка - до сотен миллисекунд) выполняются в отдельном потоке.
+
+Память соединения ограничена текстом попытки (LIVE_MAX_TEXT_LENGTH),
+его токенами и выравниванием; токены задания общие (кэш live_alignment).
+"""
+import json
+import logging
+import time
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from .live_alignment import LiveAlignmentSession, TextTooLongError
+from .models import Task
+from .permissions import StudentTaskPermission
+
+logger = logging.getLogger(__name__)
+
+LIVE_PATH = '/ws/attempts/live/'
+
+# Коды закрытия соединения
+CLOSE_NOT_FOUND = 4404
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_TOO_LARGE = 4413
+
+# Правки не длиннее стольких символов выполняются прямо в цикле событий
+INLINE_EDIT_SIZE = 200
+
+
+def _load_task(params):
+    """Пользователь по JWT и доступное ему задание; возвращает (task, код ошибки)"""
+    close_old_connections()
+    try:
+        authentication = JWTAuthentication()
+        user = authentication.get_user(authentication.get_validated_token(params.get('token', [''])[0]))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        # AuthenticationFailed - пользователь удален или неактивен
+        return None, CLOSE_UNAUTHORIZED
+    try:
+        task = Task.objects.get(id=int(params.get('task', [''])[0]))
+    except (Task.DoesNotExist, ValueError):
+        return None, CLOSE_NOT_FOUND
+
+    # Те же права, что на чтение задания (включая назначенные ученику)
+    request = SimpleNamespace(user=user, method='GET')
+    if not StudentTaskPermission().has_object_permission(request, None, task):
+        return None, CLOSE_FORBIDDEN
+    return task, None
+
+
+async def _send_json(send, data):
+    await send({'type': 'websocket.send', 'text': json.dumps(data, ensure_ascii=False)})
+
+
+def is_inline(data) -> bool:
+    """Сообщение обрабатывается за миллисекунды: небольшая правка без final"""
+    return data.get('type') == 'edit' and not data.get('final') and len(str(data.get('text', ''))) <= INLINE_EDIT_SIZE
+
+
+def handle_message(session, data):
+    """Применяет сообщение клиента (разобранный JSON) к сессии и возвращает ответ"""
+    try:
+        if data.get('type') == 'reset':
+            session.reset(str(data.get('text', '')))
+        elif data.get('type') == 'edit':
+            session.apply(int(data['start']), int(data['end']), str(data.get('text', '')))
+            if 'length' in data and int(data['length']) != len(session.text):
+                return {'type': 'resync', 'seq': data.get('seq')}
+        else:
+            return {'type': 'error', 'error': 'Неизвестный тип сообщения'}
+    except TextTooLongError as e:
+        # Повторный reset с тем же текстом не поможет - соединение закрывается
+        return {'type': 'too_large', 'error': str(e)}
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        # Правка не применима к текущему тексту: клиенту нужно прислать весь текст
+        return {'type': 'resync', 'error': str(e)}
+    return {
+        'type': 'errors',
+        'seq': data.get('seq'),
+        'errors': session.errors(final=bool(data.get('final'))),
+        'pending': len(session.task_tokens) - session.pending,
+    }
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI-приложение для соединений WebSocket"""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    if scope['path'] != LIVE_PATH:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+
+    params = parse_qs(scope.get('query_string', b'').decode())
+    task, code = await sync_to_async(_load_task)(params)
+    if task is None:
+        await send({'type': 'websocket.close', 'code': code})
+        return
+
+    session = LiveAlignmentSession(
+        task.content,
+        algorithm=settings.ALIGNMENT_ALGORITHM,
+        context=settings.LIVE_ALIGNMENT_CONTEXT,
+        max_length=settings.LIVE_MAX_TEXT_LENGTH,
+    )
+    await send({'type': 'websocket.accept'})
+    logger.info(f"Живая проверка: подключение к заданию {task.id}")
+
+    while True:
+        message = await receive()
+        if message['type'] == 'websocket.disconnect':
+            break
+        if message['type'] != 'websocket.receive':
+            continue
+
+        text = message.get('text') or (message.get('bytes') or b'').decode('utf-8', 'replace')
+        if len(text) > settings.LIVE_MAX_MESSAGE_SIZE:
+            await send({'type': 'websocket.close', 'code': CLOSE_TOO_LARGE})
+            break
+
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            await _send_json(send, {'type': 'error', 'error': 'Некорректный JSON'})
+            continue
+
+        start = time.perf_counter()
+        if is_inline(data):
+            # Правка выравнивается за миллисекунды, поэтому выполняется прямо в цикле событий
+            response = handle_message(session, data)
+        else:
+            # Полная проверка не должна задерживать другие запросы этого процесса;
+            # сообщения соединения обрабатываются по очереди, сессия не делится между потоками
+            response = await sync_to_async(handle_message, thread_sensitive=False)(session, data)
+        elapsed = (time.perf_counter() - start) * 1000
+        if response['type'] == 'errors':
+            response['elapsed_ms'] = round(elapsed, 2)
+        if elapsed > 50:
+            logger.warning(f"Живая проверка задания {task.id}: сообщение обработано за {elapsed:.0f} мс")
+        await _send_json(send, response)
+        if response['type'] == 'too_large':
+            await send({'type': 'websocket.close', 'code': CLOSE_TOO_LARGE})
+            break
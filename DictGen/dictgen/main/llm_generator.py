@@ -1,14 +1,14 @@
-import os
+import asyncio
 import logging
-import requests
-import hashlib
-import json
-from tqdm import tqdm
+import time
 from typing import List, Optional, Dict
-from ctransformers import AutoModelForCausalLM
 from dotenv import load_dotenv
-from openai import OpenAI
+from django.conf import settings
 from .models import Term
+from .generation_backends import BackendUnavailableError, GenerationBackend, GenerationError, create_backends
+from .generation_routing import HedgedStream, LatencyRouter, TimedStream
+from .text_verification import StreamingVerifier, StreamStats, TermMatcher, has_loop, split_sentences
+from . import telemetry
 
 # Используем общий логгер
 logger = logging.getLogger(__name__)
@@ -17,123 +17,23 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 class TextGenerator:
-    def __init__(self):
-        self.model = None
-        self.repo_id = "TheBloke/Llama-2-7B-Chat-GGUF"
-        self.model_file = "llama-2-7b-chat.Q4_K_M.gguf"
-        self.model_url = "https://huggingface.co/TheBloke/Llama-2-7B-Chat-GGUF/resolve/main/llama-2-7b-chat.Q4_K_M.gguf"
-        self.cache_dir = "S:/diplom_model/cache"
+    def __init__(self, backends: Optional[List[GenerationBackend]] = None):
+        # Требования к тексту (см. промпт) и статистика потоковой проверки
+        self.min_sentences = 3
+        self.max_sentences = 6
+        self.stream_stats = StreamStats()
         
-        # Конфигурация BotHub API
-        self.use_bothub = False
-        self.bothub_api_key = os.getenv('BOTHUB_API_KEY')
-        self.bothub_model = "gpt-4o-mini"
+        # Бэкенды генерации в порядке предпочтения (BotHub пропускается без ключа API)
+        self.backends = backends if backends is not None else create_backends(settings.GENERATION_BACKENDS)
+        if not self.backends:
+            raise GenerationError("Не настроен ни один бэкенд генерации")
+        self.router = LatencyRouter(self.backends, window=settings.GENERATION_ROUTING_WINDOW)
+        self.hedge_after = settings.GENERATION_HEDGE_AFTER
+        self.max_attempts = settings.GENERATION_MAX_ATTEMPTS
+        logger.info(f"Бэкенды генерации: {[b.name for b in self.backends]}")
         
-        # Инициализация OpenAI клиента для BotHub
-        if self.bothub_api_key:
-            self.bothub_client = OpenAI(
-                api_key=self.bothub_api_key,
-                base_url='https://bothub.chat/api/v2/openai/v1'
-            )
-            self.use_bothub = True
-            logger.info("BotHub API настроен и будет использоваться как основной метод генерации")
-        else:
-            logger.warning("Ключ BotHub API не найден в файле .env, используем локальную модель")
-            # Загружаем модель
-            self._load_model()
-        
-    def _download_model(self) -> str:
-        """Скачивание модели"""
-        try:
-            logger.info(f"Скачивание модели {self.model_file}")
-            
-            # Путь для сохранения модели
-            model_path = os.path.join(self.cache_dir, self.model_file)
-            
-            # Удаляем файл если он существует
-            if os.path.exists(model_path):
-                os.remove(model_path)
-            
-            # Скачиваем модель
-            response = requests.get(self.model_url, stream=True)
-            total_size = int(response.headers.get('content-length', 0))
-            
-            with open(model_path, 'wb') as file, tqdm(
-                desc=self.model_file,
-                total=total_size,
-                unit='iB',
-                unit_scale=True,
-                unit_divisor=1024,
-            ) as progress_bar:
-                for data in response.iter_content(chunk_size=1024):
-                    size = file.write(data)
-                    progress_bar.update(size)
-                    
-            logger.info(f"Модель успешно скачана в {model_path}")
-            
-            # Проверяем размер файла
-            if os.path.getsize(model_path) != total_size:
-                raise ValueError(f"Размер скачанного файла ({os.path.getsize(model_path)}) не соответствует ожидаемому ({total_size})")
-            
-            return model_path
-            
-        except Exception as e:
-            logger.error(f"Ошибка при скачивании модели: {str(e)}")
-            # Удаляем поврежденный файл
-            if os.path.exists(model_path):
-                os.remove(model_path)
-            raise
-    
-    def _load_model(self) -> None:
-        """Загрузка модели"""
-        try:
-            logger.info(f"Загрузка модели {self.repo_id}")
-            
-            # Путь к файлу модели
-            model_path = os.path.join(self.cache_dir, self.model_file)
-            
-            # Если модель не существует или повреждена - скачиваем
-            if not os.path.exists(model_path):
-                logger.info(f"Модель не найдена в {model_path}")
-                model_path = self._download_model()
-            
-            # Загружаем модель
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_path_or_repo_id=model_path,
-                model_type="llama",
-                gpu_layers=0,  # CPU режим
-                context_length=2048,
-                batch_size=1,
-                threads=8  # Используем 8 потоков CPU
-            )
-            
-            logger.info("Модель успешно загружена")
-            
-        except Exception as e:
-            logger.error(f"Ошибка при загрузке модели: {str(e)}")
-            # При ошибке загрузки удаляем файл и пробуем скачать заново
-            if os.path.exists(model_path):
-                os.remove(model_path)
-                logger.info("Удален поврежденный файл модели, попытка повторной загрузки")
-                model_path = self._download_model()
-                self._load_model()  # Рекурсивно пробуем загрузить модель
-            else:
-                raise
-    
-    def _create_prompt(self, terms: List[Term]) -> str:
-        """Создание промпта для генерации"""
-        terms_str = ", ".join(t.content for t in terms)
-        return f"""[INST] Прочитайте фрагмент лекции, объясняющий следующие термины: {terms_str}
-
-Требования к лекции:
-1. Объем: 3-6 предложений
-2. Найдите наиболее логичную тематическую связь между этими терминами и постройте лекцию вокруг этой темы
-3. Объясните, как эти термины взаимодействуют или влияют друг на друга в рамках выбранной темы
-4. Каждый термин должен естественно вытекать из контекста предыдущего
-5. Используйте причинно-следственные связи для объяснения взаимосвязи терминов
-6. Завершите фрагмент выводом, подчеркивающим связь между терминами
-
-Пожалуйста, начните лекцию сразу, без вступительных фраз. [/INST]"""
+        # Основной бэкенд загружаем сразу, запасные - при первом обращении
+        self.backends[0].load()
     
     def _process_text(self, text: str) -> str:
         """Базовая обработка сгенерированного текста"""
@@ -156,129 +56,212 @@ class TextGenerator:
     def _verify_text(self, text: str, terms: List[Term]) -> bool:
         """Проверка текста на соответствие требованиям"""
         # Проверяем количество предложений
-        sentences = [s.strip() for s in text.split('.') if s.strip()]
+        sentences = split_sentences(text)
         if len(sentences) < 3:
             logger.warning(f"Мало предложений: {len(sentences)}")
             return False
+
+        # Модель зациклилась и повторяет длинное предложение
+        if has_loop(sentences):
+            logger.warning("Текст содержит повторяющиеся предложения")
+            return False
         
-        # Проверяем использование всех терминов
-        text_lower = text.lower()
-        unused_terms = [t.content for t in terms if t.content.lower() not in text_lower]
+        # Проверяем использование всех терминов (в любой форме слова)
+        unused_terms = TermMatcher([t.content for t in terms]).missing(text)
         if unused_terms:
             logger.warning(f"Не использованы термины: {unused_terms}")
             return False
             
         return True
     
-    def _generate_with_bothub(self, terms: List[Term]) -> Optional[str]:
-        """Генерация текста с использованием BotHub API"""
+    def _new_verifier(self, terms: List[Term]) -> StreamingVerifier:
+        return StreamingVerifier(
+            [t.content for t in terms],
+            min_sentences=self.min_sentences,
+            max_sentences=self.max_sentences,
+            stop_when_satisfied=settings.GENERATION_EARLY_STOP,
+        )
+    
+    def _consume_stream(self, chunks, verifier: StreamingVerifier) -> bool:
+        """
+        Читает поток токенов, пока верификатор не примет решение.
+        Возвращает True, если генерация была остановлена досрочно.
+        """
+        for chunk in chunks:
+            if verifier.feed(chunk) != StreamingVerifier.CONTINUE:
+                # Закрытие генератора прекращает генерацию (и HTTP-поток)
+                chunks.close()
+                return True
+        verifier.finish()
+        return False
+    
+    def _finalize_stream(self, verifier: StreamingVerifier, terms: List[Term], stopped_early: bool, source: str) -> Optional[str]:
+        """Итоговая проверка текста и учет лишних токенов"""
+        processed_text = None
+        accepted = False
+        if verifier.verdict != StreamingVerifier.ABORT:
+            processed_text = self._process_text(verifier.result_text)
+            accepted = self._verify_text(processed_text, terms)
+        
+        wasted = self.stream_stats.record(verifier, accepted, stopped_early)
+        logger.info(
+            f"{source}: получено токенов {verifier.tokens}, лишних {wasted}, "
+            f"предложений {verifier.sentence_count}, решение: {verifier.verdict}"
+            f"{' (досрочно)' if stopped_early else ''}"
+        )
+        return processed_text if accepted else None
+    
+    def _plan(self) -> List[List]:
+        """
+        Группы бэкендов в порядке попыток. При хеджировании к каждому
+        бэкенду добавляется следующий по рейтингу как запасной.
+        """
+        ranked = self.router.order()
+        if self.hedge_after:
+            return [ranked[i:i + 2] for i in range(len(ranked))]
+        return [[backend] for backend in ranked]
+    
+    def _new_trace(self, trace: Optional[Dict]) -> Dict:
+        """
+        Сведения об одном вызове generate(): число попыток и прошедших
+        проверку, токены, время до первого токена, итоговый бэкенд.
+        """
+        trace = {} if trace is None else trace
+        trace.update(started=time.monotonic(), attempts=0, passed=0, tokens=0, ttft=None, backend=None)
+        return trace
+    
+    def _trace_attempt(self, trace: Dict, verifier: StreamingVerifier, first_token_at: Optional[float], source: str, result: Optional[str]) -> None:
+        trace['attempts'] += 1
+        trace['tokens'] += verifier.tokens
+        if trace['ttft'] is None and first_token_at is not None:
+            trace['ttft'] = first_token_at - trace['started']
+        if result:
+            trace['passed'] += 1
+            trace['backend'] = source
+        outcome = 'passed' if result else ('rejected' if source else 'error')
+        telemetry.inc('generation_attempts_total', backend=source or 'none', outcome=outcome)
+    
+    def _observe_trace(self, trace: Dict, outcome: str) -> None:
+        """Метрики завершенного вызова generate(): время, TTFT и токены"""
+        telemetry.observe('generation_duration_seconds', time.monotonic() - trace['started'], outcome=outcome)
+        telemetry.observe('generation_tokens', trace['tokens'], outcome=outcome)
+        if trace['ttft'] is not None:
+            telemetry.observe('generation_ttft_seconds', trace['ttft'], backend=trace['backend'] or 'none')
+    
+    def _generate_with(self, group: List, terms: List[Term], trace: Dict) -> Optional[str]:
+        """Одна попытка генерации группой бэкендов с потоковой проверкой"""
+        verifier = self._new_verifier(terms)
+        if len(group) > 1:
+            stream = HedgedStream(group, terms, self.router, self.hedge_after)
+        else:
+            stream = TimedStream(group[0], terms, self.router)
+        
+        source = None
+        result = None
         try:
-            # Создаем промпт
-            prompt = self._create_prompt(terms)
-            
-            # Создаем сообщения для чата
-            messages = [
-                {
-                    'role': 'system',
-                    'content': '''Ты - опытный преподаватель в университете, читающий лекцию студентам.
-Твой стиль:
-0. Говоришь как любой преподаватель в университете, иногда используя ненаучные термины, запинаешься, не говоришь сразу, добавляешь слова-паразиты.
-1. Говоришь четко и структурированно
-2. Используешь академический стиль речи, но доступно объясняешь сложные термины
-3. Приводишь практические примеры для лучшего понимания
-4. Периодически обращаешься к аудитории ("обратите внимание", "давайте рассмотрим", "как вы можете видеть")
-5. Делаешь логические связки между частями материала
-6. В конце подводишь итог рассмотренной темы
-
-Веди лекцию так, как будто ты стоишь перед аудиторией студентов.'''
-                },
-                {
-                    'role': 'user',
-                    'content': prompt
-                }
-            ]
-            
-            # Запускаем потоковую генерацию
-            stream = self.bothub_client.chat.completions.create(
-                model=self.bothub_model,
-                messages=messages,
-                temperature=0.8,
-                max_tokens=512,
-                top_p=0.9,
-                stream=True
-            )
-            
-            # Собираем текст из потока
-            generated_text = ""
-            for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
-                    generated_text += chunk.choices[0].delta.content
-            
-            # Обрабатываем полученный текст
-            processed_text = self._process_text(generated_text)
-            
-            # Проверяем результат
-            if self._verify_text(processed_text, terms):
-                return processed_text
-            
-            logger.warning("Сгенерированный текст не прошел проверку")
+            stopped_early = self._consume_stream(stream, verifier)
+        except Exception as e:
+            logger.error(f"Ошибка при генерации ({', '.join(stream.started)}): {str(e)}")
+        else:
+            source = stream.winner or ', '.join(stream.started)
+            result = self._finalize_stream(verifier, terms, stopped_early, source)
+            if result is None:
+                logger.warning(f"Текст от {source} не прошел проверку")
+        self._trace_attempt(trace, verifier, stream.first_token_at, source, result)
+        return result
+    
+    async def _agenerate_with(self, backend: GenerationBackend, terms: List[Term], trace: Dict) -> Optional[str]:
+        """Асинхронная попытка генерации бэкендом с собственным astream"""
+        verifier = self._new_verifier(terms)
+        stopped_early = False
+        start = time.monotonic()
+        ttft = None
+        try:
+            # Читаем поток, не блокируя цикл событий
+            stream = backend.astream(terms)
+            try:
+                async for content in stream:
+                    if ttft is None:
+                        ttft = time.monotonic() - start
+                    if verifier.feed(content) != StreamingVerifier.CONTINUE:
+                        stopped_early = True
+                        break
+                else:
+                    verifier.finish()
+            finally:
+                await stream.aclose()
+        except BackendUnavailableError:
+            logger.info(f"Бэкенд {backend.name} временно недоступен")
             return None
-            
         except Exception as e:
-            logger.error(f"Ошибка при использовании BotHub API: {str(e)}")
+            self.router.record(backend.name, ttft, time.monotonic() - start, ok=False)
+            logger.error(f"Ошибка при генерации ({backend.name}): {str(e)}")
+            self._trace_attempt(trace, verifier, None if ttft is None else start + ttft, None, None)
             return None
+        self.router.record(backend.name, ttft, time.monotonic() - start, ok=True)
+        
+        result = self._finalize_stream(verifier, terms, stopped_early, backend.name)
+        if result is None:
+            logger.warning(f"Текст от {backend.name} не прошел проверку")
+        self._trace_attempt(trace, verifier, None if ttft is None else start + ttft, backend.name, result)
+        return result
 
-    def generate(self, terms: List[Term]) -> str:
-        """Генерация текста с использованием заданных терминов"""
+    def generate(self, terms: List[Term], trace: Optional[Dict] = None) -> str:
+        """
+        Генерация текста с использованием заданных терминов.
+        В словарь trace, если он передан, записываются сведения о вызове.
+        """
         if not terms:
             return "Не указаны термины для генерации"
-            
-        # Пробуем сначала использовать BotHub API
-        if self.use_bothub:
-            logger.info("Попытка генерации через BotHub API")
-            result = self._generate_with_bothub(terms)
-            if result:
-                return result
-            logger.warning("Генерация через BotHub API не удалась, переключаемся на локальную модель")
         
-        # Если BotHub недоступен или не удалось сгенерировать текст, используем локальную модель
-        if not self.model:
-            self._load_model()
-            
-        try:
-            # Создаем промпт
-            prompt = self._create_prompt(terms)
-            logger.info(f"Генерация текста для терминов: {[t.content for t in terms]}")
-            logger.debug(f"Промпт: {prompt}")
-            
-            # Генерируем текст
-            logger.info("Запуск генерации...")
-            generated_text = self.model(
-                prompt,
-                max_new_tokens=512,
-                temperature=0.8,
-                top_k=40,
-                top_p=0.9,
-                repetition_penalty=1.15,
-                stop=["</s>", "[INST]", "[/INST]"]
-            )
-            
-            # Обрабатываем текст
-            processed_text = self._process_text(generated_text)
-            
-            # Проверяем результат
-            if not self._verify_text(processed_text, terms):
-                logger.warning("Текст не прошел проверку, пробуем еще раз")
-                return self.generate(terms)  # Пробуем ещё раз
-                
-            logger.info("Генерация успешно завершена")
-            logger.debug(f"Сгенерированный текст: {processed_text}")
-            return processed_text
-            
-        except Exception as e:
-            error_msg = f"Ошибка при генерации: {str(e)}"
-            logger.error(error_msg)
-            return error_msg
+        trace = self._new_trace(trace)
+        logger.info(f"Генерация текста для терминов: {[t.content for t in terms]}")
+        for attempt in range(1, self.max_attempts + 1):
+            for group in self._plan():
+                result = self._generate_with(group, terms, trace)
+                if result:
+                    logger.debug(f"Сгенерированный текст: {result}")
+                    self._observe_trace(trace, 'ok')
+                    return result
+            logger.warning(f"Попытка {attempt}: ни один бэкенд не дал подходящего текста")
+        
+        self._observe_trace(trace, 'failed')
+        raise GenerationError(f"Не удалось сгенерировать текст за {self.max_attempts} попыток")
+
+    async def agenerate(self, terms: List[Term], trace: Optional[Dict] = None) -> str:
+        """
+        Асинхронная версия generate() для ASGI-представлений.
+        Бэкенды с собственным astream ожидаются без занятия потока,
+        остальные (и хеджирование) выполняются в пуле потоков.
+        """
+        if not terms:
+            return "Не указаны термины для генерации"
+        
+        trace = self._new_trace(trace)
+        loop = asyncio.get_running_loop()
+        logger.info(f"Асинхронная генерация текста для терминов: {[t.content for t in terms]}")
+        for attempt in range(1, self.max_attempts + 1):
+            for group in self._plan():
+                if len(group) == 1 and group[0].supports_async:
+                    result = await self._agenerate_with(group[0], terms, trace)
+                else:
+                    result = await loop.run_in_executor(None, self._generate_with, group, terms, trace)
+                if result:
+                    self._observe_trace(trace, 'ok')
+                    return result
+            logger.warning(f"Попытка {attempt}: ни один бэкенд не дал подходящего текста")
+        
+        self._observe_trace(trace, 'failed')
+        raise GenerationError(f"Не удалось сгенерировать текст за {self.max_attempts} попыток")
+
+    def status(self) -> Dict:
+        """Состояние генератора для мониторинга"""
+        return {
+            'backends': {b.name: b.status() for b in self.backends},
+            'routing': self.router.snapshot(),
+            'hedge_after': self.hedge_after,
+            'stream': self.stream_stats.snapshot(),
+        }
 
 # Глобальный экземпляр генератора
 _generator = None
@@ -289,3 +272,9 @@ def get_generator() -> TextGenerator:
     if _generator is None:
         _generator = TextGenerator()
     return _generator
+
+def set_generator(generator: Optional[TextGenerator]) -> Optional[TextGenerator]:
+    """Подменяет глобальный генератор (бенчмарки, тесты); возвращает прежний"""
+    global _generator
+    previous, _generator = _generator, generator
+    return previous
@@ -1,10 +1,31 @@
+import atexit
+import contextvars
+import copy
 import logging
 import logging.config
+import logging.handlers
 import os
+import queue
+import random
+
+try:
+    from pythonjsonlogger.json import JsonFormatter
+except ImportError:  # python-json-logger < 3
+    from pythonjsonlogger.jsonlogger import JsonFormatter
+
+# ID текущего запроса (ставит RequestIdMiddleware)
+request_id = contextvars.ContextVar('request_id', default='-')
+
+# Логгеры, которые настраивает проект
+LOGGERS = ('django', 'django.server', 'django.request', 'main')
+
+# Поток записи логов (режим LOG_QUEUE)
+_listener = None
+
 
 class ColoredFormatter(logging.Formatter):
     """Форматтер для цветного вывода логов"""
-    
+
     COLORS = {
         'DEBUG': '\033[37m',     # Серый
         'INFO': '\033[32m',      # Зеленый
@@ -13,7 +34,7 @@ class ColoredFormatter(logging.Formatter):
         'CRITICAL': '\033[41m',  # Красный фон
     }
     RESET = '\033[0m'
-    
+
     def formatMessage(self, record):
         """
         Форматирует сообщение с цветом.
@@ -25,68 +46,156 @@ class ColoredFormatter(logging.Formatter):
             return color + self._style.format(record) + self.RESET
         return self._style.format(record)
 
+
+class RequestIdFilter(logging.Filter):
+    """Добавляет в запись ID запроса, в контексте которого она создана"""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только долю записей ниже WARNING от шумных логгеров.
+    rates - {имя логгера: доля}, правило логгера действует и на его потомков
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        # Более конкретные имена проверяются первыми
+        self.rates = sorted((rates or {}).items(), key=lambda item: -len(item[0]))
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + '.'):
+                return random.random() < rate
+        return True
+
+
+class PreparedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который передает в очередь сообщение и текст исключения,
+    не форматируя запись целиком: формат применяют обработчики в потоке записи
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_sampling(entries):
+    """Правила выборки из настройки LOG_SAMPLING: ['main.llm_generator=0.1', ...]"""
+    rates = {}
+    for entry in entries:
+        name, _, rate = entry.partition('=')
+        rates[name.strip()] = float(rate)
+    return rates
+
+
 def setup_logging():
     """Настройка логирования для всего проекта"""
-    
+    global _listener
+    from django.conf import settings
+
     # Создаем директорию для логов если её нет
-    log_dir = "logs"
+    log_dir = settings.LOG_DIR
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
-    
+    level = settings.LOG_LEVEL
+
+    # Файл ротируется по времени (LOG_ROTATE_WHEN) или по размеру
+    file_handler = {
+        'formatter': 'json' if settings.LOG_FORMAT == 'json' else 'detailed',
+        'level': level,
+        'filename': os.path.join(log_dir, 'dictgen.log'),
+        'backupCount': settings.LOG_BACKUP_COUNT,
+        'encoding': 'utf-8',
+    }
+    if settings.LOG_ROTATE_WHEN:
+        file_handler.update({'class': 'logging.handlers.TimedRotatingFileHandler', 'when': settings.LOG_ROTATE_WHEN})
+    else:
+        file_handler.update({'class': 'logging.handlers.RotatingFileHandler', 'maxBytes': settings.LOG_MAX_BYTES})
+
+    # В режиме очереди фильтры работают в потоке запроса (там известен его ID)
+    filters = [] if settings.LOG_QUEUE else ['request_id', 'sampling']
     config = {
         'version': 1,
         'disable_existing_loggers': True,  # Отключаем существующие логгеры
+        'filters': {
+            'request_id': {'()': RequestIdFilter},
+            'sampling': {'()': SamplingFilter, 'rates': parse_sampling(settings.LOG_SAMPLING)},
+        },
         'formatters': {
             'colored': {
                 '()': ColoredFormatter,
-                'format': '[ %(levelname)s ]: %(asctime)s.%(msecs)03d: %(name)s: %(message)s',
+                'format': '[ %(levelname)s ]: %(asctime)s.%(msecs)03d: %(name)s: [%(request_id)s] %(message)s',
                 'datefmt': '%H:%M:%S'
             },
             'detailed': {
-                'format': '[ %(levelname)s ]: %(asctime)s.%(msecs)03d: %(name)s: %(message)s',
+                'format': '[ %(levelname)s ]: %(asctime)s.%(msecs)03d: %(name)s: [%(request_id)s] %(message)s',
                 'datefmt': '%H:%M:%S'
-            }
+            },
+            'json': {
+                '()': JsonFormatter,
+                'fmt': '%(asctime)s %(levelname)s %(name)s %(message)s %(request_id)s %(process)d %(threadName)s',
+                'rename_fields': {'levelname': 'level', 'asctime': 'time'},
+                'json_ensure_ascii': False,
+            },
         },
         'handlers': {
             'console': {
                 'class': 'logging.StreamHandler',
-                'formatter': 'colored',
-                'level': 'INFO'
+                'formatter': 'json' if settings.LOG_FORMAT == 'json' else 'colored',
+                'level': level,
+                'filters': filters,
             },
-            'file': {
-                'class': 'logging.FileHandler',
-                'filename': os.path.join(log_dir, 'dictgen.log'),
-                'formatter': 'detailed',
-                'level': 'INFO'
-            }
+            'file': dict(file_handler, filters=filters),
         },
         'root': {  # Корневой логгер
             'handlers': ['console', 'file'],
-            'level': 'INFO',
+            'level': level,
         },
+        # Логгеры Django, сервера, запросов и нашего приложения
         'loggers': {
-            'django': {  # Логгер Django
-                'handlers': ['console', 'file'],
-                'level': 'INFO',
-                'propagate': False
-            },
-            'django.server': {  # Логгер Django сервера
-                'handlers': ['console', 'file'],
-                'level': 'INFO',
-                'propagate': False
-            },
-            'django.request': {  # Логгер Django запросов
-                'handlers': ['console', 'file'],
-                'level': 'INFO',
-                'propagate': False
-            },
-            'main': {  # Логгер нашего приложения
-                'handlers': ['console', 'file'],
-                'level': 'INFO',
-                'propagate': False
-            }
-        }
+            name: {'handlers': ['console', 'file'], 'level': level, 'propagate': False}
+            for name in LOGGERS
+        },
     }
-    
+
+    # Повторная настройка (автоперезагрузка) - останавливаем прежний поток записи
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
     # Применяем конфигурацию
-    logging.config.dictConfig(config) 
\ No newline at end of file
+    logging.config.dictConfig(config)
+    if not settings.LOG_QUEUE:
+        return
+
+    # Запись на диск и в консоль выполняет отдельный поток; потоки запросов
+    # только кладут подготовленные записи в очередь
+    handlers = logging.getLogger().handlers[:]
+    records = queue.SimpleQueue()
+    queue_handler = PreparedQueueHandler(records)
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(SamplingFilter(parse_sampling(settings.LOG_SAMPLING)))
+    for name in (None,) + LOGGERS:
+        logging.getLogger(name).handlers = [queue_handler]
+
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+@atexit.register
+def _stop_listener():
+    # Дописываем оставшиеся в очереди записи при завершении процесса
+    if _listener is not None:
+        _listener.stop()
@@ -0,0 +1,61 @@
+import json
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from main.alignment import ALGORITHMS, align
+from main.corpus import DEFAULT_RATES, SAMPLE_TEXTS, build_text, inject_errors
+from main.scoring import tokenize
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение алгоритмов выравнивания токенов (indel, levenshtein, difflib) '
+        'на синтетических диктантах от 1 до 10 тысяч токенов. Отчет в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', default='1000,2500,5000,10000', help='Размеры текстов в токенах')
+        parser.add_argument('--algorithms', default=','.join(ALGORITHMS))
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов (берется лучшее время)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        algorithms = [a for a in options['algorithms'].split(',') if a]
+        unknown = set(algorithms) - set(ALGORITHMS)
+        if unknown:
+            raise CommandError(f"Неизвестные алгоритмы: {sorted(unknown)}")
+
+        rng = random.Random(options['seed'])
+        report = {'algorithms': algorithms, 'sizes': []}
+        for target in (int(t) for t in options['tokens'].split(',') if t):
+            # Около 15% токенов - знаки препинания
+            task_text = build_text(SAMPLE_TEXTS, int(target * 0.85), rng)
+            attempt_text, _ = inject_errors(task_text, DEFAULT_RATES, rng)
+            task_tokens = tokenize(task_text.lower())
+            attempt_tokens = tokenize(attempt_text.lower())
+
+            entry = {'task_tokens': len(task_tokens), 'attempt_tokens': len(attempt_tokens), 'results': {}}
+            opcodes = {}
+            for algorithm in algorithms:
+                best = None
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    opcodes[algorithm] = align(task_tokens, attempt_tokens, algorithm)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                changed = [op for op in opcodes[algorithm] if op[0] != 'equal']
+                entry['results'][algorithm] = {
+                    'seconds': best,
+                    'blocks': len(changed),
+                    # Сколько токенов задания попало в неравные блоки
+                    'changed_task_tokens': sum(op[2] - op[1] for op in changed),
+                }
+
+            if 'difflib' in opcodes:
+                base = entry['results']['difflib']['seconds']
+                for algorithm, result in entry['results'].items():
+                    result['speedup_vs_difflib'] = base / result['seconds'] if result['seconds'] else None
+                    result['same_opcodes_as_difflib'] = opcodes[algorithm] == opcodes['difflib']
+            report['sizes'].append(entry)
+
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connections
+from rest_framework.test import APIRequestFactory, force_authenticate
+from main.generation_backends import GenerationError, StubBackend
+from main.llm_generator import TextGenerator, set_generator
+from main.generation_pool import term_key
+from main.models import GenerationRequest, Term, User
+from main.views import GenerateTextView
+from main.stats import percentile
+
+
+class TracingGenerator(TextGenerator):
+    """Генератор, сохраняющий сведения о каждом вызове generate()"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._traces_lock = threading.Lock()
+        self.traces = []
+
+    def generate(self, terms, trace=None):
+        trace = {} if trace is None else trace
+        try:
+            return super().generate(terms, trace)
+        finally:
+            with self._traces_lock:
+                self.traces.append(trace)
+
+
+def distribution(values):
+    return {
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк генерации текста без сети и модели: заглушка с заданной скоростью '
+        'токенов и долей ошибок, одновременные вызовы TextGenerator.generate и '
+        'GenerateTextView. Отчет в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['generator', 'view', 'both'], default='both')
+        parser.add_argument('--requests', type=int, default=50, help='Всего вызовов в каждом режиме')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--terms', default='энтропия,теплота,температура', help='Термины через запятую')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--token-rate', type=float, default=200.0, help='Токенов в секунду (0 - без задержки)')
+        parser.add_argument('--first-token-delay', type=float, default=0.05, help='Задержка первого токена, сек.')
+        parser.add_argument('--failure-rate', type=float, default=0.1, help='Доля ошибок бэкенда')
+        parser.add_argument('--invalid-rate', type=float, default=0.1, help='Доля текстов, не проходящих проверку')
+        parser.add_argument('--pattern', default='', help='Последовательность исходов: ok,error,midstream,invalid')
+        parser.add_argument('--hedge-after', type=float, default=None, help='Хеджирование (по умолчанию из настроек)')
+        parser.add_argument('--use-settings', action='store_true', help='Бэкенды из GENERATION_BACKENDS вместо заглушки')
+        parser.add_argument('--output', help='Файл для JSON-отчета')
+
+    def handle(self, *args, **options):
+        modes = ['generator', 'view'] if options['mode'] == 'both' else [options['mode']]
+        report = {
+            'config': {k: options[k] for k in (
+                'requests', 'concurrency', 'terms', 'seed', 'token_rate', 'first_token_delay',
+                'failure_rate', 'invalid_rate', 'pattern', 'hedge_after', 'use_settings',
+            )},
+        }
+        for mode in modes:
+            # Для каждого режима - новый генератор с той же последовательностью исходов
+            generator = self.create_generator(options)
+            report[mode] = self.run_generator(generator, options) if mode == 'generator' else self.run_view(generator, options)
+            report[mode]['backends'] = generator.status()['backends']
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    def create_generator(self, options):
+        backends = None
+        if not options['use_settings']:
+            backends = [StubBackend(
+                seed=options['seed'],
+                token_rate=options['token_rate'],
+                first_token_delay=options['first_token_delay'],
+                failure_rate=options['failure_rate'],
+                invalid_rate=options['invalid_rate'],
+                pattern=[p for p in options['pattern'].split(',') if p],
+            )]
+        generator = TracingGenerator(backends)
+        if options['hedge_after'] is not None:
+            generator.hedge_after = options['hedge_after']
+        return generator
+
+    def run_concurrently(self, call, options):
+        """Выполняет call() requests раз в concurrency потоков; возвращает задержки и результаты"""
+        def timed(_):
+            start = time.perf_counter()
+            try:
+                ok = call()
+            except GenerationError:
+                ok = False
+            finally:
+                # Соединения с БД открываются в потоках пула
+                connections.close_all()
+            return time.perf_counter() - start, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(timed, range(options['requests'])))
+        return time.perf_counter() - started, results
+
+    def summarize(self, generator, duration, results):
+        latencies = [latency for latency, ok in results if ok]
+        traces = list(generator.traces)
+        attempts = sum(t.get('attempts', 0) for t in traces)
+        passed = sum(t.get('passed', 0) for t in traces)
+        tokens = sum(t.get('tokens', 0) for t in traces)
+        successes = len(latencies)
+        return {
+            'requests': len(results),
+            'failures': len(results) - successes,
+            'duration': duration,
+            'throughput_rps': successes / duration if duration else None,
+            'latency': distribution(latencies),
+            'ttft': distribution([t['ttft'] for t in traces if t.get('ttft') is not None]),
+            'tokens': tokens,
+            'tokens_per_second': tokens / duration if duration else None,
+            'attempts': attempts,
+            'pass_rate': passed / attempts if attempts else None,
+            'retries': {
+                'total': attempts - successes,
+                'per_request': (attempts - successes) / len(results) if results else None,
+            },
+        }
+
+    def run_generator(self, generator, options):
+        """Прямые вызовы TextGenerator.generate"""
+        terms = [Term(content=t.strip()) for t in options['terms'].split(',') if t.strip()]
+        duration, results = self.run_concurrently(lambda: bool(generator.generate(terms)), options)
+        return self.summarize(generator, duration, results)
+
+    def run_view(self, generator, options):
+        """
+        Вызовы GenerateTextView через APIRequestFactory (без HTTP-сервера).
+        Термины создаются в БД на время бенчмарка и затем удаляются
+        вместе с записями журнала генерации.
+        """
+        terms = [
+            Term.objects.create(content=t.strip(), subject='benchmark')
+            for t in options['terms'].split(',') if t.strip()
+        ]
+        # Несохраненный пользователь: представлению нужна только аутентификация
+        user = User(username='benchmark', role='teacher')
+        factory = APIRequestFactory()
+        view = GenerateTextView.as_view()
+
+        def call():
+            request = factory.post('/api/generate-text/', {'terms': [t.id for t in terms]}, format='json')
+            force_authenticate(request, user=user)
+            return view(request).status_code == 200
+
+        previous = set_generator(generator)
+        try:
+            duration, results = self.run_concurrently(call, options)
+        finally:
+            set_generator(previous)
+            # Запросы бенчмарка не должны влиять на популярность наборов в пуле
+            GenerationRequest.objects.filter(term_key=term_key(t.id for t in terms)).delete()
+            Term.objects.filter(id__in=[t.id for t in terms]).delete()
+        return self.summarize(generator, duration, results)
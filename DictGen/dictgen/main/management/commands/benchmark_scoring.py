@@ -0,0 +1,200 @@
+import json
+import time
+import tracemalloc
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from main.corpus import DEFAULT_RATES, ERROR_TYPES, SIZES, make_corpus
+from main.models import Attempt, Task, User
+from main.serializers import AttemptSerializer
+from main.utils import analyze_errors, calculate_metrics
+from main.stats import percentile
+
+STAGES = ('analyze_errors', 'calculate_metrics', 'serializer')
+
+
+class Rollback(Exception):
+    """Откат транзакции бенчмарка"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк проверки попыток на синтетическом корпусе: время этапов '
+        '(analyze_errors, calculate_metrics, AttemptSerializer), попыток в секунду, '
+        'пиковая память. Сравнивает результат с сохраненным базовым отчетом. '
+        'Все записи в БД откатываются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=','.join(SIZES), help=f"Объемы текстов: {', '.join(SIZES)}")
+        parser.add_argument('--samples', type=int, default=3, help='Текстов каждого объема')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов проверки каждого текста')
+        parser.add_argument('--seed', type=int, default=0)
+        for error_type in ERROR_TYPES:
+            parser.add_argument(
+                f'--{error_type}-rate', type=float, default=DEFAULT_RATES[error_type],
+                help=f'Доля слов с ошибкой типа {error_type}'
+            )
+        parser.add_argument('--from-db', action='store_true', help='Брать базовые тексты из заданий в БД')
+        parser.add_argument('--no-memory', action='store_true', help='Не измерять пиковую память (tracemalloc)')
+        parser.add_argument('--baseline', help='Базовый отчет для поиска регрессий')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Допустимое ухудшение относительно базы')
+        parser.add_argument('--save-baseline', help='Сохранить отчет как базовый')
+
+    def handle(self, *args, **options):
+        sizes = [s for s in options['sizes'].split(',') if s]
+        unknown = set(sizes) - set(SIZES)
+        if unknown:
+            raise CommandError(f"Неизвестные объемы: {sorted(unknown)}")
+        rates = {t: options[f'{t}_rate'] for t in ERROR_TYPES}
+
+        base_texts = None
+        if options['from_db']:
+            base_texts = list(Task.objects.values_list('content', flat=True)[:100])
+        corpus = make_corpus(base_texts, sizes, options['samples'], rates, options['seed'])
+
+        report = {
+            'config': {
+                'sizes': sizes,
+                'samples': options['samples'],
+                'repeat': options['repeat'],
+                'seed': options['seed'],
+                'rates': rates,
+                'from_db': options['from_db'],
+            },
+            'sizes': {},
+        }
+        try:
+            # Все созданные записи откатываются в конце
+            with transaction.atomic():
+                user = User.objects.create(
+                    username=f'benchmark_{uuid.uuid4().hex[:8]}',
+                    email='benchmark@example.com',
+                    first_name='Benchmark',
+                    last_name='Scoring',
+                    role='teacher',
+                )
+                for size in sizes:
+                    samples = [s for s in corpus if s['size'] == size]
+                    report['sizes'][size] = self.run_size(samples, user, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            report['regressions'] = self.find_regressions(report, baseline, options['tolerance'])
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+        if report.get('regressions'):
+            raise CommandError(f"Найдены регрессии производительности: {len(report['regressions'])}")
+
+    def grade(self, task, content, timings=None):
+        """Проверка одной попытки по этапам; возвращает число найденных ошибок"""
+        def timed(stage, func):
+            start = time.perf_counter()
+            result = func()
+            if timings is not None:
+                timings[stage].append(time.perf_counter() - start)
+            return result
+
+        attempt = Attempt.objects.create(task=task, content=content, stage='submitted')
+        errors = timed('analyze_errors', lambda: analyze_errors(attempt))
+        timed('calculate_metrics', lambda: calculate_metrics(attempt))
+
+        # Путь API: сериализатор сам создает попытку, ошибки и метрики
+        serializer = AttemptSerializer(data={'task': task.id, 'content': content, 'stage': 'submitted'})
+        serializer.is_valid(raise_exception=True)
+        timed('serializer', serializer.save)
+        return len(errors)
+
+    def memory_peaks(self, task, content):
+        """Пиковая память каждого этапа (КиБ) для одной попытки"""
+        peaks = {}
+        attempt = Attempt.objects.create(task=task, content=content, stage='submitted')
+        serializer = AttemptSerializer(data={'task': task.id, 'content': content, 'stage': 'submitted'})
+        serializer.is_valid(raise_exception=True)
+        stages = {
+            'analyze_errors': lambda: analyze_errors(attempt),
+            'calculate_metrics': lambda: calculate_metrics(attempt),
+            'serializer': serializer.save,
+        }
+        tracemalloc.start()
+        try:
+            for stage in STAGES:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                stages[stage]()
+                peaks[stage] = (tracemalloc.get_traced_memory()[1] - before) / 1024
+        finally:
+            tracemalloc.stop()
+        return peaks
+
+    def run_size(self, samples, user, options):
+        timings = {stage: [] for stage in STAGES}
+        found = []
+        for sample in samples:
+            task = Task.objects.create(
+                title=f"Бенчмарк: {sample['size']}",
+                content=sample['task_text'],
+                length=len(sample['task_text']),
+                min_words=1,
+                max_words=sample['words'] * 2,
+                min_sentences=1,
+                max_sentences=sample['words'],
+                user=user,
+                teacher=user,
+            )
+            # Первый прогон прогревает кэши морфологического анализатора
+            self.grade(task, sample['attempt_text'])
+            for _ in range(options['repeat']):
+                found.append(self.grade(task, sample['attempt_text'], timings))
+
+        result = {
+            'samples': len(samples),
+            'words': sum(s['words'] for s in samples) / len(samples),
+            'errors_injected': sum(sum(s['injected'].values()) for s in samples) / len(samples),
+            'errors_found': sum(found) / len(found),
+            'stages': {
+                stage: {
+                    'mean': sum(values) / len(values),
+                    'p50': percentile(values, 50),
+                    'p95': percentile(values, 95),
+                }
+                for stage, values in timings.items()
+            },
+            # Полный путь API (сериализатор) - сколько попыток проверяется в секунду
+            'attempts_per_second': len(timings['serializer']) / sum(timings['serializer']),
+        }
+        if not options['no_memory']:
+            result['memory_peak_kib'] = self.memory_peaks(task, samples[-1]['attempt_text'])
+        return result
+
+    def find_regressions(self, report, baseline, tolerance):
+        """Этапы, ставшие медленнее (p50) или прожорливее базы больше чем на tolerance"""
+        regressions = []
+        for size, current in report['sizes'].items():
+            base = baseline.get('sizes', {}).get(size)
+            if not base:
+                continue
+            for stage in STAGES:
+                checks = [('p50', current['stages'][stage]['p50'], base['stages'].get(stage, {}).get('p50'))]
+                if 'memory_peak_kib' in current and 'memory_peak_kib' in base:
+                    checks.append(('memory_peak_kib', current['memory_peak_kib'][stage], base['memory_peak_kib'].get(stage)))
+                for metric, value, base_value in checks:
+                    if base_value and value > base_value * (1 + tolerance):
+                        regressions.append({
+                            'size': size,
+                            'stage': stage,
+                            'metric': metric,
+                            'baseline': base_value,
+                            'current': value,
+                            'ratio': value / base_value,
+                        })
+        return regressions
@@ -0,0 +1,147 @@
+import json
+import random
+import re
+import time
+from django.core.management.base import BaseCommand
+from main.scoring import morph
+from main.text_verification import TermMatcher, split_sentences
+
+MIN_SENTENCES = 3
+INFLECTED_POS = ('NOUN', 'ADJF', 'PRTF', 'NUMR')
+
+# Наборы терминов бенчмарка: однословные и многословные, в словарной форме
+TERM_SETS = [
+    ['энтропия', 'теплота', 'температура'],
+    ['второе начало термодинамики', 'энтропия'],
+    ['идеальный газ', 'давление', 'объем'],
+    ['фотосинтез', 'хлоропласт', 'глюкоза'],
+    ['кинетическая энергия', 'скорость', 'масса'],
+    ['электрическое поле', 'заряд', 'напряженность'],
+    ['клетка', 'мембрана', 'ядро'],
+    ['реакция', 'катализатор', 'молекула'],
+]
+
+# Предложения с термином в нужном падеже - как в ответах модели
+TEMPLATES = [
+    ('nomn', '{} играет важную роль в этом процессе.'),
+    ('nomn', 'Именно {} определяет поведение системы!'),
+    ('gent', 'Изучение {} началось еще в XIX в. и продолжается сегодня.'),
+    ('gent', 'Без {} невозможно объяснить результаты опыта.'),
+    ('datv', 'Этому явлению, т. е. {}, посвящены многие работы.'),
+    ('accs', 'Ученые измеряют {} с помощью точных приборов.'),
+    ('ablt', 'Связь с {} описал проф. Иванов в своем учебнике.'),
+    ('loct', 'О {} подробно рассказано в гл. 3 учебника.'),
+]
+
+FILLERS = [
+    'Почему это так важно?',
+    'Подробнее об этом см. рис. 2 и табл. 1.',
+    'Этот вывод подтвердили опыты А. С. Попова и др. исследователей.',
+    'Значение 3.14 здесь лишь приближение.',
+    'Результаты опытов повторялись много раз.',
+]
+
+
+def inflect_term(term, case):
+    """Термин в падеже case: согласованные слова до первого существительного включительно"""
+    words, result, head_found = term.split(), [], False
+    for i, word in enumerate(words):
+        # Разбор-омоним с изменяемой частью речи («начало» - не глагол);
+        # перед другими словами - прилагательное («второе» - не существительное)
+        parses = [p for p in morph.parse(word) if p.tag.POS in INFLECTED_POS]
+        if i < len(words) - 1:
+            parses.sort(key=lambda p: p.tag.POS == 'NOUN')
+        parse = parses[0] if parses else None
+        if head_found or parse is None:
+            result.append(word)
+            continue
+        form = parse.inflect({case})
+        result.append(form.word if form else word)
+        head_found = parse.tag.POS == 'NOUN'
+    return ' '.join(result)
+
+
+def make_samples(count, seed, invalid_rate):
+    """Синтетические ответы модели: (термины, текст, текст корректен)"""
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        terms = rng.choice(TERM_SETS)
+        used = list(terms)
+        if rng.random() < invalid_rate:
+            used.remove(rng.choice(used))  # Модель пропустила термин
+        sentences = [rng.choice(TEMPLATES) for _ in used]
+        sentences = [template.format(inflect_term(term, case)) for term, (case, template) in zip(used, sentences)]
+        sentences += rng.sample(FILLERS, rng.randint(0, 2))
+        rng.shuffle(sentences)
+        text = ' '.join(s[0].upper() + s[1:] for s in sentences)
+        samples.append((terms, text, len(used) == len(terms) and len(sentences) >= MIN_SENTENCES))
+    return samples
+
+
+def legacy_verify(text, terms):
+    """Прежняя проверка: границы по любому знаку конца, термин - точная подстрока"""
+    if len([s for s in re.split(r'[.!?…]+', text) if s.strip()]) < MIN_SENTENCES:
+        return 'sentences'
+    if any(term.lower() not in text.lower() for term in terms):
+        return 'terms'
+    return None
+
+
+def lemma_verify(text, terms):
+    """Текущая проверка (как TextGenerator._verify_text)"""
+    if len(split_sentences(text)) < MIN_SENTENCES:
+        return 'sentences'
+    if TermMatcher(terms).missing(text):
+        return 'terms'
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Доля текстов, отклоненных проверкой генератора, и ожидаемое число повторных генераций: '
+        'прежняя проверка (точная подстрока, разбиение по любой точке) против проверки по леммам. '
+        'Тексты - синтетические ответы модели с терминами в разных падежах или файл JSON Lines '
+        'с полями terms и text (сохраненные ответы модели). Отчет в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=500, help='Синтетических текстов')
+        parser.add_argument('--invalid-rate', type=float, default=0.1, help='Доля синтетических текстов без термина')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--texts', help='Файл JSON Lines с ответами модели вместо синтетических текстов')
+        parser.add_argument('--output', help='Файл для JSON-отчета')
+
+    def handle(self, *args, **options):
+        if options['texts']:
+            with open(options['texts'], encoding='utf-8') as file:
+                samples = [(row['terms'], row['text'], None) for row in map(json.loads, file) if row]
+        else:
+            samples = make_samples(options['samples'], options['seed'], options['invalid_rate'])
+
+        report = {'samples': len(samples)}
+        for name, verify in (('legacy', legacy_verify), ('lemma', lemma_verify)):
+            report[name] = self.evaluate(verify, samples)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    def evaluate(self, verify, samples):
+        start = time.perf_counter()
+        reasons = [verify(text, terms) for terms, text, _ in samples]
+        elapsed = time.perf_counter() - start
+        passed = reasons.count(None)
+        pass_rate = passed / len(samples) if samples else 0
+        result = {
+            'pass_rate': round(pass_rate, 4),
+            # Геометрическое распределение: повторов на один принятый текст
+            'retries_per_text': round((1 - pass_rate) / pass_rate, 3) if pass_rate else None,
+            'rejected': {reason: reasons.count(reason) for reason in ('sentences', 'terms')},
+            'ms_per_text': round(elapsed * 1000 / len(samples), 3) if samples else None,
+        }
+        if samples and samples[0][2] is not None:
+            result['false_rejects'] = sum(1 for r, s in zip(reasons, samples) if r and s[2])
+            result['false_accepts'] = sum(1 for r, s in zip(reasons, samples) if not r and not s[2])
+        return result
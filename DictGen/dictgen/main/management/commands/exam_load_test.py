@@ -0,0 +1,237 @@
+import asyncio
+import json
+import random
+import time
+import httpx
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from main.corpus import DEFAULT_RATES, inject_errors, make_corpus
+from main.models import Cohort, Task, TaskAssignment, Term, User
+from main.stats import percentile
+
+ENDPOINTS = ('login', 'task_list', 'attempt', 'generate_text')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест «экзамен в 9:00»: ученики всех классов за короткое окно '
+        'входят в систему (LoginView), получают список заданий (TaskListView) и '
+        'отправляют попытки; преподаватели генерируют тексты. Пользователи, группы, '
+        'задания (одно на класс) и термины создаются в БД сервера. Сервер запускается с заглушкой генерации: '
+        'GENERATION_BACKENDS=stub. Отчет по эндпоинтам в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--classes', type=int, default=40)
+        parser.add_argument('--students', type=int, default=25, help='Учеников в классе')
+        parser.add_argument('--terms', type=int, default=20, help='Терминов для генерации')
+        parser.add_argument('--generations', type=int, default=1, help='Генераций на преподавателя')
+        parser.add_argument('--window', type=float, default=120.0, help='Окно прихода учеников (сек.)')
+        parser.add_argument('--think', type=float, default=5.0, help='Среднее время между списком и отправкой (сек.)')
+        parser.add_argument('--concurrency', type=int, default=200, help='Одновременных HTTP-запросов')
+        parser.add_argument('--async-attempts', action='store_true', help='Отправлять попытки в attempts/async/')
+        parser.add_argument('--timeout', type=float, default=120.0)
+        parser.add_argument('--password', default='exam-load-test')
+        parser.add_argument('--prefix', default='exam', help='Префикс имен созданных пользователей')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-seed', action='store_true', help='Использовать уже созданные данные')
+        parser.add_argument('--cleanup', action='store_true', help='Удалить созданные данные и выйти')
+        parser.add_argument('--allow-llm', action='store_true', help='Не требовать заглушку генерации на сервере')
+        parser.add_argument('--output', help='Файл для сохранения отчета (JSON)')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted = self.cleanup(options['prefix'])
+            self.stdout.write(f"Удалено пользователей: {deleted}")
+            return
+
+        if not options['no_seed']:
+            self.cleanup(options['prefix'])
+            self.seed(options)
+        plan = self.load_plan(options['prefix'])
+        if not plan['students']:
+            raise CommandError('Нет данных теста: запустите без --no-seed')
+
+        report = asyncio.run(self.run(plan, options))
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(text)
+        self.stdout.write(text)
+
+    def cleanup(self, prefix):
+        # Задания и попытки удаляются каскадно
+        Term.objects.filter(subject=f'{prefix}_load').delete()
+        _, deleted = User.objects.filter(username__startswith=f'{prefix}_').delete()
+        return deleted.get(User._meta.label, 0)
+
+    @transaction.atomic
+    def seed(self, options):
+        """Классы: преподаватель, группа учеников и задание с текстом диктанта, назначенное группе"""
+        prefix = options['prefix']
+        # Хэш пароля один на всех: вычислять его для каждого пользователя слишком долго
+        password = make_password(options['password'])
+        corpus = make_corpus(sizes=['page'], samples_per_size=options['classes'], rates=DEFAULT_RATES, seed=options['seed'])
+
+        users = []
+        for c in range(options['classes']):
+            users.append(User(
+                username=f'{prefix}_t{c}', email=f'{prefix}_t{c}@example.com',
+                first_name='Учитель', last_name=str(c), role='teacher', password=password,
+            ))
+            users.extend(
+                User(
+                    username=f'{prefix}_c{c}_s{s}', email=f'{prefix}_c{c}_s{s}@example.com',
+                    first_name='Ученик', last_name=f'{c}-{s}', role='student', password=password,
+                )
+                for s in range(options['students'])
+            )
+        User.objects.bulk_create(users, batch_size=500)
+        users = {u.username: u for u in User.objects.filter(username__startswith=f'{prefix}_')}
+
+        Term.objects.bulk_create([
+            Term(content=f'термин{i}', length=len(f'термин{i}'), subject=f'{prefix}_load')
+            for i in range(options['terms'])
+        ])
+
+        # Одно задание на класс, назначенное группе учеников
+        for c, sample in enumerate(corpus):
+            teacher = users[f'{prefix}_t{c}']
+            students = [users[f'{prefix}_c{c}_s{s}'] for s in range(options['students'])]
+            cohort = Cohort.objects.create(name=f'Класс {c}', teacher=teacher)
+            cohort.students.set(students)
+            task = Task.objects.create(
+                title=f'Экзамен, класс {c}', content=sample['task_text'], length=len(sample['task_text']),
+                min_words=1, max_words=sample['words'] * 2, min_sentences=1, max_sentences=sample['words'],
+                status='published', user=teacher, teacher=teacher, is_public=False,
+            )
+            task.assign_students([student.id for student in students], cohort=cohort)
+        self.stderr.write(f"Создано: пользователей {len(users)}, заданий {len(corpus)}, терминов {options['terms']}")
+
+    def load_plan(self, prefix):
+        """Ученики с их заданием и текстом попытки, преподаватели и термины"""
+        rng = random.Random(0)
+        students = []
+        assignments = (
+            TaskAssignment.objects.filter(student__username__startswith=f'{prefix}_c')
+            .select_related('student', 'task').order_by('id')
+        )
+        for assignment in assignments:
+            # Текст попытки - текст задания с ошибками
+            attempt_text, _ = inject_errors(assignment.task.content, DEFAULT_RATES, rng)
+            students.append({'username': assignment.student.username, 'task': assignment.task_id, 'content': attempt_text})
+        teachers = list(User.objects.filter(username__startswith=f'{prefix}_t').values_list('username', flat=True))
+        terms = list(Term.objects.filter(subject=f'{prefix}_load').values_list('id', flat=True))
+        return {'students': students, 'teachers': teachers, 'terms': terms}
+
+    async def request(self, client, limit, results, endpoint, method, url, **kwargs):
+        """HTTP-запрос с замером; возвращает JSON ответа или None при ошибке"""
+        async with limit:
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            end = time.perf_counter()
+        results[endpoint].append((start, end, status))
+        if response is None or response.status_code >= 400:
+            return None
+        return response.json()
+
+    async def login(self, client, limit, results, username, options):
+        data = await self.request(client, limit, results, 'login', 'POST', '/api/auth/login/', json={
+            'username': username, 'password': options['password'],
+        })
+        return {'Authorization': f"Bearer {data['access']}"} if data else None
+
+    async def student(self, client, limit, results, student, options, rng):
+        await asyncio.sleep(rng.uniform(0, options['window']))
+        headers = await self.login(client, limit, results, student['username'], options)
+        if headers is None:
+            return
+        await self.request(client, limit, results, 'task_list', 'GET', '/api/tasks/', headers=headers)
+        await asyncio.sleep(rng.expovariate(1 / options['think']) if options['think'] else 0)
+        url = '/api/attempts/async/' if options['async_attempts'] else '/api/attempts/'
+        await self.request(client, limit, results, 'attempt', 'POST', url, headers=headers, json={
+            'task': student['task'], 'content': student['content'], 'stage': 'submitted',
+        })
+
+    async def teacher(self, client, limit, results, username, terms, options, rng):
+        await asyncio.sleep(rng.uniform(0, options['window']))
+        headers = await self.login(client, limit, results, username, options)
+        if headers is None:
+            return
+        for _ in range(options['generations']):
+            await self.request(client, limit, results, 'generate_text', 'POST', '/api/generate-text/', headers=headers, json={
+                'terms': rng.sample(terms, min(3, len(terms))),
+            })
+
+    async def check_stub(self, client, plan, options):
+        """Генерация на сервере должна идти через заглушку, а не настоящую LLM"""
+        results = {endpoint: [] for endpoint in ENDPOINTS}
+        headers = await self.login(client, asyncio.Semaphore(1), results, plan['teachers'][0], options)
+        if headers is None:
+            raise CommandError(f"Не удалось войти преподавателем на {options['base_url']}: сервер запущен с той же БД?")
+        response = await client.get('/api/generate-text/status/', headers=headers)
+        backends = list(response.json().get('backends', {})) if response.status_code == 200 else []
+        if backends != ['stub'] and not options['allow_llm']:
+            raise CommandError(
+                f"На сервере бэкенды генерации {backends}; запустите его с GENERATION_BACKENDS=stub или укажите --allow-llm"
+            )
+
+    async def run(self, plan, options):
+        rng = random.Random(options['seed'])
+        results = {endpoint: [] for endpoint in ENDPOINTS}
+        limit = asyncio.Semaphore(options['concurrency'])
+        async with httpx.AsyncClient(
+            base_url=options['base_url'],
+            timeout=options['timeout'],
+            limits=httpx.Limits(max_connections=options['concurrency']),
+        ) as client:
+            if plan['teachers'] and options['generations']:
+                await self.check_stub(client, plan, options)
+            started = time.perf_counter()
+            await asyncio.gather(
+                *(self.student(client, limit, results, s, options, random.Random(rng.random())) for s in plan['students']),
+                *(
+                    self.teacher(client, limit, results, t, plan['terms'], options, random.Random(rng.random()))
+                    for t in plan['teachers'] if options['generations']
+                ),
+            )
+            duration = time.perf_counter() - started
+
+        return {
+            'config': {
+                'classes': options['classes'],
+                'students': len(plan['students']),
+                'teachers': len(plan['teachers']),
+                'window': options['window'],
+                'concurrency': options['concurrency'],
+                'async_attempts': options['async_attempts'],
+            },
+            'duration': duration,
+            'endpoints': {endpoint: self.summarize(records) for endpoint, records in results.items() if records},
+        }
+
+    def summarize(self, records):
+        """Пропускная способность, перцентили задержки и доля ошибок эндпоинта"""
+        latencies = [end - start for start, end, status in records if isinstance(status, int) and status < 400]
+        errors = {}
+        for _, _, status in records:
+            if not isinstance(status, int) or status >= 400:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+        span = max(end for _, end, _ in records) - min(start for start, _, _ in records)
+        return {
+            'requests': len(records),
+            'errors': errors,
+            'error_rate': sum(errors.values()) / len(records),
+            'throughput_rps': len(records) / span if span else None,
+            'mean': sum(latencies) / len(latencies) if latencies else None,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': max(latencies) if latencies else None,
+        }
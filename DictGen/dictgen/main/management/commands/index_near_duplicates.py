@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from main.models import Task, TaskSignature
+from main.near_duplicates import find_near_duplicates, index_task
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит MinHash-подписи и корзины LSH для заданий без подписи (или для всех с --all) '
+        'и выводит найденные группы почти одинаковых текстов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Переиндексировать все задания')
+        parser.add_argument('--report', action='store_true', help='Вывести почти одинаковые задания')
+
+    def handle(self, *args, **options):
+        tasks = Task.objects.order_by('id')
+        if not options['all']:
+            tasks = tasks.exclude(id__in=TaskSignature.objects.values('task_id'))
+        indexed = 0
+        for task_id, content in tasks.values_list('id', 'content').iterator():
+            index_task(task_id, content)
+            indexed += 1
+        self.stdout.write(f"Проиндексировано заданий: {indexed}")
+
+        if options['report']:
+            for task_id, title, content in Task.objects.order_by('id').values_list('id', 'title', 'content').iterator():
+                for duplicate in find_near_duplicates(content, exclude_id=task_id):
+                    if duplicate['id'] > task_id:
+                        self.stdout.write(
+                            f"{task_id} «{title}» ~ {duplicate['id']} «{duplicate['title']}»: {duplicate['similarity']:.2f}"
+                        )
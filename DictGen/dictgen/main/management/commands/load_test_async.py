@@ -0,0 +1,91 @@
+import asyncio
+import json
+import time
+import httpx
+from django.core.management.base import BaseCommand
+from main.stats import percentile
+
+
+def summarize(latencies, failures):
+    return {
+        'requests': len(latencies) + failures,
+        'failures': failures,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'max': max(latencies) if latencies else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: одновременные генерации текста и отправка попыток. '
+        'Сравнивает синхронные и асинхронные (ASGI) представления на запущенном сервере'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--token', required=True, help='JWT access-токен')
+        parser.add_argument('--terms', required=True, help='ID терминов через запятую')
+        parser.add_argument('--task', type=int, required=True, help='ID задания для попыток')
+        parser.add_argument('--generations', type=int, default=20, help='Одновременных генераций')
+        parser.add_argument('--attempts', type=int, default=50, help='Попыток во время генераций')
+        parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+        parser.add_argument('--timeout', type=float, default=300.0)
+
+    def handle(self, *args, **options):
+        modes = ['sync', 'async'] if options['mode'] == 'both' else [options['mode']]
+        report = {mode: asyncio.run(self.run_scenario(mode, options)) for mode in modes}
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+    async def timed_post(self, client, url, payload, latencies):
+        start = time.perf_counter()
+        try:
+            response = await client.post(url, json=payload)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            return False
+        latencies.append(time.perf_counter() - start)
+        return True
+
+    async def run_scenario(self, mode, options):
+        """
+        Запускает пачку генераций и, пока они выполняются, отправляет попытки.
+        Главный показатель - задержка попыток под нагрузкой генерации.
+        """
+        suffix = 'async/' if mode == 'async' else ''
+        generate_url = f"/api/generate-text/{suffix}"
+        attempt_url = f"/api/attempts/{suffix}"
+        term_ids = [int(t) for t in options['terms'].split(',') if t]
+
+        limits = httpx.Limits(max_connections=options['generations'] + options['attempts'])
+        async with httpx.AsyncClient(
+            base_url=options['base_url'],
+            headers={'Authorization': f"Bearer {options['token']}"},
+            timeout=options['timeout'],
+            limits=limits,
+        ) as client:
+            generation_latencies, attempt_latencies = [], []
+            started = time.perf_counter()
+
+            generations = [
+                asyncio.create_task(self.timed_post(client, generate_url, {'terms': term_ids}, generation_latencies))
+                for _ in range(options['generations'])
+            ]
+            # Даем генерациям занять сервер
+            await asyncio.sleep(0.5)
+            attempts = [
+                self.timed_post(client, attempt_url, {
+                    'task': options['task'],
+                    'content': 'Нагрузочная попытка выполнения диктанта.',
+                    'stage': 'submitted',
+                }, attempt_latencies)
+                for _ in range(options['attempts'])
+            ]
+            attempt_results = await asyncio.gather(*attempts)
+            generation_results = await asyncio.gather(*generations)
+
+        return {
+            'duration': time.perf_counter() - started,
+            'generate_text': summarize(generation_latencies, generation_results.count(False)),
+            'attempts': summarize(attempt_latencies, attempt_results.count(False)),
+        }
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from main.error_storage import pack_errors
+from main.models import Attempt, Error
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит ошибки, сохраненные строками Error, в упакованное поле попытки '
+        '(режим ERROR_STORAGE=packed) и удаляет строки. Попытки обрабатываются порциями'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Попыток в одной транзакции')
+
+    def handle(self, *args, **options):
+        attempts = rows = 0
+        while True:
+            ids = list(
+                Error.objects.order_by('attempt_id').values_list('attempt_id', flat=True)
+                .distinct()[:options['batch_size']]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                errors = {attempt_id: [] for attempt_id in ids}
+                for error in (
+                    Error.objects.select_for_update().filter(attempt_id__in=ids)
+                    .order_by('attempt_id', 'position_start', 'id')
+                    .values('attempt_id', 'error_type', 'position_start', 'position_end', 'true_variant')
+                ):
+                    errors[error.pop('attempt_id')].append(error)
+                Attempt.objects.bulk_update(
+                    [Attempt(id=attempt_id, packed_errors=pack_errors(items)) for attempt_id, items in errors.items()],
+                    ['packed_errors'],
+                )
+                deleted, _ = Error.objects.filter(attempt_id__in=ids).delete()
+            attempts += len(ids)
+            rows += deleted
+            self.stdout.write(f"Упаковано попыток: {attempts}, удалено строк: {rows}")
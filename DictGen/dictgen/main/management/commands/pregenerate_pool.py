@@ -0,0 +1,45 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from main.generation_pool import in_pool_hours, popular_term_sets, run_cycle
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее генерирует и проверяет тексты для популярных наборов терминов (пул для /api/generate-text/). '
+        'Без --loop выполняет один цикл; с --loop работает постоянно и запускает циклы в часы GENERATION_POOL_HOURS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно (фоновый процесс)')
+        parser.add_argument('--interval', type=int, default=600, help='Пауза между циклами в режиме --loop (сек.)')
+        parser.add_argument('--cpu-budget', type=float, default=None, help='Процессорное время на цикл (сек.)')
+        parser.add_argument('--size', type=int, default=None, help='Текстов на набор терминов')
+        parser.add_argument('--sets', type=int, default=None, help='Сколько популярных наборов пополнять')
+        parser.add_argument('--ignore-hours', action='store_true', help='Не ждать часов GENERATION_POOL_HOURS')
+        parser.add_argument('--dry-run', action='store_true', help='Только вывести популярные наборы терминов')
+
+    def handle(self, *args, **options):
+        cpu_budget = options['cpu_budget'] if options['cpu_budget'] is not None else settings.GENERATION_POOL_CPU_BUDGET
+        size = options['size'] or settings.GENERATION_POOL_SIZE
+        sets = options['sets'] or settings.GENERATION_POOL_SETS
+
+        if options['dry_run']:
+            for key, weight in popular_term_sets(limit=sets):
+                self.stdout.write(f"[{key}]: {weight}")
+            return
+
+        while True:
+            if options['ignore_hours'] or in_pool_hours():
+                stats = run_cycle(cpu_budget, size, sets)
+                self.stdout.write(
+                    f"Наборов: {stats['sets']}, новых текстов: {stats['generated']}, ошибок: {stats['failed']}, "
+                    f"удалено устаревших: {stats['pruned']}, CPU: {stats['cpu_seconds']} сек."
+                )
+            elif not options['loop']:
+                self.stdout.write(f"Сейчас не часы пополнения пула ({settings.GENERATION_POOL_HOURS}), используйте --ignore-hours")
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
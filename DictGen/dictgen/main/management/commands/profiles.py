@@ -0,0 +1,56 @@
+import io
+import os
+import pstats
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from main.profiling import evict_profiles, list_profiles, profile_paths
+
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сохраненные профили запросов: list - список (новые первыми), '
+        'show ID - самые затратные функции профиля, evict - удалить профили сверх лимитов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['list', 'show', 'evict'], nargs='?', default='list')
+        parser.add_argument('profile_id', nargs='?', help='ID профиля (для show)')
+        parser.add_argument('--path', help='Только запросы, путь которых содержит строку')
+        parser.add_argument('--limit', type=int, default=20, help='Сколько профилей или функций выводить')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='cumulative')
+
+    def handle(self, *args, **options):
+        if options['action'] == 'evict':
+            self.stdout.write(f"Удалено профилей: {evict_profiles()}")
+        elif options['action'] == 'show':
+            self.show(options)
+        else:
+            self.list(options)
+
+    def list(self, options):
+        profiles = list_profiles()
+        if options['path']:
+            profiles = [p for p in profiles if options['path'] in p['path']]
+        if not profiles:
+            self.stdout.write('Профилей нет')
+            return
+        for profile in profiles[:options['limit']]:
+            created = datetime.fromtimestamp(profile['created']).strftime('%Y-%m-%d %H:%M:%S')
+            self.stdout.write(
+                f"{profile['id']}  {created}  {profile['duration'] * 1000:8.1f} мс  "
+                f"{profile['status']}  {profile['method']} {profile['path']}  ({profile['reason']})"
+            )
+
+    def show(self, options):
+        if not options['profile_id']:
+            raise CommandError('Укажите ID профиля')
+        prof_path, _ = profile_paths(options['profile_id'])
+        if not os.path.exists(prof_path):
+            raise CommandError(f"Профиль {options['profile_id']} не найден")
+
+        output = io.StringIO()
+        stats = pstats.Stats(prof_path, stream=output)
+        stats.strip_dirs().sort_stats(options['sort']).print_stats(options['limit'])
+        self.stdout.write(output.getvalue())
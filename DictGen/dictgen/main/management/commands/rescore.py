@@ -0,0 +1,49 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from main.models import RescoreJob, Task
+from main.rescoring import enqueue_rescore, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        'Перепроверка попыток: --task ID перепроверяет все попытки задания, '
+        '--pending выполняет задания из очереди, в том числе прерванные перезапуском сервера'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', type=int, help='ID задания для перепроверки')
+        parser.add_argument('--pending', action='store_true', help='Выполнить незавершенные перепроверки')
+        parser.add_argument(
+            '--stale-after', type=int, default=30,
+            help='Через сколько минут выполняющаяся перепроверка считается прерванной'
+        )
+
+    def handle(self, *args, **options):
+        if not options['task'] and not options['pending']:
+            raise CommandError('Укажите --task или --pending')
+
+        job_ids = []
+        if options['task']:
+            try:
+                task = Task.objects.get(id=options['task'])
+            except Task.DoesNotExist:
+                raise CommandError(f"Задание {options['task']} не найдено")
+            job_ids.append(enqueue_rescore(task, background=False).id)
+
+        if options['pending']:
+            # Перепроверки, прерванные перезапуском процесса, возвращаются в очередь
+            stale = timezone.now() - timedelta(minutes=options['stale_after'])
+            restarted = RescoreJob.objects.filter(status='running', started_at__lt=stale).update(
+                status='queued', processed=0, failed=0
+            )
+            if restarted:
+                self.stdout.write(f"Возвращено в очередь прерванных перепроверок: {restarted}")
+            job_ids.extend(
+                RescoreJob.objects.filter(status='queued').exclude(id__in=job_ids)
+                .order_by('creation_date').values_list('id', flat=True)
+            )
+
+        for job_id in job_ids:
+            job = run_job(job_id)
+            self.stdout.write(str(job))
@@ -0,0 +1,161 @@
+import re
+import time
+import uuid
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from django.db.backends.signals import connection_created
+from . import db_routing, telemetry
+from .logger import request_id
+
+# Допустимый ID запроса от прокси или клиента
+REQUEST_ID_RE = re.compile(r'^[\w.-]{1,64}$')
+
+
+def _install_query_wrapper(connection, **kwargs):
+    if telemetry.query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(telemetry.query_wrapper)
+
+
+# Счетчик SQL-запросов подключается ко всем новым соединениям с БД
+connection_created.connect(_install_query_wrapper)
+
+
+class RequestIdMiddleware:
+    """
+    ID запроса для логов: берется из заголовка X-Request-ID или создается,
+    возвращается в ответе в том же заголовке
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        value = request.headers.get('X-Request-ID', '')
+        request.request_id = value if REQUEST_ID_RE.match(value) else uuid.uuid4().hex
+        return request_id.set(request.request_id)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id.reset(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_id.reset(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Время обработки запроса по эндпоинтам и число SQL-запросов на запрос.
+    Работает и с синхронными, и с асинхронными представлениями.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            _install_query_wrapper(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start, stats, token = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            telemetry.request_queries.reset(token)
+        self._finish(request, response, start, stats)
+        return response
+
+    async def __acall__(self, request):
+        start, stats, token = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            telemetry.request_queries.reset(token)
+        self._finish(request, response, start, stats)
+        return response
+
+    def _start(self):
+        stats = {'queries': 0, 'duration': 0.0}
+        return time.perf_counter(), stats, telemetry.request_queries.set(stats)
+
+    def _finish(self, request, response, start, stats):
+        # Шаблон маршрута, а не путь: число рядов метрик не зависит от ID в URL
+        match = request.resolver_match
+        route = match.route if match else 'unmatched'
+        telemetry.observe(
+            'http_request_duration_seconds', time.perf_counter() - start,
+            method=request.method, route=route, status=response.status_code,
+        )
+        telemetry.observe('http_db_queries', stats['queries'], route=route)
+        telemetry.observe('http_db_duration_seconds', stats['duration'], route=route)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Состояние маршрутизации БД на время запроса: реплику выбирает
+    process_view по обработчику, после записи пользователь закрепляется
+    за основной БД (см. db_routing)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            db_routing.routing_state.reset(token)
+        self._finish(request, response, state)
+        return response
+
+    async def __acall__(self, request):
+        state, token = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            db_routing.routing_state.reset(token)
+        if state['wrote']:
+            await sync_to_async(self._finish)(request, response, state)
+        return response
+
+    def _start(self):
+        # Словарь общий для потоков sync_to_async: они видят и меняют одно состояние
+        state = {'replica': None, 'wrote': False}
+        return state, db_routing.routing_state.set(state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = db_routing.routing_state.get()
+        if state is not None:
+            state['replica'] = db_routing.choose_replica(request, view_func)
+        return None
+
+    def _finish(self, request, response, state):
+        if state['wrote']:
+            db_routing.pin(response, db_routing.client_key(request))
@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-19 01:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# Новые поля метрик -> тип ошибки
+COUNT_FIELDS = {
+    'spelling_error_count': 'spelling',
+    'grammar_error_count': 'grammar',
+    'extra_word_count': 'extra',
+}
+
+
+def backfill_counts(apps, schema_editor):
+    """Число ошибок по типам для уже сохраненных метрик (по строкам Error)"""
+    Error = apps.get_model('main', 'Error')
+    Metric = apps.get_model('main', 'Metric')
+    for field, error_type in COUNT_FIELDS.items():
+        count = (
+            Error.objects.filter(attempt_id=OuterRef('attempt_id'), error_type=error_type)
+            .values('attempt_id').annotate(n=Count('id')).values('n')
+        )
+        Metric.objects.update(**{field: Coalesce(Subquery(count), Value(0))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_rescorejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='packed_errors',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='metric',
+            name='extra_word_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='metric',
+            name='grammar_error_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='metric',
+            name='spelling_error_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
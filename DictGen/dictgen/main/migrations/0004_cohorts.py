@@ -0,0 +1,79 @@
+# Generated by Django 4.2 on 2026-10-19 01:04
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_attempt_students(apps, schema_editor):
+    """Ученик прежних попыток - тот, кому было назначено задание"""
+    Attempt = apps.get_model('main', 'Attempt')
+    Task = apps.get_model('main', 'Task')
+    Attempt.objects.filter(student__isnull=True).update(
+        student=Subquery(Task.objects.filter(id=OuterRef('task_id')).values('assigned_user_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_packed_errors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cohort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaskAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attempt',
+            name='student',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['student', 'task'], name='main_attemp_student_602158_idx'),
+        ),
+        migrations.AddField(
+            model_name='taskassignment',
+            name='cohort',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assignments', to='main.cohort'),
+        ),
+        migrations.AddField(
+            model_name='taskassignment',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_assignments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='taskassignment',
+            name='task',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='main.task'),
+        ),
+        migrations.AddField(
+            model_name='cohort',
+            name='students',
+            field=models.ManyToManyField(blank=True, related_name='student_cohorts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='cohort',
+            name='teacher',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cohorts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='taskassignment',
+            constraint=models.UniqueConstraint(fields=('student', 'task'), name='unique_task_assignment'),
+        ),
+        migrations.RunPython(backfill_attempt_students, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2 on 2026-10-19 01:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_leaderboards(apps, schema_editor):
+    """Таблицы лидеров по уже проверенным попыткам: лучшая попытка каждого ученика"""
+    Metric = apps.get_model('main', 'Metric')
+    LeaderboardEntry = apps.get_model('main', 'LeaderboardEntry')
+    metrics = (
+        Metric.objects.filter(attempt__student__isnull=False)
+        .order_by('attempt__task_id', 'attempt__student_id', '-accuracy', 'creation_date', 'attempt_id')
+        .values_list('attempt__task_id', 'attempt__student_id', 'attempt_id', 'accuracy', 'creation_date')
+    )
+    entries, last = [], None
+    for task_id, student_id, attempt_id, accuracy, created in metrics.iterator():
+        if (task_id, student_id) == last:
+            continue
+        last = (task_id, student_id)
+        entries.append(LeaderboardEntry(
+            task_id=task_id, student_id=student_id, attempt_id=attempt_id, accuracy=accuracy, achieved_at=created
+        ))
+        if len(entries) >= 1000:
+            LeaderboardEntry.objects.bulk_create(entries)
+            entries = []
+    LeaderboardEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_cohorts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='leaderboard_version',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('accuracy', models.FloatField()),
+                ('achieved_at', models.DateTimeField()),
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to='main.attempt')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard', to='main.task')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['task', '-accuracy', 'achieved_at', 'attempt'], name='leaderboard_order_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('task', 'student'), name='unique_leaderboard_entry'),
+        ),
+        migrations.RunPython(build_leaderboards, migrations.RunPython.noop),
+    ]
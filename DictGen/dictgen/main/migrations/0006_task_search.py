@@ -0,0 +1,58 @@
+# Generated by Django 4.2 on 2026-10-19 01:09
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Поисковый вектор: название (вес A) и текст (вес B) с русской морфологией
+FORWARD_SQL = [
+    """
+    CREATE FUNCTION main_task_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('pg_catalog.russian', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('pg_catalog.russian', coalesce(NEW.content, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER main_task_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, content ON main_task
+    FOR EACH ROW EXECUTE FUNCTION main_task_search_vector_update()
+    """,
+    # Триггер заполняет вектор существующих заданий
+    "UPDATE main_task SET title = title",
+    "CREATE INDEX main_task_search_vector_gin ON main_task USING gin (search_vector)",
+]
+
+BACKWARD_SQL = [
+    "DROP INDEX IF EXISTS main_task_search_vector_gin",
+    "DROP TRIGGER IF EXISTS main_task_search_vector_trigger ON main_task",
+    "DROP FUNCTION IF EXISTS main_task_search_vector_update()",
+]
+
+
+def postgres_only(statements):
+    """Операция выполняется только на Postgres: на SQLite (тесты) поиск работает без индекса"""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(postgres_only(FORWARD_SQL), postgres_only(BACKWARD_SQL)),
+    ]
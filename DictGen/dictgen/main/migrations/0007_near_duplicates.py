@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-19 01:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_task_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSignature',
+            fields=[
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='main.task')),
+                ('minhash', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaskLSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.SmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='main.task')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tasklshbucket',
+            index=models.Index(fields=['bucket'], name='lsh_bucket_idx'),
+        ),
+    ]
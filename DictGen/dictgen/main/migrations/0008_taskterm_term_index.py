@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 01:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_near_duplicates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taskterm',
+            index=models.Index(fields=['term', 'task'], name='taskterm_term_task_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-19 01:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_taskterm_term_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PooledText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term_key', models.CharField(db_index=True, max_length=255)),
+                ('content', models.TextField()),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GenerationRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term_key', models.CharField(max_length=255)),
+                ('source', models.CharField(choices=[('generated', 'Сгенерирован'), ('pool', 'Из пула готовых текстов'), ('reused', 'Готовое задание')], max_length=16)),
+                ('creation_date', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='generation_requests', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
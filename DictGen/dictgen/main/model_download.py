@@ -0,0 +1,252 @@
+"""
+Скачивание файла модели: докачка через HTTP Range, запись во временный файл
+с атомарным переименованием, межпроцессная блокировка и проверка по манифесту
+с кэшированными хэшами (xxhash и SHA-256).
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from typing import Dict, Optional, Tuple
+import requests
+import xxhash
+from filelock import FileLock
+from tqdm import tqdm
+
+logger = logging.getLogger(__name__)
+
+# Размер блока чтения/записи
+CHUNK_SIZE = 8 * 1024 * 1024
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def manifest_path(path: str) -> str:
+    return path + '.manifest.json'
+
+
+def lock_path(path: str) -> str:
+    return path + '.lock'
+
+
+def file_digests(path: str, chunk_size: int = CHUNK_SIZE) -> Dict[str, str]:
+    """Хэши файла за один проход"""
+    xxh = xxhash.xxh3_128()
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while True:
+            data = file.read(chunk_size)
+            if not data:
+                break
+            xxh.update(data)
+            sha.update(data)
+    return {'xxh3_128': xxh.hexdigest(), 'sha256': sha.hexdigest()}
+
+
+def _read_manifest(path: str) -> Optional[Dict]:
+    try:
+        with open(manifest_path(path), encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(
+    path: str, digests: Dict[str, str], source: Optional[str] = None, expected_sha256: Optional[str] = None
+) -> Dict:
+    stat = os.stat(path)
+    manifest = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'source': source,
+        # Ожидаемый хэш на момент скачивания (из настроек или заголовков сервера)
+        'expected_sha256': expected_sha256.lower() if expected_sha256 else None,
+        **digests,
+    }
+    # Уникальный временный файл: манифест может записываться несколькими процессами
+    with tempfile.NamedTemporaryFile(
+        'w', encoding='utf-8', dir=os.path.dirname(path) or '.',
+        prefix=os.path.basename(manifest_path(path)) + '.', suffix='.tmp', delete=False,
+    ) as file:
+        json.dump(manifest, file)
+    try:
+        os.replace(file.name, manifest_path(path))
+    except OSError:
+        os.remove(file.name)
+        raise
+    return manifest
+
+
+def remove_model_file(path: str) -> None:
+    """Удаляет файл модели вместе с манифестом"""
+    for file_path in (path, manifest_path(path)):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def verify_model_file(path: str, expected_sha256: Optional[str] = None, url: Optional[str] = None) -> bool:
+    """
+    Проверяет файл модели.
+    Хэши пересчитываются только если размер или время изменения файла
+    не совпадают с манифестом, иначе используются сохраненные значения.
+    Без expected_sha256 файл сравнивается с хэшем, сохраненным при скачивании,
+    а если его нет - с хэшем или размером из ответа на HEAD-запрос к url.
+    Файл, который не с чем сравнить, считается непроверенным.
+    Вызывать под блокировкой lock_path(path) (см. check_model_file).
+    """
+    if not os.path.exists(path):
+        return False
+
+    stat = os.stat(path)
+    manifest = _read_manifest(path)
+    if not manifest or manifest.get('size') != stat.st_size or manifest.get('mtime_ns') != stat.st_mtime_ns:
+        logger.info(f"Вычисление хэшей файла {path}")
+        manifest = _write_manifest(
+            path, file_digests(path),
+            source=manifest.get('source') if manifest else None,
+            expected_sha256=manifest.get('expected_sha256') if manifest else None,
+        )
+
+    expected_sha256 = expected_sha256 or manifest.get('expected_sha256')
+    expected_size = None
+    if not expected_sha256 and url:
+        expected_sha256, expected_size = _expected_from_server(url)
+        if expected_sha256:
+            # Сохраняем хэш, чтобы следующие проверки не обращались к серверу
+            manifest = _write_manifest(
+                path, {'xxh3_128': manifest['xxh3_128'], 'sha256': manifest['sha256']},
+                source=manifest.get('source') or url, expected_sha256=expected_sha256,
+            )
+
+    if expected_sha256:
+        if manifest['sha256'] != expected_sha256.lower():
+            logger.error(f"Хэш файла {path} не совпадает с ожидаемым")
+            return False
+        return True
+    if expected_size is not None:
+        if manifest['size'] != expected_size:
+            logger.error(f"Размер файла {path} ({manifest['size']}) не совпадает с ожидаемым ({expected_size})")
+            return False
+        return True
+    logger.warning(f"Ожидаемый хэш и размер файла {path} неизвестны, файл считается непроверенным")
+    return False
+
+
+def check_model_file(path: str, expected_sha256: Optional[str] = None, url: Optional[str] = None) -> bool:
+    """Проверка файла модели под той же блокировкой, что и скачивание"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with FileLock(lock_path(path)):
+        return verify_model_file(path, expected_sha256, url)
+
+
+def _expected_sha256_from_response(response) -> Optional[str]:
+    """SHA-256 из заголовков Hugging Face (X-Linked-Etag у LFS-файлов)"""
+    for resp in [*response.history, response]:
+        etag = resp.headers.get('X-Linked-Etag') or resp.headers.get('ETag') or ''
+        etag = etag.strip('"').lower()
+        if etag.startswith('w/'):
+            continue
+        if SHA256_RE.match(etag):
+            return etag
+    return None
+
+
+def _expected_size_from_response(response) -> Optional[int]:
+    """Размер файла из заголовков (X-Linked-Size у LFS-файлов или Content-Length)"""
+    for resp in [*response.history, response]:
+        if resp.headers.get('X-Linked-Size', '').isdigit():
+            return int(resp.headers['X-Linked-Size'])
+    content_length = response.headers.get('Content-Length', '')
+    if response.status_code == 200 and content_length.isdigit() and not response.headers.get('Content-Encoding'):
+        return int(content_length)
+    return None
+
+
+def _expected_from_server(url: str, timeout=(10, 30)) -> Tuple[Optional[str], Optional[int]]:
+    """Ожидаемые SHA-256 и размер файла по HEAD-запросу"""
+    try:
+        response = requests.head(url, allow_redirects=True, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.warning(f"Не удалось получить хэш файла модели с сервера: {str(e)}")
+        return None, None
+    return _expected_sha256_from_response(response), _expected_size_from_response(response)
+
+
+def download_model(
+    url: str,
+    path: str,
+    expected_sha256: Optional[str] = None,
+    chunk_size: int = CHUNK_SIZE,
+    timeout=(10, 60),
+) -> str:
+    """
+    Скачивает файл модели в path.
+    Несколько процессов (воркеров gunicorn) могут вызвать функцию одновременно:
+    скачивает первый, остальные дожидаются блокировки и получают готовый файл.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    with FileLock(lock_path(path)):
+        # Файл мог скачать другой процесс, пока мы ждали блокировку
+        if verify_model_file(path, expected_sha256, url):
+            logger.info(f"Модель уже скачана и проверена: {path}")
+            return path
+
+        part_path = path + '.part'
+        while True:
+            resume_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {'Range': f'bytes={resume_from}-'} if resume_from else {}
+            response = requests.get(url, stream=True, headers=headers, timeout=timeout)
+            if resume_from and response.status_code == 416:
+                # Сервер не может продолжить с этой позиции - начинаем заново
+                logger.warning("Докачка невозможна, скачивание начнется заново")
+                response.close()
+                os.remove(part_path)
+                continue
+            break
+
+        with response:
+            response.raise_for_status()
+            if resume_from and response.status_code != 206:
+                logger.warning("Сервер не поддерживает докачку, скачивание начнется заново")
+                resume_from = 0
+
+            expected_sha256 = expected_sha256 or _expected_sha256_from_response(response)
+            content_length = response.headers.get('content-length')
+            total_size = resume_from + int(content_length) if content_length else None
+
+            if resume_from:
+                logger.info(f"Продолжение скачивания {os.path.basename(path)} с {resume_from} байт")
+            else:
+                logger.info(f"Скачивание модели {os.path.basename(path)}")
+
+            with open(part_path, 'ab' if resume_from else 'wb', buffering=chunk_size) as file, tqdm(
+                desc=os.path.basename(path),
+                initial=resume_from,
+                total=total_size,
+                unit='iB',
+                unit_scale=True,
+                unit_divisor=1024,
+            ) as progress_bar:
+                for data in response.iter_content(chunk_size=chunk_size):
+                    progress_bar.update(file.write(data))
+                file.flush()
+                os.fsync(file.fileno())
+
+        # Проверяем размер и хэш до переименования
+        size = os.path.getsize(part_path)
+        if total_size is not None and size != total_size:
+            raise ValueError(f"Размер скачанного файла ({size}) не соответствует ожидаемому ({total_size})")
+
+        digests = file_digests(part_path, chunk_size)
+        if expected_sha256 and digests['sha256'] != expected_sha256.lower():
+            os.remove(part_path)
+            raise ValueError("Хэш скачанного файла не совпадает с ожидаемым, файл удален")
+
+        os.replace(part_path, path)
+        _write_manifest(path, digests, source=url, expected_sha256=expected_sha256)
+        logger.info(f"Модель успешно скачана в {path}")
+        return path
@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator, ValidationError
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
+from django.contrib.postgres.search import SearchVectorField
 from .constants import *
 
 class UserManager(BaseUserManager):
@@ -82,6 +83,10 @@ class Task(models.Model):
     terms = models.ManyToManyField('Term', through='TaskTerm')
     is_public = models.BooleanField(default=True)  # Общее задание или нет
     assigned_user = models.ForeignKey('User', null=True, blank=True, related_name='assigned_tasks', on_delete=models.SET_NULL)
+    # Полнотекстовый индекс названия и текста (Postgres: заполняет триггер, см. миграцию 0006)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Растет при каждом изменении таблицы лидеров (проверка кэша рейтинга, см. leaderboard)
+    leaderboard_version = models.IntegerField(default=0, editable=False)
 
     def clean(self):
         # Проверка: пользователь может назначить задание себе или преподаватель/админ может назначить другому
@@ -98,20 +103,126 @@ class Task(models.Model):
         self.clean()
         super().save(*args, **kwargs)
 
+    @classmethod
+    def visible_to(cls, user):
+        """Задания, доступные пользователю"""
+        if user.role == 'student':
+            # Студент видит свои, назначенные ему и публичные задания
+            return cls.objects.filter(
+                models.Q(user=user) |
+                models.Q(is_public=True) |
+                models.Q(assigned_user=user) |
+                models.Q(id__in=TaskAssignment.objects.filter(student=user).values('task_id'))
+            )
+        return cls.objects.all()
+
+    def is_assigned_to(self, user) -> bool:
+        """Задание назначено ученику: напрямую (assigned_user) или через TaskAssignment"""
+        return self.assigned_user_id == user.id or self.assignments.filter(student=user).exists()
+
+    def assign_students(self, student_ids, cohort=None) -> int:
+        """
+        Назначает задание ученикам одной транзакцией (уже назначенные пропускаются).
+        Возвращает число новых назначений.
+        """
+        student_ids = set(student_ids)
+        with transaction.atomic():
+            existing = set(
+                self.assignments.filter(student_id__in=student_ids).values_list('student_id', flat=True)
+            )
+            assignments = TaskAssignment.objects.bulk_create(
+                [TaskAssignment(task=self, student_id=student_id, cohort=cohort) for student_id in sorted(student_ids - existing)],
+                batch_size=500,
+            )
+        return len(assignments)
+
     def __str__(self):
         assigned = f" -> {self.assigned_user.username}" if self.assigned_user else ""
         return f"{self.title} ({self.get_status_display()}){assigned}"
 
 
+# Группа (класс) учеников преподавателя
+class Cohort(models.Model):
+    name = models.CharField(max_length=128)
+    teacher = models.ForeignKey('User', related_name='cohorts', on_delete=models.CASCADE)
+    students = models.ManyToManyField('User', related_name='student_cohorts', blank=True)
+    creation_date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.teacher.username})"
+
+
+# Назначение одного задания многим ученикам
+class TaskAssignment(models.Model):
+    task = models.ForeignKey(Task, related_name='assignments', on_delete=models.CASCADE)
+    student = models.ForeignKey('User', related_name='task_assignments', on_delete=models.CASCADE)
+    cohort = models.ForeignKey(Cohort, null=True, blank=True, related_name='assignments', on_delete=models.SET_NULL)
+    creation_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Индекс (student, task) обслуживает выборку заданий ученика и проверку доступа
+        constraints = [models.UniqueConstraint(fields=['student', 'task'], name='unique_task_assignment')]
+
+    def __str__(self):
+        return f"Task: {self.task_id} -> {self.student.username}"
+
+
 # Связь Задание-Термин
 class TaskTerm(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE)
     term = models.ForeignKey(Term, on_delete=models.CASCADE)
 
+    class Meta:
+        # Обратный индекс термин -> задания (покрытие набора терминов, см. term_coverage)
+        indexes = [models.Index(fields=['term', 'task'], name='taskterm_term_task_idx')]
+
     def __str__(self):
         return f"Task: {self.task.title}"
 
 
+# MinHash-подпись текста задания (поиск почти одинаковых текстов, см. near_duplicates)
+class TaskSignature(models.Model):
+    task = models.OneToOneField(Task, primary_key=True, related_name='signature', on_delete=models.CASCADE)
+    minhash = models.BinaryField()
+
+    def __str__(self):
+        return f"Task: {self.task_id}"
+
+
+# Корзина LSH: задания с совпадающей полосой подписи - кандидаты в дубликаты
+class TaskLSHBucket(models.Model):
+    task = models.ForeignKey(Task, related_name='lsh_buckets', on_delete=models.CASCADE)
+    band = models.SmallIntegerField()
+    bucket = models.BigIntegerField()  # Хэш номера полосы и значений подписи в ней
+
+    class Meta:
+        indexes = [models.Index(fields=['bucket'], name='lsh_bucket_idx')]
+
+    def __str__(self):
+        return f"Task: {self.task_id}, band {self.band}"
+
+
+# Запрос генерации текста (подбор популярных наборов терминов для пула, см. generation_pool)
+class GenerationRequest(models.Model):
+    term_key = models.CharField(max_length=255)  # ID терминов по возрастанию через запятую
+    user = models.ForeignKey('User', null=True, blank=True, related_name='generation_requests', on_delete=models.SET_NULL)
+    source = models.CharField(max_length=16, choices=GENERATION_SOURCE_CHOICES)
+    creation_date = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"[{self.term_key}] {self.get_source_display()}"
+
+
+# Заранее сгенерированный и проверенный текст для набора терминов
+class PooledText(models.Model):
+    term_key = models.CharField(max_length=255, db_index=True)
+    content = models.TextField()
+    creation_date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"[{self.term_key}] {self.content[:50]}"
+
+
 # Попытка выполнения задания
 class Attempt(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE)
@@ -122,6 +233,19 @@ class Attempt(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(100)]
     )
     stage = models.CharField(max_length=16, choices=ATTEMPT_STAGE_CHOICES, default='created')
+    # Ученик, выполнивший попытку (у старых попыток - assigned_user задания)
+    student = models.ForeignKey('User', null=True, blank=True, related_name='attempts', on_delete=models.CASCADE)
+    # Ошибки попытки в режиме ERROR_STORAGE='packed' (см. error_storage)
+    packed_errors = models.BinaryField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=['student', 'task'])]
+
+    def save(self, *args, **kwargs):
+        # Попытка без явного ученика принадлежит тому, кому назначено задание
+        if self.student_id is None:
+            self.student_id = self.task.assigned_user_id
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Attempt for task: {self.task.title}, Stage: {self.get_stage_display()}, Grade: {self.grade if self.grade is not None else 'Не оценено'}"
@@ -150,12 +274,56 @@ class Metric(models.Model):
     word_error_count = models.IntegerField(default=0)
     punctuation_error_count = models.IntegerField(default=0)
     missing_word_count = models.IntegerField(default=0)
+    # Число ошибок по типам (статистика без чтения ошибок)
+    spelling_error_count = models.IntegerField(default=0)
+    grammar_error_count = models.IntegerField(default=0)
+    extra_word_count = models.IntegerField(default=0)
     creation_date = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"Metrics: Accuracy {self.accuracy*100:.2f}% для попытки {self.attempt.id}"
 
 
+# Лучшая попытка ученика в таблице лидеров задания
+class LeaderboardEntry(models.Model):
+    task = models.ForeignKey(Task, related_name='leaderboard', on_delete=models.CASCADE)
+    student = models.ForeignKey('User', related_name='leaderboard_entries', on_delete=models.CASCADE)
+    attempt = models.OneToOneField(Attempt, related_name='leaderboard_entry', on_delete=models.CASCADE)
+    accuracy = models.FloatField()
+    achieved_at = models.DateTimeField()  # Время первой проверки попытки
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['task', 'student'], name='unique_leaderboard_entry')]
+        # Порядок рейтинга: точность, затем кто раньше, затем ID попытки
+        indexes = [models.Index(fields=['task', '-accuracy', 'achieved_at', 'attempt'], name='leaderboard_order_idx')]
+
+    def __str__(self):
+        return f"Task: {self.task_id}, {self.student.username}: {self.accuracy*100:.2f}%"
+
+
+# Перепроверка попыток после изменения текста задания
+class RescoreJob(models.Model):
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='rescore_jobs')
+    status = models.CharField(max_length=16, choices=RESCORE_STATUS_CHOICES, default='queued')
+    total = models.IntegerField(default=0)  # Попыток к перепроверке
+    processed = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True, default='')
+    creation_date = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['task', 'status'])]
+
+    @property
+    def progress(self):
+        return self.processed / self.total if self.total else (1.0 if self.status == 'completed' else 0.0)
+
+    def __str__(self):
+        return f"Перепроверка задания {self.task_id}: {self.get_status_display()} ({self.processed}/{self.total})"
+
+
 # Статистика попыток
 class Statistics(models.Model):
     total_attempts = models.IntegerField()
@@ -0,0 +1,116 @@
+"""
+Поиск почти одинаковых текстов заданий (MinHash + LSH).
+
+Текст разбивается на шинглы - тройки соседних слов. MinHash-подпись из
+NUM_PERM минимальных хэшей оценивает сходство Жаккара множеств шинглов:
+доля совпадающих позиций двух подписей. Подпись делится на BANDS полос по
+ROWS значений; хэш полосы - корзина LSH (TaskLSHBucket). Кандидаты - задания,
+у которых совпала хотя бы одна корзина (поиск по индексу, без перебора всех
+заданий); сходство кандидатов проверяется по подписям.
+
+При 32 полосах по 4 значения тексты со сходством от 0.7 становятся
+кандидатами почти всегда, со сходством 0.3 - примерно в каждом четвертом
+случае.
+"""
+import random
+import re
+import struct
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import xxhash
+from django.conf import settings
+from django.db import transaction
+from .models import Task, TaskLSHBucket, TaskSignature
+
+SHINGLE_SIZE = 3
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# Простое число Мерсенна 2^61 - 1 для перестановок (a * x + b) mod P
+PRIME = (1 << 61) - 1
+
+_rng = random.Random(20240601)  # Перестановки не должны меняться между процессами
+PERMUTATIONS = [(_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(NUM_PERM)]
+
+WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text: str) -> Set[str]:
+    """Тройки соседних слов текста без учета регистра и ё/е"""
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def signature(text: str) -> Optional[Tuple[int, ...]]:
+    """MinHash-подпись текста; None для текста без слов"""
+    hashes = [xxhash.xxh64_intdigest(shingle.encode('utf-8')) % PRIME for shingle in shingles(text)]
+    if not hashes:
+        return None
+    return tuple(min((a * x + b) % PRIME for x in hashes) for a, b in PERMUTATIONS)
+
+
+def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+    """Оценка сходства Жаккара по двум подписям"""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+def buckets(sig: Sequence[int]) -> List[int]:
+    """Корзины LSH подписи: хэш номера полосы и ее значений (знаковое 64-битное число для BigIntegerField)"""
+    result = []
+    for band in range(BANDS):
+        value = xxhash.xxh64_intdigest(struct.pack(f'<{ROWS}Q', *sig[band * ROWS:(band + 1) * ROWS]), seed=band)
+        result.append(value - (1 << 64) if value >= 1 << 63 else value)
+    return result
+
+
+def pack(sig: Sequence[int]) -> bytes:
+    return struct.pack(f'<{NUM_PERM}Q', *sig)
+
+
+def unpack(data) -> Tuple[int, ...]:
+    return struct.unpack(f'<{NUM_PERM}Q', bytes(data))
+
+
+def index_task(task_id: int, content: str) -> None:
+    """Сохраняет подпись и корзины задания (заменяет прежние)"""
+    sig = signature(content)
+    with transaction.atomic():
+        TaskLSHBucket.objects.filter(task_id=task_id).delete()
+        if sig is None:
+            TaskSignature.objects.filter(task_id=task_id).delete()
+            return
+        TaskSignature.objects.update_or_create(task_id=task_id, defaults={'minhash': pack(sig)})
+        TaskLSHBucket.objects.bulk_create([
+            TaskLSHBucket(task_id=task_id, band=band, bucket=bucket) for band, bucket in enumerate(buckets(sig))
+        ])
+
+
+def find_near_duplicates(text: str, tasks=None, exclude_id: Optional[int] = None,
+                         threshold: Optional[float] = None, limit: int = 5) -> List[Dict]:
+    """
+    Задания, текст которых почти совпадает с text: [{'id', 'title', 'similarity'}]
+    по убыванию сходства. tasks - queryset заданий, среди которых искать
+    (например, видимые пользователю).
+    """
+    sig = signature(text)
+    if sig is None:
+        return []
+    if threshold is None:
+        threshold = settings.NEAR_DUPLICATE_THRESHOLD
+
+    candidates = TaskLSHBucket.objects.filter(bucket__in=buckets(sig))
+    if tasks is not None:
+        candidates = candidates.filter(task__in=tasks.values('id'))
+    if exclude_id is not None:
+        candidates = candidates.exclude(task_id=exclude_id)
+    candidate_ids = set(candidates.values_list('task_id', flat=True))
+
+    scores = {}
+    for task_id, minhash in TaskSignature.objects.filter(task_id__in=candidate_ids).values_list('task_id', 'minhash'):
+        score = similarity(sig, unpack(minhash))
+        if score >= threshold:
+            scores[task_id] = score
+    best = sorted(scores, key=lambda task_id: (-scores[task_id], task_id))[:limit]
+    titles = dict(Task.objects.filter(id__in=best).values_list('id', 'title'))
+    return [{'id': task_id, 'title': titles[task_id], 'similarity': round(scores[task_id], 3)} for task_id in best]
@@ -32,7 +32,7 @@ class StudentTaskPermission(permissions.BasePermission):
         if request.user.role == 'student':
             # Для GET запросов разрешаем доступ к публичным заданиям
             if request.method == 'GET':
-                return obj.is_public or obj.user == request.user
+                return obj.is_public or obj.user == request.user or obj.is_assigned_to(request.user)
             # Для остальных методов (PUT, DELETE) только свои задания
             return obj.user == request.user
         # Преподаватель и админ видят все
@@ -45,6 +45,6 @@ class StudentAttemptPermission(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # Студент может видеть только свои попытки
         if request.user.role == 'student':
-            return obj.task.assigned_user == request.user
+            return obj.student_id == request.user.id
         # Преподаватель и админ видят все
         return request.user.role in ['teacher', 'admin'] 
\ No newline at end of file
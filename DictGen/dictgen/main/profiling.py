@@ -0,0 +1,214 @@
+"""
+Профилирование отдельных запросов (cProfile).
+
+Запрос профилируется, если администратор (is_staff или роль admin) передал
+заголовок PROFILING_HEADER, либо случайно с вероятностью PROFILING_SAMPLE_RATE.
+Профиль (.prof, формат pstats) и описание запроса (.json) сохраняются в
+PROFILE_DIR под ID запроса; старые профили удаляются сверх PROFILE_MAX_FILES
+и PROFILE_MAX_MB. Ответ профилированного запроса содержит заголовок X-Profile-ID.
+
+cProfile видит только поток, в котором включен: работа пула процессов
+проверки и потоков хеджирования генерации в профиль не попадает. Под ASGI
+синхронное представление выполняется в отдельном потоке (sync_to_async),
+поэтому профилировщик включается в process_view, в том же потоке, что и
+представление. Асинхронные представления профилируются в цикле событий,
+и в их профиль попадают другие корутины, выполнявшиеся одновременно.
+В асинхронном режиме одновременно профилируется не больше одного запроса.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+logger = logging.getLogger(__name__)
+
+# В цикле событий профилировщик один на поток: профилируем по одному запросу
+_async_lock = threading.Lock()
+
+
+def _is_staff(request) -> bool:
+    """Администратор по сессии или JWT (DRF проверяет JWT позже, в представлении)"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except Exception:
+            return False
+        if result is None:
+            return False
+        user = result[0]
+    return bool(user.is_staff or getattr(user, 'role', None) == 'admin')
+
+
+def profiling_reason(request):
+    """
+    Причина профилировать запрос без обращения к БД: 'header' (нужна еще
+    проверка администратора), 'sample' или None
+    """
+    if not settings.PROFILING_ENABLED:
+        return None
+    if request.headers.get(settings.PROFILING_HEADER):
+        return 'header'
+    if random.random() < settings.PROFILING_SAMPLE_RATE:
+        return 'sample'
+    return None
+
+
+def profile_paths(profile_id: str):
+    base = os.path.join(settings.PROFILE_DIR, profile_id)
+    return f'{base}.prof', f'{base}.json'
+
+
+def list_profiles():
+    """Описания сохраненных профилей, новые первыми"""
+    directory = settings.PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename), encoding='utf-8') as file:
+                profiles.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda p: p['created'], reverse=True)
+
+
+def evict_profiles() -> int:
+    """Удаляет самые старые профили сверх лимитов числа и объема; возвращает число удаленных"""
+    directory = settings.PROFILE_DIR
+    if not os.path.isdir(directory):
+        return 0
+    files = []
+    for filename in os.listdir(directory):
+        if filename.endswith('.prof'):
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, filename[:-len('.prof')]))
+    files.sort()
+
+    total = sum(size for _, size, _ in files)
+    max_bytes = settings.PROFILE_MAX_MB * 1024 * 1024
+    removed = 0
+    while files and (len(files) > settings.PROFILE_MAX_FILES or total > max_bytes):
+        _, size, profile_id = files.pop(0)
+        for path in profile_paths(profile_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def save_profile(profiler: cProfile.Profile, request, response, duration: float, reason: str) -> str:
+    """Сохраняет профиль и описание запроса; возвращает ID профиля"""
+    created = time.time()
+    request_id = getattr(request, 'request_id', None) or f'{random.getrandbits(64):016x}'
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(created))}-{request_id}"
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    prof_path, meta_path = profile_paths(profile_id)
+    profiler.dump_stats(prof_path)
+    with open(meta_path, 'w', encoding='utf-8') as file:
+        json.dump({
+            'id': profile_id,
+            'request_id': request_id,
+            'created': created,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration': duration,
+            'reason': reason,
+        }, file, ensure_ascii=False)
+    evict_profiles()
+    return profile_id
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _finish(self, profiler, request, response, start, reason):
+        duration = time.perf_counter() - start
+        try:
+            profile_id = save_profile(profiler, request, response, duration, reason)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить профиль запроса: {str(e)}")
+            return
+        response['X-Profile-ID'] = profile_id
+        logger.info(f"Профиль {request.method} {request.path} ({duration:.3f} сек.) сохранен: {profile_id}")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        reason = profiling_reason(request)
+        if reason is None or (reason == 'header' and not _is_staff(request)):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        self._finish(profiler, request, response, start, reason)
+        return response
+
+    async def __acall__(self, request):
+        reason = profiling_reason(request)
+        if reason == 'header' and not await sync_to_async(_is_staff)(request):
+            reason = None
+        if reason is None or not _async_lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            # Профиль потока синхронного представления (см. process_view)
+            request._view_profiler = None
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            _async_lock.release()
+        profiler = request._view_profiler or profiler
+        await sync_to_async(self._finish)(profiler, request, response, start, reason)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """
+        Под ASGI выполняется в потоке sync_to_async, как и синхронное
+        представление: вызываем представление здесь же под профилировщиком
+        """
+        if not hasattr(request, '_view_profiler') or iscoroutinefunction(view_func):
+            return None
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = view_func(request, *view_args, **view_kwargs)
+            # Отрисовка ответа DRF тоже входит в работу представления
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+        finally:
+            profiler.disable()
+            request._view_profiler = profiler
+        return response
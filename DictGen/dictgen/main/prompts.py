@@ -0,0 +1,62 @@
+"""
+Промпты для генерации текста диктанта.
+
+Общие для всех бэкендов генерации: чат-модели получают сообщения
+build_messages(), модели продолжения текста - строку create_prompt().
+"""
+from typing import Dict, List
+from .models import Term
+
+SYSTEM_PROMPT = '''Ты - опытный преподаватель в университете, читающий лекцию студентам.
+Твой стиль:
+0. Говоришь как любой преподаватель в университете, иногда используя ненаучные термины, запинаешься, не говоришь сразу, добавляешь слова-паразиты.
+1. Говоришь четко и структурированно
+2. Используешь академический стиль речи, но доступно объясняешь сложные термины
+3. Приводишь практические примеры для лучшего понимания
+4. Периодически обращаешься к аудитории ("обратите внимание", "давайте рассмотрим", "как вы можете видеть")
+5. Делаешь логические связки между частями материала
+6. В конце подводишь итог рассмотренной темы
+
+Веди лекцию так, как будто ты стоишь перед аудиторией студентов.'''
+
+# Служебные последовательности Llama-2, на которых генерация прекращается
+STOP_SEQUENCES = ["</s>", "[INST]", "[/INST]"]
+
+
+def prompt_prefix() -> str:
+    """
+    Статическая часть промпта. Не зависит от терминов, поэтому ее
+    KV-кэш вычисляется один раз и переиспользуется локальной моделью.
+    """
+    return """[INST] Прочитайте фрагмент лекции, объясняющий термины, перечисленные в конце.
+
+Требования к лекции:
+1. Объем: 3-6 предложений
+2. Найдите наиболее логичную тематическую связь между этими терминами и постройте лекцию вокруг этой темы
+3. Объясните, как эти термины взаимодействуют или влияют друг на друга в рамках выбранной темы
+4. Каждый термин должен естественно вытекать из контекста предыдущего
+5. Используйте причинно-следственные связи для объяснения взаимосвязи терминов
+6. Завершите фрагмент выводом, подчеркивающим связь между терминами
+
+Пожалуйста, начните лекцию сразу, без вступительных фраз."""
+
+
+def prompt_suffix(terms: List[Term]) -> str:
+    """Часть промпта, зависящая от терминов"""
+    terms_str = ", ".join(t.content for t in terms)
+    return f"""
+
+Термины: {terms_str} [/INST]"""
+
+
+def create_prompt(terms: List[Term]) -> str:
+    """Создание промпта для генерации"""
+    return prompt_prefix() + prompt_suffix(terms)
+
+
+def build_messages(terms: List[Term]) -> List[Dict[str, str]]:
+    """Сообщения чата для OpenAI-совместимых API"""
+    return [
+        {'role': 'system', 'content': SYSTEM_PROMPT},
+        {'role': 'user', 'content': create_prompt(terms)},
+    ]
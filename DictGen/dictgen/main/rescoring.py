@@ -0,0 +1,194 @@
+"""
+Перепроверка попыток после изменения текста задания.
+
+enqueue_rescore() создает RescoreJob и передает его фоновому потоку. Поток
+читает попытки задания порциями, проверяет их в пуле процессов и заменяет
+ошибки и метрики одной транзакцией на порцию. Чтобы не отнимать ресурсы
+у живых запросов, в общем пуле одновременно находится не больше
+RESCORE_MAX_IN_FLIGHT попыток, а после каждой порции поток делает паузу,
+пропорциональную времени ее обработки (RESCORE_THROTTLE). Новое изменение того же задания
+вытесняет незавершенную перепроверку (статус superseded).
+"""
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from . import leaderboard
+from .error_storage import store_errors
+from .models import Attempt, Metric, RescoreJob
+from .scoring import grade_texts
+from .telemetry import stage
+from .utils import get_scoring_executor
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+METRIC_FIELDS = [
+    'levenshtein', 'wer', 'cer', 'per', 'accuracy',
+    'word_error_count', 'punctuation_error_count', 'missing_word_count',
+    'spelling_error_count', 'grammar_error_count', 'extra_word_count',
+]
+
+# Очередь заданий и фоновый поток-обработчик (один на процесс)
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _work():
+    while True:
+        job_id = _queue.get()
+        try:
+            run_job(job_id)
+        except Exception as e:
+            logger.error(f"Ошибка перепроверки (задание {job_id}): {str(e)}")
+        finally:
+            # Поток живет долго: закрываем устаревшие соединения с БД
+            close_old_connections()
+
+
+def _submit(job_id: int) -> None:
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name='rescore-worker', daemon=True)
+            _worker.start()
+    _queue.put(job_id)
+
+
+def enqueue_rescore(task, background: bool = None) -> RescoreJob:
+    """
+    Создает задание на перепроверку попыток задания. При background=False
+    задание только создается, выполнить его нужно самостоятельно (run_job)
+    """
+    superseded = RescoreJob.objects.filter(task=task, status__in=ACTIVE_STATUSES).update(
+        status='superseded', finished_at=timezone.now()
+    )
+    if superseded:
+        logger.info(f"Незавершенная перепроверка задания {task.id} заменена новой")
+
+    job = RescoreJob.objects.create(task=task)
+    if settings.RESCORE_IN_BACKGROUND if background is None else background:
+        # Обработчик должен увидеть задание и новый текст только после фиксации транзакции
+        transaction.on_commit(lambda: _submit(job.id))
+    return job
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _grade_bounded(executor, task_text, chunk, algorithm, limit):
+    """
+    Проверяет попытки порции, передавая в пул не больше limit одновременно:
+    живые попытки не ждут в очереди пула за всей порцией.
+    Выдает (attempt_id, content, future) по порядку, future уже передан в пул.
+    """
+    pending = deque()
+    for attempt_id, content in chunk:
+        if len(pending) >= limit:
+            # Следующая попытка отправляется после получения результата самой старой
+            yield pending.popleft()
+        pending.append((attempt_id, content, executor.submit(grade_texts, task_text, content, algorithm)))
+    while pending:
+        yield pending.popleft()
+
+
+def _save_chunk(graded) -> int:
+    """
+    Заменяет ошибки и метрики порции попыток одной транзакцией.
+    graded - список (attempt_id, content, errors, metric_values).
+    Попытки, текст которых изменился во время проверки, пропускаются:
+    их уже перепроверил собственный запрос. Возвращает число сохраненных.
+    """
+    with stage('rescore.db_write'), transaction.atomic():
+        current = dict(
+            Attempt.objects.select_for_update()
+            .filter(id__in=[g[0] for g in graded])
+            .values_list('id', 'content')
+        )
+        graded = [g for g in graded if current.get(g[0]) == g[1]]
+        ids = [g[0] for g in graded]
+
+        store_errors({attempt_id: errors for attempt_id, _, errors, _ in graded})
+
+        metric_ids = dict(Metric.objects.filter(attempt_id__in=ids).values_list('attempt_id', 'id'))
+        to_update, to_create = [], []
+        for attempt_id, _, _, values in graded:
+            if attempt_id in metric_ids:
+                to_update.append(Metric(id=metric_ids[attempt_id], attempt_id=attempt_id, **values))
+            else:
+                to_create.append(Metric(attempt_id=attempt_id, **values))
+        Metric.objects.bulk_update(to_update, METRIC_FIELDS)
+        Metric.objects.bulk_create(to_create)
+    return len(graded)
+
+
+def run_job(job_id: int, executor=None) -> RescoreJob:
+    """Выполняет задание на перепроверку (в фоновом потоке или из команды rescore)"""
+    job = RescoreJob.objects.select_related('task').get(id=job_id)
+    if job.status != 'queued':
+        logger.info(f"Перепроверка {job_id} пропущена: статус {job.status}")
+        return job
+
+    task_text = job.task.content
+    attempts = Attempt.objects.filter(task_id=job.task_id)
+    job.total = attempts.count()
+    job.started_at = timezone.now()
+    if not RescoreJob.objects.filter(id=job.id, status='queued').update(
+        status='running', total=job.total, started_at=job.started_at
+    ):
+        return RescoreJob.objects.get(id=job.id)
+    logger.info(f"Перепроверка задания {job.task_id}: {job.total} попыток")
+
+    executor = executor or get_scoring_executor()
+    algorithm = settings.ALIGNMENT_ALGORITHM
+    processed = failed = 0
+    try:
+        rows = attempts.order_by('id').values_list('id', 'content').iterator(chunk_size=settings.RESCORE_CHUNK_SIZE)
+        for chunk in _chunks(rows, settings.RESCORE_CHUNK_SIZE):
+            if RescoreJob.objects.filter(id=job.id, status='superseded').exists():
+                logger.info(f"Перепроверка {job.id} остановлена: задание снова изменено")
+                return RescoreJob.objects.get(id=job.id)
+
+            start = time.monotonic()
+            graded = []
+            for attempt_id, content, future in _grade_bounded(
+                executor, task_text, chunk, algorithm, max(1, settings.RESCORE_MAX_IN_FLIGHT)
+            ):
+                try:
+                    errors, metric_values = future.result()
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"Ошибка проверки попытки {attempt_id}: {str(e)}")
+                    continue
+                graded.append((attempt_id, content, errors, metric_values))
+            _save_chunk(graded)
+
+            processed += len(chunk)
+            RescoreJob.objects.filter(id=job.id).update(processed=processed, failed=failed)
+
+            # Пауза пропорционально времени обработки: не больше 1 / (1 + RESCORE_THROTTLE) загрузки
+            time.sleep((time.monotonic() - start) * settings.RESCORE_THROTTLE)
+    except Exception as e:
+        logger.error(f"Перепроверка {job.id} завершилась ошибкой: {str(e)}")
+        RescoreJob.objects.filter(id=job.id, status='running').update(
+            status='failed', error_message=str(e), finished_at=timezone.now()
+        )
+        return RescoreJob.objects.get(id=job.id)
+
+    # Точность попыток изменилась - таблица лидеров пересчитывается целиком
+    leaderboard.rebuild(job.task_id)
+    RescoreJob.objects.filter(id=job.id, status='running').update(status='completed', finished_at=timezone.now())
+    logger.info(f"Перепроверка задания {job.task_id} завершена: {processed} попыток, ошибок {failed}")
+    return RescoreJob.objects.get(id=job.id)
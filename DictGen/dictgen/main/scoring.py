@@ -0,0 +1,171 @@
+"""
+Чистые функции проверки диктантов.
+
+Модуль не импортирует Django-модели, поэтому его функции можно выполнять
+в отдельном процессе (ProcessPoolExecutor) и передавать туда только тексты.
+"""
+import re
+from functools import lru_cache
+import pymorphy3
+from Levenshtein import distance
+from .alignment import align
+from .telemetry import stage
+
+# Слова и знаки препинания
+TOKEN_RE = re.compile(r"\w+|[.,:;!?—()""''…]")
+PUNCTUATION = '.,:;!?—()""''…'
+
+# Создаем морфологический анализатор
+morph = pymorphy3.MorphAnalyzer()
+
+
+def tokenize(text):
+    """Разбивает текст на слова и знаки препинания"""
+    return TOKEN_RE.findall(text)
+
+
+def tokenize_with_offsets(text):
+    """
+    Токены в нижнем регистре с позициями в исходном тексте: (token, start, end).
+    Один проход finditer; позиции ошибок берутся по индексам токенов.
+    """
+    return [(m.group().lower(), m.start(), m.end()) for m in TOKEN_RE.finditer(text)]
+
+
+def _is_punctuation(text):
+    return any(c in PUNCTUATION for c in text)
+
+
+@lru_cache(maxsize=4096)
+def _classify_replacement(task_word, attempt_word):
+    """Определяет тип ошибки для замененного фрагмента"""
+    if _is_punctuation(task_word) or _is_punctuation(attempt_word):
+        return 'punctuation'  # Пунктуационная ошибка
+
+    # Анализируем слова с помощью pymorphy3
+    task_parse = morph.parse(task_word)
+    attempt_parse = morph.parse(attempt_word)
+
+    if task_parse and attempt_parse:
+        # Если оба слова найдены в словаре:
+        # совпадают нормальные формы - грамматическая ошибка, иначе орфографическая
+        if task_parse[0].normal_form == attempt_parse[0].normal_form:
+            return 'grammar'
+        return 'spelling'
+
+    # Если хотя бы одно слово не найдено в словаре
+    if len(task_word) == len(attempt_word):
+        return 'spelling'
+    return 'grammar'
+
+
+def find_errors(task_text, attempt_text, algorithm=None):
+    """
+    Находит ошибки в тексте попытки относительно текста задания.
+    Возвращает список словарей с полями модели Error (без attempt).
+    algorithm - алгоритм выравнивания токенов (см. alignment.ALGORITHMS).
+    """
+    # Приводим тексты к нижнему регистру и разбиваем на токены;
+    # для попытки запоминаем позиции токенов в исходном тексте
+    with stage('scoring.tokenize'):
+        task_tokens = tokenize(task_text.lower())
+        spans = tokenize_with_offsets(attempt_text)
+        attempt_tokens = [token for token, _, _ in spans]
+    with stage('scoring.align'):
+        opcodes = align(task_tokens, attempt_tokens, algorithm)
+    # Классификация замен (pymorphy3) - основная часть этого этапа
+    with stage('scoring.morph'):
+        return errors_from_opcodes(task_tokens, spans, opcodes)
+
+
+def errors_from_opcodes(task_tokens, spans, opcodes):
+    """
+    Ошибки по готовому выравниванию: task_tokens - токены задания,
+    spans - токены попытки с позициями (tokenize_with_offsets), opcodes - см. alignment.align
+    """
+    errors = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'replace':
+            # Найдены замененные слова
+            task_word = " ".join(task_tokens[i1:i2])
+            attempt_word = " ".join(token for token, _, _ in spans[j1:j2])
+            errors.append({
+                'error_type': _classify_replacement(task_word, attempt_word),
+                'position_start': spans[j1][1],
+                'position_end': spans[j2 - 1][2],
+                'true_variant': task_word,
+            })
+
+        elif tag == 'delete':
+            # Найдены пропущенные слова: позиция - сразу после предыдущего токена
+            missing_word = " ".join(task_tokens[i1:i2])
+            prev_pos = spans[j1 - 1][2] if j1 > 0 else 0
+            errors.append({
+                'error_type': 'punctuation' if _is_punctuation(missing_word) else 'missing',
+                'position_start': prev_pos,
+                'position_end': prev_pos,
+                'true_variant': missing_word,
+            })
+
+        elif tag == 'insert':
+            # Найдены лишние слова
+            extra_word = " ".join(token for token, _, _ in spans[j1:j2])
+            errors.append({
+                'error_type': 'punctuation' if _is_punctuation(extra_word) else 'extra',
+                'position_start': spans[j1][1],
+                'position_end': spans[j2 - 1][2],
+                'true_variant': '',
+            })
+
+    return errors
+
+
+def compute_metric_values(task_text, attempt_text, error_types):
+    """
+    Рассчитывает значения полей модели Metric для попытки.
+    error_types - список типов найденных ошибок.
+    """
+    # Расстояние Левенштейна
+    levenshtein = distance(task_text, attempt_text)
+
+    # Word Error Rate (WER)
+    task_words = task_text.split()
+    attempt_words = attempt_text.split()
+    word_errors = sum(1 for i in range(min(len(task_words), len(attempt_words))) if task_words[i] != attempt_words[i])
+    wer = word_errors / len(task_words) if task_words else 0
+
+    # Character Error Rate (CER)
+    cer = levenshtein / len(task_text) if task_text else 0
+
+    # Position Error Rate (PER)
+    total_positions = len(task_text)
+    error_positions = sum(1 for i in range(min(len(task_text), len(attempt_text))) if task_text[i] != attempt_text[i])
+    per = error_positions / total_positions if total_positions else 0
+
+    # Accuracy
+    accuracy = 1 - (levenshtein / max(len(task_text), len(attempt_text)))
+
+    return {
+        'levenshtein': levenshtein,
+        'wer': wer,
+        'cer': cer,
+        'per': per,
+        'accuracy': accuracy,
+        # Подсчет ошибок по типам
+        'word_error_count': sum(1 for t in error_types if t in ['spelling', 'grammar']),
+        'punctuation_error_count': sum(1 for t in error_types if t == 'punctuation'),
+        'missing_word_count': sum(1 for t in error_types if t == 'missing'),
+        'spelling_error_count': sum(1 for t in error_types if t == 'spelling'),
+        'grammar_error_count': sum(1 for t in error_types if t == 'grammar'),
+        'extra_word_count': sum(1 for t in error_types if t == 'extra'),
+    }
+
+
+def grade_texts(task_text, attempt_text, algorithm=None):
+    """
+    Полная проверка попытки: ошибки и метрики.
+    Выполняется без обращения к БД, подходит для запуска в пуле процессов.
+    """
+    errors = find_errors(task_text, attempt_text, algorithm)
+    metric_values = compute_metric_values(task_text, attempt_text, [e['error_type'] for e in errors])
+    return errors, metric_values
@@ -1,9 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from .models import User, Term, Task, Attempt, Metric, Error
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from .models import User, Term, Task, Attempt, Metric, RescoreJob, Cohort, TaskAssignment, LeaderboardEntry
 from .utils import analyze_errors
-from Levenshtein import distance
+from .scoring import compute_metric_values
+from .leaderboard import refresh_entry
+from .near_duplicates import index_task
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -33,6 +37,7 @@ class TaskSerializer(serializers.ModelSerializer):
         task = Task.objects.create(**validated_data)
         if terms_data:
             task.terms.set(terms_data)
+        index_task(task.id, task.content)
         return task
 
     def update(self, instance, validated_data):
@@ -43,16 +48,49 @@ class TaskSerializer(serializers.ModelSerializer):
         
         if terms_data is not None:
             instance.terms.set(terms_data)
+        if 'content' in validated_data:
+            index_task(instance.id, instance.content)
         return instance
 
+class CohortSerializer(serializers.ModelSerializer):
+    students = serializers.PrimaryKeyRelatedField(many=True, required=False, queryset=User.objects.filter(role='student'))
+
+    class Meta:
+        model = Cohort
+        fields = ['id', 'name', 'teacher', 'students', 'creation_date']
+        read_only_fields = ['teacher', 'creation_date']
+
+class TaskAssignmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaskAssignment
+        fields = ['id', 'task', 'student', 'cohort', 'creation_date']
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='student.username', read_only=True)
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = ['student', 'username', 'attempt', 'accuracy', 'achieved_at']
+
+class RescoreJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = RescoreJob
+        fields = [
+            'id', 'task', 'status', 'total', 'processed', 'failed', 'progress',
+            'error_message', 'creation_date', 'started_at', 'finished_at'
+        ]
+
 class AttemptSerializer(serializers.ModelSerializer):
     metrics = serializers.SerializerMethodField()
 
     class Meta:
         model = Attempt
         fields = [
-            'id', 'task', 'content', 'grade', 'stage', 'metrics'
+            'id', 'task', 'student', 'content', 'grade', 'stage', 'metrics'
         ]
+        read_only_fields = ['student']
 
     def get_metrics(self, obj):
         try:
@@ -72,102 +110,36 @@ class AttemptSerializer(serializers.ModelSerializer):
         # Создаем попытку
         attempt = Attempt.objects.create(**validated_data)
         
-        # Анализируем ошибки
-        errors = analyze_errors(attempt)
-        
-        # Вычисляем метрики
-        task_text = attempt.task.content
-        attempt_text = attempt.content
+        # Анализируем ошибки (у новой попытки прежних ошибок нет)
+        errors = analyze_errors(attempt, replace=False)
         
-        # Расстояние Левенштейна
-        levenshtein = distance(task_text, attempt_text)
-        
-        # Word Error Rate (WER)
-        task_words = task_text.split()
-        attempt_words = attempt_text.split()
-        word_errors = sum(1 for i in range(min(len(task_words), len(attempt_words))) if task_words[i] != attempt_words[i])
-        wer = word_errors / len(task_words) if task_words else 0
-        
-        # Character Error Rate (CER)
-        cer = levenshtein / len(task_text) if task_text else 0
-        
-        # Position Error Rate (PER)
-        total_positions = len(task_text)
-        error_positions = sum(1 for i in range(min(len(task_text), len(attempt_text))) if task_text[i] != attempt_text[i])
-        per = error_positions / total_positions if total_positions else 0
-        
-        # Accuracy
-        accuracy = 1 - (levenshtein / max(len(task_text), len(attempt_text)))
-        
-        # Подсчет ошибок по типам
-        word_error_count = len([e for e in errors if e.error_type in ['spelling', 'grammar']])
-        punctuation_error_count = len([e for e in errors if e.error_type == 'punctuation'])
-        missing_word_count = len([e for e in errors if e.error_type == 'missing'])
-        
-        # Создаем метрику
+        # Вычисляем метрики и создаем запись
         Metric.objects.create(
             attempt=attempt,
-            levenshtein=levenshtein,
-            wer=wer,
-            cer=cer,
-            per=per,
-            accuracy=accuracy,
-            word_error_count=word_error_count,
-            punctuation_error_count=punctuation_error_count,
-            missing_word_count=missing_word_count
+            **compute_metric_values(attempt.task.content, attempt.content, [e.error_type for e in errors])
         )
+        refresh_entry(attempt.task_id, attempt.student_id)
         
         return attempt
 
     def update(self, instance, validated_data):
+        old_task_id = instance.task_id
         # Обновляем попытку
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
         
-        # Обновляем метрики
-        task_text = instance.task.content
-        attempt_text = instance.content
-        
-        # Расстояние Левенштейна
-        levenshtein = distance(task_text, attempt_text)
-        
-        # Word Error Rate (WER)
-        task_words = task_text.split()
-        attempt_words = attempt_text.split()
-        word_errors = sum(1 for i in range(min(len(task_words), len(attempt_words))) if task_words[i] != attempt_words[i])
-        wer = word_errors / len(task_words) if task_words else 0
-        
-        # Character Error Rate (CER)
-        cer = levenshtein / len(task_text) if task_text else 0
-        
-        # Position Error Rate (PER)
-        total_positions = len(task_text)
-        error_positions = sum(1 for i in range(min(len(task_text), len(attempt_text))) if task_text[i] != attempt_text[i])
-        per = error_positions / total_positions if total_positions else 0
-        
-        # Accuracy
-        accuracy = 1 - (levenshtein / max(len(task_text), len(attempt_text)))
-        
         # Анализируем ошибки
         errors = analyze_errors(instance)
         
-        # Подсчет ошибок по типам
-        word_error_count = len([e for e in errors if e.error_type in ['spelling', 'grammar']])
-        punctuation_error_count = len([e for e in errors if e.error_type == 'punctuation'])
-        missing_word_count = len([e for e in errors if e.error_type == 'missing'])
-        
         # Обновляем или создаем метрику
-        metric, created = Metric.objects.get_or_create(attempt=instance)
-        metric.levenshtein = levenshtein
-        metric.wer = wer
-        metric.cer = cer
-        metric.per = per
-        metric.accuracy = accuracy
-        metric.word_error_count = word_error_count
-        metric.punctuation_error_count = punctuation_error_count
-        metric.missing_word_count = missing_word_count
-        metric.save()
+        Metric.objects.update_or_create(
+            attempt=instance,
+            defaults=compute_metric_values(instance.task.content, instance.content, [e.error_type for e in errors])
+        )
+        # Попытку могли перенести в другое задание - обновляем обе таблицы лидеров
+        for task_id in {old_task_id, instance.task_id}:
+            refresh_entry(task_id, instance.student_id)
         
         return instance
 
@@ -221,8 +193,15 @@ class UserStatisticsSerializer(serializers.ModelSerializer):
         return sum(m.per for m in metrics) / len(metrics)
 
     def get_error_statistics(self, obj):
-        errors = Error.objects.filter(attempt__task__user=obj)
-        total_errors = errors.count()
+        # Число ошибок по типам денормализовано в метриках: ошибки не читаются
+        counts = Metric.objects.filter(attempt__task__user=obj).aggregate(
+            spelling=Coalesce(Sum('spelling_error_count'), 0),
+            grammar=Coalesce(Sum('grammar_error_count'), 0),
+            punctuation=Coalesce(Sum('punctuation_error_count'), 0),
+            missing=Coalesce(Sum('missing_word_count'), 0),
+            extra=Coalesce(Sum('extra_word_count'), 0),
+        )
+        total_errors = sum(counts.values())
         if total_errors == 0:
             return {
                 'spelling': 0,
@@ -232,13 +211,7 @@ class UserStatisticsSerializer(serializers.ModelSerializer):
                 'extra': 0
             }
         
-        return {
-            'spelling': errors.filter(error_type='spelling').count() / total_errors,
-            'grammar': errors.filter(error_type='grammar').count() / total_errors,
-            'punctuation': errors.filter(error_type='punctuation').count() / total_errors,
-            'missing': errors.filter(error_type='missing').count() / total_errors,
-            'extra': errors.filter(error_type='extra').count() / total_errors
-        }
+        return {error_type: count / total_errors for error_type, count in counts.items()}
 
     def get_recent_attempts(self, obj):
         recent_attempts = Attempt.objects.filter(task__user=obj).order_by('-id')[:5]
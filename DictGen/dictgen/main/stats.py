@@ -0,0 +1,13 @@
+"""Общие статистические функции для маршрутизации генерации и бенчмарков"""
+from typing import List, Optional
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Перцентиль p (0-100) по отсортированной копии списка"""
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    f = int(k)
+    c = min(f + 1, len(values) - 1)
+    return values[f] + (values[c] - values[f]) * (k - f)
@@ -0,0 +1,65 @@
+"""
+Поиск по библиотеке заданий.
+
+На Postgres - полнотекстовый поиск с русской морфологией по хранимому
+Task.search_vector (GIN-индекс и триггер создает миграция 0006), результаты
+упорядочены по SearchRank. На других СУБД (SQLite в тестах) - поиск всех
+слов запроса в названии или тексте без морфологии; совпадения в названии
+поднимаются выше.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from rest_framework.exceptions import ValidationError
+from .models import TaskTerm
+
+# Фильтры по полям задания: ?difficulty=easy,medium
+FILTER_FIELDS = ('difficulty', 'text_complexity', 'status')
+
+
+def _values(params, name):
+    return [value for value in params.get(name, '').split(',') if value]
+
+
+def _contains(field, word):
+    """Вхождение слова без учета регистра: LIKE в SQLite не сравнивает кириллицу без учета регистра"""
+    condition = Q()
+    for variant in {word, word.lower(), word.capitalize(), word.upper()}:
+        condition |= Q(**{f'{field}__icontains': variant})
+    return condition
+
+
+def search_tasks(tasks, params):
+    """Применяет к заданиям фильтры и поисковый запрос ?q= из параметров запроса"""
+    for field in FILTER_FIELDS:
+        values = _values(params, field)
+        if values:
+            tasks = tasks.filter(**{f'{field}__in': values})
+
+    # Задание должно содержать все указанные термины
+    try:
+        term_ids = [int(value) for value in _values(params, 'terms')]
+    except ValueError:
+        raise ValidationError({'terms': 'Ожидается список ID терминов через запятую'})
+    for term_id in term_ids:
+        tasks = tasks.filter(id__in=TaskTerm.objects.filter(term_id=term_id).values('task_id'))
+
+    query = params.get('q', '').strip()
+    if not query:
+        return tasks
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config='russian', search_type='websearch')
+        return (
+            tasks.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .order_by('-rank', '-id')
+        )
+
+    words = query.split()
+    for word in words:
+        tasks = tasks.filter(_contains('title', word) | _contains('content', word))
+    title_matches = [
+        Case(When(_contains('title', word), then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+        for word in words
+    ]
+    return tasks.annotate(rank=sum(title_matches[1:], title_matches[0])).order_by('-rank', '-id')
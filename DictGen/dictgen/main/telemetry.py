@@ -0,0 +1,270 @@
+"""
+Метрики производительности в формате Prometheus.
+
+Каждый процесс (воркер сервера, процесс пула проверки) копит гистограммы и
+счетчики в памяти, а фоновый поток раз в METRICS_FLUSH_INTERVAL секунд
+сбрасывает их в файл METRICS_DIR/<pid>.json. Эндпоинт /metrics суммирует
+файлы всех процессов, поэтому показывает данные всего сервера, а не одного
+воркера. Файлы завершившихся процессов и файлы, не обновлявшиеся дольше
+METRICS_FILE_TTL секунд, удаляются при чтении; Prometheus воспринимает
+уменьшение суммы как сброс счетчиков.
+
+Запись метрики - это захват блокировки и сложение, без ввода-вывода
+в потоке запроса или в цикле событий.
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict
+
+# Границы корзин гистограмм
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048)
+
+PREFIX = 'dictgen_'
+
+# Описание метрик: тип, справка, корзины (для гистограмм)
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Время обработки HTTP-запроса', SECONDS_BUCKETS),
+    'http_db_queries': ('histogram', 'Число SQL-запросов на HTTP-запрос', COUNT_BUCKETS),
+    'http_db_duration_seconds': ('histogram', 'Время SQL-запросов на HTTP-запрос', SECONDS_BUCKETS),
+    'stage_duration_seconds': ('histogram', 'Время этапов проверки и генерации', SECONDS_BUCKETS),
+    'generation_queue_wait_seconds': ('histogram', 'Ожидание освобождения локальной модели', SECONDS_BUCKETS),
+    'generation_ttft_seconds': ('histogram', 'Время до первого токена генерации', SECONDS_BUCKETS),
+    'generation_duration_seconds': ('histogram', 'Полное время генерации текста', SECONDS_BUCKETS),
+    'generation_tokens': ('histogram', 'Токенов на одну генерацию текста', TOKEN_BUCKETS),
+    'generation_attempts_total': ('counter', 'Попыток генерации (вызовов бэкендов)', None),
+}
+
+
+def _settings():
+    """Каталог, интервал сброса и срок жизни файлов; вне Django (процесс без настроек) метрики не сбрасываются"""
+    try:
+        from django.conf import settings
+        directory = settings.METRICS_DIR if settings.METRICS_ENABLED else None
+        return directory, settings.METRICS_FLUSH_INTERVAL, settings.METRICS_FILE_TTL
+    except Exception:
+        return None, 0, 0
+
+
+class Registry:
+    """Метрики текущего процесса"""
+
+    def __init__(self, flush_in_background: bool = False):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._last_flush = time.monotonic()
+        # (метрика, метки) -> [счетчики корзин..., сумма, количество] или значение счетчика
+        self.values = {}
+        # Поток сброса в файл (только у реестра процесса)
+        self._flush_in_background = flush_in_background
+        self._flusher_pid = None
+        self._stopped = threading.Event()
+
+    def _check_fork(self):
+        # После fork дочерний процесс не должен повторно учитывать данные родителя
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self.values = {}
+
+    def _ensure_flusher(self) -> None:
+        """Запускает поток сброса; после fork поток родителя в дочернем процессе отсутствует"""
+        if not self._flush_in_background or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        # Файл переписывается каждый интервал, даже без новых данных: его mtime
+        # показывает читателям, что процесс жив
+        while not self._stopped.wait(_settings()[1] or 1.0):
+            try:
+                self.maybe_flush(force=True)
+            except OSError:
+                pass  # Каталог недоступен - повторим в следующий раз
+
+    def stop(self) -> None:
+        """Останавливает поток сброса"""
+        self._stopped.set()
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        _, _, buckets = METRICS[name]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [0] * len(buckets) + [0.0, 0]
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+        self._ensure_flusher()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            self.values[key] = self.values.get(key, 0) + value
+        self._ensure_flusher()
+
+    def dump(self) -> Dict:
+        with self._lock:
+            self._check_fork()
+            return {json.dumps([name, labels]): value for (name, labels), value in self.values.items()}
+
+    def maybe_flush(self, force: bool = False) -> None:
+        directory, interval, _ = _settings()
+        if not directory or not (force or time.monotonic() - self._last_flush >= interval):
+            return
+        # Файл пишет один поток, остальные не ждут
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = time.monotonic()
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{os.getpid()}.json')
+            # Запись во временный файл и замена: читатель не увидит файл наполовину
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(self.dump(), file)
+            os.replace(tmp_path, path)
+        finally:
+            self._flush_lock.release()
+
+
+registry = Registry(flush_in_background=True)
+observe = registry.observe
+inc = registry.inc
+atexit.register(lambda: registry.maybe_flush(force=True))
+
+
+@contextmanager
+def stage(name: str):
+    """Замер этапа: with stage('scoring.align'): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('stage_duration_seconds', time.perf_counter() - start, stage=name)
+
+
+# Счетчики SQL-запросов текущего HTTP-запроса (переносятся в sync_to_async вместе с контекстом)
+request_queries = contextvars.ContextVar('request_queries', default=None)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """Обертка выполнения SQL (connection.execute_wrappers): считает запросы и их время"""
+    stats = request_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats['queries'] += 1
+        stats['duration'] += time.perf_counter() - start
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OverflowError):
+        pass  # Процесс другого пользователя
+    return True
+
+
+def _expired(path: str, filename: str, ttl: float) -> bool:
+    """Файл завершившегося процесса или давно не обновлявшийся файл"""
+    pid = filename[:-len('.json')]
+    if pid.isdigit() and not _pid_alive(int(pid)):
+        return True
+    return bool(ttl) and time.time() - os.path.getmtime(path) > ttl
+
+
+def collect(directory: str = None) -> Dict:
+    """Сумма метрик всех процессов; файлы завершившихся процессов удаляются"""
+    default_directory, _, ttl = _settings()
+    directory = directory or default_directory
+    dumps = [registry.dump()]
+    own = f'{os.getpid()}.json'
+    if directory and os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == own:
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                if _expired(path, filename, ttl):
+                    os.remove(path)
+                    continue
+                with open(path, encoding='utf-8') as file:
+                    dumps.append(json.load(file))
+            except (OSError, ValueError):
+                continue  # Файл удален или заменяется
+
+    total = {}
+    for dump in dumps:
+        for key, value in dump.items():
+            if isinstance(value, list):
+                current = total.setdefault(key, [0] * len(value))
+                total[key] = [a + b for a, b in zip(current, value)]
+            else:
+                total[key] = total.get(key, 0) + value
+    return total
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def render(values: Dict, gauges: Dict = None) -> str:
+    """Текстовый формат Prometheus (version 0.0.4)"""
+    by_name = {}
+    for key, value in values.items():
+        name, labels = json.loads(key)
+        if name in METRICS:
+            by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text, buckets = METRICS[name]
+        full_name = PREFIX + name
+        lines.append(f'# HELP {full_name} {help_text}')
+        lines.append(f'# TYPE {full_name} {kind}')
+        for labels, value in sorted(by_name[name]):
+            if kind == 'counter':
+                lines.append(f'{full_name}{_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f'{full_name}_bucket{_labels(labels, ("le", bound))} {cumulative}')
+            lines.append(f'{full_name}_bucket{_labels(labels, ("le", "+Inf"))} {value[-1]}')
+            lines.append(f'{full_name}_sum{_labels(labels)} {value[-2]}')
+            lines.append(f'{full_name}_count{_labels(labels)} {value[-1]}')
+
+    for name, (help_text, value) in sorted((gauges or {}).items()):
+        lines.append(f'# HELP {PREFIX}{name} {help_text}')
+        lines.append(f'# TYPE {PREFIX}{name} gauge')
+        lines.append(f'{PREFIX}{name} {value}')
+    return '\n'.join(lines) + '\n'
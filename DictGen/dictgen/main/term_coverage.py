@@ -0,0 +1,60 @@
+"""
+Поиск готовых заданий по набору терминов.
+
+TaskTerm с индексом (term, task) - обратный индекс термин -> задания:
+кандидатами становятся только задания хотя бы с одним из запрошенных
+терминов. Для каждого считается число запрошенных терминов (matched) и
+всех терминов задания (term_count). Порядок: большее покрытие, затем
+меньше лишних терминов, затем более новое задание.
+"""
+import math
+from typing import Iterable, List, Optional
+from django.db.models import Count, Q
+from .models import Task, TaskTerm
+
+
+def covering_tasks(term_ids: Iterable[int], tasks=None, min_coverage: float = 0.0, limit: Optional[int] = 10):
+    """Задания (queryset), покрывающие термины term_ids, с аннотациями matched и term_count"""
+    term_ids = sorted(set(term_ids))
+    if tasks is None:
+        tasks = Task.objects.all()
+    ranked = (
+        tasks.filter(id__in=TaskTerm.objects.filter(term_id__in=term_ids).values('task_id'))
+        .annotate(
+            matched=Count('taskterm__term', filter=Q(taskterm__term_id__in=term_ids), distinct=True),
+            term_count=Count('taskterm__term', distinct=True),
+        )
+        .order_by('-matched', 'term_count', '-id')
+    )
+    if min_coverage > 0:
+        ranked = ranked.filter(matched__gte=math.ceil(min_coverage * len(term_ids) - 1e-9))
+    return ranked[:limit] if limit else ranked
+
+
+def coverage_report(term_ids: Iterable[int], tasks=None, min_coverage: float = 0.0, limit: Optional[int] = 10) -> List[dict]:
+    """Результаты covering_tasks для ответа API: доля покрытых терминов и число лишних"""
+    term_ids = set(term_ids)
+    return [
+        {
+            'id': task.id,
+            'title': task.title,
+            'matched': task.matched,
+            'term_count': task.term_count,
+            'coverage': round(task.matched / len(term_ids), 3),
+        }
+        for task in covering_tasks(term_ids, tasks, min_coverage, limit).only('id', 'title')
+    ]
+
+
+def best_covering_task(term_ids: Iterable[int], tasks=None, threshold: float = 1.0):
+    """Лучшее готовое задание с покрытием не ниже threshold или None"""
+    return covering_tasks(term_ids, tasks, min_coverage=threshold, limit=1).first()
+
+
+def reused_task_response(task, terms_count: int) -> dict:
+    """Ответ генерации текста готовым заданием вместо нового текста"""
+    return {
+        'text': task.content,
+        'execution_time': 0.0,
+        'reused_task': {'id': task.id, 'title': task.title, 'coverage': round(task.matched / terms_count, 3)},
+    }
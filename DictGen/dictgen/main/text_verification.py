@@ -0,0 +1,266 @@
+"""
+Потоковая проверка сгенерированного текста.
+
+StreamingVerifier получает текст по токенам, отслеживает границы предложений
+и встретившиеся термины и сообщает, когда генерацию можно остановить:
+требования выполнены (done) или текст заведомо не пройдет проверку (abort).
+
+Термины ищутся по леммам (pymorphy3): «энтропии» и «энтропию» засчитываются
+термину «энтропия», «второго начала термодинамики» - термину «второе начало
+термодинамики». Точка после сокращения («т. е.», «им.», инициалы) и знак
+конца перед строчной буквой не считаются концом предложения.
+"""
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional
+from .scoring import morph
+
+# Кандидат на конец предложения: знаки конца и закрывающие кавычки/скобки
+SENTENCE_END_RE = re.compile(r'[.!?…]+[»"\')]*')
+# Сокращения, после которых предложение не заканчивается
+ABBREVIATIONS = frozenset({
+    'т', 'им', 'ул', 'проф', 'акад', 'доц', 'св', 'см', 'ср', 'рис', 'табл',
+    'напр', 'стр', 'гл', 'ст', 'с', 'р', 'обл', 'пос', 'тов', 'англ', 'лат', 'греч',
+})
+WORD_RE = re.compile(r'\w+(?:-\w+)*')
+# Зацикливание модели: предложение не короче LOOP_MIN_WORDS слов
+# повторяется подряд LOOP_REPEATS раз (короткие «Итак.» повторять можно)
+LOOP_REPEATS = 2
+LOOP_MIN_WORDS = 4
+
+
+def is_sentence_end(text: str, start: int, end: int) -> Optional[bool]:
+    """
+    Заканчивает ли предложение кандидат text[start:end]. None - решить
+    пока нельзя: после знака еще нет следующего слова (поток не дошел).
+    """
+    rest = text[end:]
+    following = rest.lstrip()
+    if not following:
+        return None
+    if len(following) == len(rest):
+        return False  # «3.14», «т.е.», «!», - знак внутри слова или перед запятой
+    if following[0].islower():
+        return False
+    if following[0] in '—–-' and text[end - 1] in '»"\')':
+        return False  # «Эврика!» - воскликнул он
+    if text[start:end] == '.':
+        word = re.search(r'(\w+)$', text[:start])
+        if word and (word.group(1).lower() in ABBREVIATIONS or (len(word.group(1)) == 1 and word.group(1).isupper())):
+            return False
+    return True
+
+
+def sentence_ends(text: str) -> List[int]:
+    """Позиции концов предложений законченного текста"""
+    ends = [m.end() for m in SENTENCE_END_RE.finditer(text) if is_sentence_end(text, m.start(), m.end()) is not False]
+    if text[ends[-1] if ends else 0:].strip():
+        ends.append(len(text))
+    return ends
+
+
+def split_sentences(text: str):
+    """Разбивает законченный текст на предложения по тем же границам, что и StreamingVerifier"""
+    sentences, start = [], 0
+    for end in sentence_ends(text):
+        if text[start:end].strip():
+            sentences.append(text[start:end].strip())
+        start = end
+    return sentences
+
+
+def has_loop(sentences: List[str]) -> bool:
+    """Модель зациклилась: длинное предложение повторяется подряд LOOP_REPEATS раз"""
+    run, previous = 0, None
+    for sentence in sentences:
+        words = WORD_RE.findall(sentence.lower())
+        run = run + 1 if words == previous else 1
+        previous = words
+        if run >= LOOP_REPEATS and len(words) >= LOOP_MIN_WORDS:
+            return True
+    return False
+
+
+@lru_cache(maxsize=65536)
+def lemmas(word: str) -> FrozenSet[str]:
+    """Все нормальные формы слова (омонимы: «стали» - «стать» и «сталь»)"""
+    word = word.lower().replace('ё', 'е')
+    return frozenset(parse.normal_form.replace('ё', 'е') for parse in morph.parse(word)) | {word}
+
+
+def _text_lemmas(text: str) -> List[FrozenSet[str]]:
+    return [lemmas(word) for word in WORD_RE.findall(text)]
+
+
+class TermMatcher:
+    """Поиск терминов (в том числе из нескольких слов) в тексте с учетом словоизменения"""
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms = list(terms)
+        self._patterns = {term: _text_lemmas(term) for term in self.terms}
+
+    def _contains(self, term: str, text_lower: str, text_lemmas: List[FrozenSet[str]]) -> bool:
+        if term.lower() in text_lower:
+            return True
+        pattern = self._patterns[term]
+        if not pattern:
+            return False
+        return any(
+            all(pattern[j] & text_lemmas[i + j] for j in range(len(pattern)))
+            for i in range(len(text_lemmas) - len(pattern) + 1)
+        )
+
+    def found(self, text: str, terms: Optional[Iterable[str]] = None) -> List[str]:
+        """Термины (из terms или всех), встречающиеся в тексте"""
+        text_lower, text_lemmas = text.lower(), _text_lemmas(text)
+        return [t for t in (self.terms if terms is None else terms) if self._contains(t, text_lower, text_lemmas)]
+
+    def missing(self, text: str) -> List[str]:
+        found = set(self.found(text))
+        return [t for t in self.terms if t not in found]
+
+
+class StreamingVerifier:
+    CONTINUE = 'continue'
+    DONE = 'done'
+    ABORT = 'abort'
+
+    def __init__(
+        self,
+        terms: Iterable[str],
+        min_sentences: int = 3,
+        max_sentences: int = 6,
+        stop_when_satisfied: bool = True,
+    ):
+        self.terms = [t.lower() for t in terms]
+        self.matcher = TermMatcher(self.terms)
+        self.min_sentences = min_sentences
+        self.max_sentences = max_sentences
+        self.stop_when_satisfied = stop_when_satisfied
+
+        self.text = ''
+        self.verdict = self.CONTINUE
+        self.found_terms = set()
+        self.sentence_ends = []   # позиции концов завершенных предложений
+        self.tokens = 0           # всего получено токенов
+        self.tokens_at_boundary = 0  # токенов на момент конца последнего предложения
+        self._scan_pos = 0
+        self._last_sentences = []  # последние предложения для поиска зацикливания
+
+    @property
+    def sentence_count(self) -> int:
+        return len(self.sentence_ends)
+
+    @property
+    def missing_terms(self):
+        return [t for t in self.terms if t not in self.found_terms]
+
+    def feed(self, chunk: str) -> str:
+        """Добавляет фрагмент потока и возвращает текущее решение"""
+        self.tokens += 1
+        if self.verdict != self.CONTINUE:
+            return self.verdict
+
+        self.text += chunk
+        self._scan()
+        return self.verdict
+
+    def _scan(self, final: bool = False) -> None:
+        """Ищет новые концы предложений; конец без следующего слова ждет следующих токенов"""
+        for match in SENTENCE_END_RE.finditer(self.text, self._scan_pos):
+            end = is_sentence_end(self.text, match.start(), match.end())
+            if end is None and not final:
+                break
+            self._scan_pos = match.end()
+            if end is not False:
+                self._on_sentence_end(match.end())
+            if self.verdict != self.CONTINUE:
+                break
+
+    def _on_sentence_end(self, end: int) -> None:
+        start = self.sentence_ends[-1] if self.sentence_ends else 0
+        sentence = self.text[start:end].strip().lower()
+
+        # Модель зациклилась - текст не пройдет проверку (то же правило в _verify_text)
+        self._last_sentences = self._last_sentences[1 - LOOP_REPEATS:] + [sentence]
+        if has_loop(self._last_sentences):
+            self.verdict = self.ABORT
+            return
+
+        self.sentence_ends.append(end)
+        self.tokens_at_boundary = self.tokens
+
+        self.found_terms.update(self.matcher.found(sentence, self.missing_terms))
+
+        satisfied = self.sentence_count >= self.min_sentences and not self.missing_terms
+        if satisfied and self.stop_when_satisfied:
+            self.verdict = self.DONE
+        elif self.sentence_count >= self.max_sentences:
+            # Лимит предложений исчерпан: либо все готово, либо терминов уже не будет
+            self.verdict = self.DONE if satisfied else self.ABORT
+
+    def finish(self) -> str:
+        """Поток закончился: учитываем последнее предложение без пробела в конце"""
+        if self.verdict == self.CONTINUE:
+            self._scan(final=True)
+        if self.verdict == self.CONTINUE:
+            tail = self.text[self.sentence_ends[-1] if self.sentence_ends else 0:]
+            if tail.strip():
+                self._on_sentence_end(len(self.text))
+        return self.verdict
+
+    @property
+    def result_text(self) -> str:
+        """Текст до конца последнего принятого предложения"""
+        if self.verdict == self.DONE and self.sentence_ends:
+            return self.text[:self.sentence_ends[-1]]
+        return self.text
+
+    def wasted_tokens(self, accepted: bool) -> int:
+        """Токены, не попавшие в итоговый текст"""
+        if not accepted:
+            return self.tokens
+        return self.tokens - self.tokens_at_boundary
+
+
+class StreamStats:
+    """Счетчики потоковой генерации (для мониторинга)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.accepted = 0
+        self.tokens_generated = 0
+        self.tokens_wasted = 0
+        self.early_stops = 0
+        self.early_aborts = 0
+        self.last_wasted_tokens = 0
+
+    def record(self, verifier: StreamingVerifier, accepted: bool, stopped_early: bool) -> int:
+        wasted = verifier.wasted_tokens(accepted)
+        with self._lock:
+            self.requests += 1
+            self.accepted += int(accepted)
+            self.tokens_generated += verifier.tokens
+            self.tokens_wasted += wasted
+            self.last_wasted_tokens = wasted
+            if stopped_early and verifier.verdict == StreamingVerifier.DONE:
+                self.early_stops += 1
+            if stopped_early and verifier.verdict == StreamingVerifier.ABORT:
+                self.early_aborts += 1
+        return wasted
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'accepted': self.accepted,
+                'pass_rate': self.accepted / self.requests if self.requests else 0,
+                'tokens_generated': self.tokens_generated,
+                'tokens_wasted': self.tokens_wasted,
+                'wasted_tokens_per_request': self.tokens_wasted / self.requests if self.requests else 0,
+                'early_stops': self.early_stops,
+                'early_aborts': self.early_aborts,
+                'last_wasted_tokens': self.last_wasted_tokens,
+            }
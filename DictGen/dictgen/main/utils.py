@@ -1,118 +1,35 @@
-from .models import Error, Metric
-import difflib
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from .models import Metric
+from .error_storage import load_errors, store_errors
+from .alignment import align
+from .scoring import find_errors
+from .telemetry import stage
 import re
-import pymorphy3
-from Levenshtein import distance as Levenshtein
+import Levenshtein
 
-# Создаем морфологический анализатор
-morph = pymorphy3.MorphAnalyzer()
+# Пул процессов для проверки попыток (асинхронные представления, перепроверка)
+_scoring_executor = None
 
-def analyze_errors(attempt):
+def get_scoring_executor() -> ProcessPoolExecutor:
+    """Получение глобального пула процессов для проверки попыток"""
+    global _scoring_executor
+    if _scoring_executor is None:
+        _scoring_executor = ProcessPoolExecutor(max_workers=settings.SCORING_WORKERS)
+    return _scoring_executor
+
+
+def analyze_errors(attempt, replace=True):
     """
     Анализирует ошибки в попытке пользователя с использованием морфологического анализатора.
     Каждая попытка сохраняется со своими ошибками для отслеживания прогресса.
+    replace - заменить ошибки, сохраненные при прошлой проверке.
     """
-    task = attempt.task
-    task_text = task.content
-    attempt_text = attempt.content
-
-    # Создаем список для хранения ошибок
-    errors = []
+    errors = find_errors(attempt.task.content, attempt.content, settings.ALIGNMENT_ALGORITHM)
 
-    # Сохраняем оригинальные тексты для определения позиций
-    original_task_text = task_text
-    original_attempt_text = attempt_text
-
-    # Приводим тексты к нижнему регистру для сравнения
-    task_text = task_text.lower()
-    attempt_text = attempt_text.lower()
-    
-    # Разбиваем тексты на слова и знаки препинания
-    task_tokens = re.findall(r"\w+|[.,:;!?—()""''…]", task_text)
-    attempt_tokens = re.findall(r"\w+|[.,:;!?—()""''…]", attempt_text)
-    
-    # Создаем объект для сравнения последовательностей
-    matcher = difflib.SequenceMatcher(None, task_tokens, attempt_tokens)
-    
-    # Анализируем различия
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-        if tag == 'replace':
-            # Найдены замененные слова
-            task_word = " ".join(task_tokens[i1:i2])
-            attempt_word = " ".join(attempt_tokens[j1:j2])
-            
-            # Определяем тип ошибки
-            if any(c in '.,:;!?—()""''…' for c in task_word) or any(c in '.,:;!?—()""''…' for c in attempt_word):
-                error_type = 'punctuation'  # Пунктуационная ошибка
-            else:
-                # Анализируем слова с помощью pymorphy3
-                task_parse = morph.parse(task_word)
-                attempt_parse = morph.parse(attempt_word)
-                
-                if task_parse and attempt_parse:
-                    # Если оба слова найдены в словаре
-                    task_normal = task_parse[0].normal_form
-                    attempt_normal = attempt_parse[0].normal_form
-                    
-                    if task_normal == attempt_normal:
-                        # Если нормальные формы совпадают - это грамматическая ошибка
-                        error_type = 'grammar'
-                    else:
-                        # Если нормальные формы разные - это орфографическая ошибка
-                        error_type = 'spelling'
-                else:
-                    # Если хотя бы одно слово не найдено в словаре
-                    if len(task_word) == len(attempt_word):
-                        error_type = 'spelling'
-                    else:
-                        error_type = 'grammar'
-                
-            position = original_attempt_text.lower().find(attempt_word)
-            errors.append(Error(
-                attempt=attempt,
-                error_type=error_type,
-                position_start=position,
-                position_end=position + len(attempt_word),
-                true_variant=task_word
-            ))
-            
-        elif tag == 'delete':
-            # Найдены пропущенные слова
-            missing_word = " ".join(task_tokens[i1:i2])
-            prev_pos = original_attempt_text.lower().find(attempt_tokens[j1-1]) + len(attempt_tokens[j1-1]) if j1 > 0 else 0
-            
-            # Определяем тип ошибки для пропущенных слов
-            error_type = 'punctuation' if any(c in '.,:;!?—()""''…' for c in missing_word) else 'missing'
-            
-            errors.append(Error(
-                attempt=attempt,
-                error_type=error_type,
-                position_start=prev_pos,
-                position_end=prev_pos,
-                true_variant=missing_word
-            ))
-            
-        elif tag == 'insert':
-            # Найдены лишние слова
-            extra_word = " ".join(attempt_tokens[j1:j2])
-            position = original_attempt_text.lower().find(extra_word)
-            
-            # Определяем тип ошибки для лишних слов
-            error_type = 'punctuation' if any(c in '.,:;!?—()""''…' for c in extra_word) else 'extra'
-            
-            errors.append(Error(
-                attempt=attempt,
-                error_type=error_type,
-                position_start=position,
-                position_end=position + len(extra_word),
-                true_variant=''
-            ))
-    
     # Сохраняем все ошибки одним запросом
-    if errors:
-        Error.objects.bulk_create(errors)
-    
-    return errors
+    with stage('scoring.db_write'):
+        return store_errors({attempt.id: errors}, replace=replace)
 
 def calculate_metrics(attempt):
     """
@@ -142,29 +59,35 @@ def calculate_metrics(attempt):
     cer = char_errors / len(task_chars) if task_chars else 0
     
     # Рассчитываем PER (Position Error Rate)
-    matcher = difflib.SequenceMatcher(None, task_words, attempt_words)
-    position_errors = sum(1 for tag, _, _, _, _ in matcher.get_opcodes() if tag != 'equal')
+    opcodes = align(task_words, attempt_words, settings.ALIGNMENT_ALGORITHM)
+    position_errors = sum(1 for tag, _, _, _, _ in opcodes if tag != 'equal')
     per = position_errors / len(task_words) if task_words else 0
     
     # Рассчитываем точность
     accuracy = 1 - wer
     
     # Подсчитываем количество ошибок по типам
-    errors = Error.objects.filter(attempt=attempt)
-    word_error_count = errors.filter(error_type='spelling').count()
-    punctuation_error_count = errors.filter(error_type='punctuation').count()
-    missing_word_count = errors.filter(error_type='missing').count()
+    error_types = [error.error_type for error in load_errors(attempt)]
+    word_error_count = error_types.count('spelling')
+    punctuation_error_count = error_types.count('punctuation')
+    missing_word_count = error_types.count('missing')
     
-    # Создаем и сохраняем метрики
-    metrics = Metric.objects.create(
-        levenshtein=levenshtein_distance,
-        wer=wer,
-        cer=cer,
-        per=per,
-        accuracy=accuracy,
-        word_error_count=word_error_count,
-        punctuation_error_count=punctuation_error_count,
-        missing_word_count=missing_word_count
+    # Создаем или обновляем метрики попытки (у попытки одна запись метрик)
+    metrics, _ = Metric.objects.update_or_create(
+        attempt=attempt,
+        defaults=dict(
+            levenshtein=levenshtein_distance,
+            wer=wer,
+            cer=cer,
+            per=per,
+            accuracy=accuracy,
+            word_error_count=word_error_count,
+            punctuation_error_count=punctuation_error_count,
+            missing_word_count=missing_word_count,
+            spelling_error_count=error_types.count('spelling'),
+            grammar_error_count=error_types.count('grammar'),
+            extra_word_count=error_types.count('extra'),
+        )
     )
     
     return metrics
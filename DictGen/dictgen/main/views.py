@@ -2,20 +2,27 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from django.db import models
-from .models import User, Term, Task, Attempt
-from .serializers import UserSerializer, TermSerializer, TaskSerializer, AttemptSerializer, UserStatisticsSerializer, RegisterSerializer, LoginSerializer, ChangePasswordSerializer
-from .utils import analyze_errors
+from .models import User, Term, Task, Attempt, Cohort
+from .serializers import UserSerializer, TermSerializer, TaskSerializer, AttemptSerializer, UserStatisticsSerializer, RegisterSerializer, LoginSerializer, ChangePasswordSerializer, RescoreJobSerializer, CohortSerializer, TaskAssignmentSerializer, LeaderboardEntrySerializer
 from rest_framework.pagination import PageNumberPagination
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from .permissions import IsOwnerOrTeacher, StudentTaskPermission, StudentAttemptPermission
+from .permissions import IsOwnerOrTeacher, IsTeacherOrAdmin, StudentTaskPermission, StudentAttemptPermission
 from .llm_generator import get_generator
+from . import llm_generator, telemetry
+from .rescoring import enqueue_rescore
+from .db_routing import read_replica
+from . import leaderboard
+from .task_search import search_tasks
+from .near_duplicates import find_near_duplicates
+from .term_coverage import best_covering_task, coverage_report, reused_task_response
+from . import generation_pool
 import logging
 import time
-from django.http import StreamingHttpResponse
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +41,7 @@ class RootView(APIView):
 
 # Получение списка пользователей и создание нового (GET, POST)
 class UserListCreateView(APIView):
+    @read_replica
     def get(self, request):
         users = User.objects.all()
         paginator = PageNumberPagination()
@@ -71,6 +79,7 @@ class UserDetailUpdateDeleteView(APIView):
 
 # Получение списка терминов и создание нового (GET, POST)
 class TermListView(APIView):
+    @read_replica
     def get(self, request):
         terms = Term.objects.all()
         paginator = PageNumberPagination()
@@ -110,15 +119,11 @@ class TermDetailView(APIView):
 class TaskListView(APIView):
     permission_classes = [permissions.IsAuthenticated, StudentTaskPermission]
 
+    @read_replica
     def get(self, request):
-        if request.user.role == 'student':
-            # Студент видит свои задания и публичные задания
-            tasks = Task.objects.filter(
-                models.Q(user=request.user) | 
-                models.Q(is_public=True)
-            )
-        else:
-            tasks = Task.objects.all()
+        tasks = Task.visible_to(request.user)
+        # Поиск (?q=) и фильтры по сложности, типу текста, статусу и терминам
+        tasks = search_tasks(tasks.defer('search_vector'), request.query_params)
             
         paginator = PageNumberPagination()
         paginator.page_size = request.query_params.get('page_size', 10)
@@ -137,7 +142,10 @@ class TaskListView(APIView):
                 serializer.validated_data['assigned_user'] = request.user  # Автоматически назначаем задание создателю
             
             task = serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            # Почти такие же тексты уже есть в библиотеке - преподаватель может использовать их
+            data = dict(serializer.data)
+            data['near_duplicates'] = find_near_duplicates(task.content, Task.visible_to(request.user), exclude_id=task.id)
+            return Response(data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # Получение, обновление и удаление конкретного задания (GET, PUT, PATCH, DELETE)
@@ -166,8 +174,14 @@ class TaskDetailView(APIView):
                             status=status.HTTP_403_FORBIDDEN
                         )
             
+            old_content = task.content
             task = serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            data = serializer.data
+            # Текст задания изменился - попытки перепроверяются в фоне
+            if task.content != old_content:
+                job = enqueue_rescore(task)
+                data['rescore_job'] = job.id
+            return Response(data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, id):
@@ -184,13 +198,159 @@ class TaskDetailView(APIView):
         task.delete()
         return Response({'message': f'Задание с ID {id} успешно удалено'}, status=status.HTTP_204_NO_CONTENT)
 
+# Назначения задания ученикам (GET) и назначение группе или списку учеников (POST)
+class TaskAssignView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsTeacherOrAdmin]
+
+    def get(self, request, id):
+        task = get_object_or_404(Task, id=id)
+        assignments = task.assignments.order_by('student_id')
+        paginator = PageNumberPagination()
+        paginator.page_size = request.query_params.get('page_size', 10)
+        paginated_assignments = paginator.paginate_queryset(assignments, request)
+        serializer = TaskAssignmentSerializer(paginated_assignments, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def post(self, request, id):
+        task = get_object_or_404(Task, id=id)
+        cohort = None
+        if request.data.get('cohort') is not None:
+            cohorts = Cohort.objects.all() if request.user.role == 'admin' else request.user.cohorts.all()
+            cohort = get_object_or_404(cohorts, id=request.data['cohort'])
+            student_ids = list(cohort.students.values_list('id', flat=True))
+        else:
+            requested = request.data.get('students') or []
+            if not isinstance(requested, list):
+                return Response({'error': 'Поле students должно быть списком ID'}, status=status.HTTP_400_BAD_REQUEST)
+            student_ids = list(User.objects.filter(id__in=requested, role='student').values_list('id', flat=True))
+            if len(student_ids) != len(set(requested)):
+                return Response({'error': 'Указаны несуществующие ученики'}, status=status.HTTP_400_BAD_REQUEST)
+        if not student_ids:
+            return Response({'error': 'Не указаны ученики для назначения'}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = task.assign_students(student_ids, cohort=cohort)
+        logger.info(f"Задание {task.id} назначено {created} ученикам (всего указано {len(student_ids)})")
+        return Response({'assigned': created, 'students': len(student_ids)}, status=status.HTTP_201_CREATED)
+
+# Получение списка групп учеников и создание новой (GET, POST)
+class CohortListView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsTeacherOrAdmin]
+
+    def get(self, request):
+        cohorts = Cohort.objects.all() if request.user.role == 'admin' else request.user.cohorts.all()
+        cohorts = cohorts.prefetch_related('students').order_by('id')
+        paginator = PageNumberPagination()
+        paginator.page_size = request.query_params.get('page_size', 10)
+        paginated_cohorts = paginator.paginate_queryset(cohorts, request)
+        serializer = CohortSerializer(paginated_cohorts, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def post(self, request):
+        serializer = CohortSerializer(data=request.data)
+        if serializer.is_valid():
+            serializer.save(teacher=request.user)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+# Получение, обновление и удаление группы учеников (GET, PUT, DELETE)
+class CohortDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsTeacherOrAdmin]
+
+    def get_cohort(self, request, id):
+        cohorts = Cohort.objects.all() if request.user.role == 'admin' else request.user.cohorts.all()
+        return get_object_or_404(cohorts, id=id)
+
+    def get(self, request, id):
+        serializer = CohortSerializer(self.get_cohort(request, id))
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def put(self, request, id):
+        serializer = CohortSerializer(self.get_cohort(request, id), data=request.data, partial=True)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def delete(self, request, id):
+        cohort = self.get_cohort(request, id)
+        cohort.delete()
+        return Response({'message': f'Группа с ID {id} успешно удалена'}, status=status.HTTP_204_NO_CONTENT)
+
+# Таблица лидеров задания (GET): первые места по страницам или место ученика (?student=ID)
+class TaskLeaderboardView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, id):
+        task = get_object_or_404(Task, id=id)
+        student_id = request.query_params.get('student')
+        # Ученик видит только свое место в заданиях, доступных ему
+        if request.user.role == 'student':
+            if not (task.is_public or task.user_id == request.user.id or task.is_assigned_to(request.user)):
+                return Response({'error': 'Доступ запрещен'}, status=status.HTTP_403_FORBIDDEN)
+            student_id = request.user.id
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 10)), 1), 100)
+            student_id = int(student_id) if student_id is not None else None
+        except ValueError:
+            return Response({'error': 'Некорректные параметры запроса'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranking = leaderboard.get_ranking(task.id)
+        if student_id is not None:
+            rank = ranking.rank(student_id)
+            entry = task.leaderboard.select_related('student').filter(student_id=student_id).first() if rank else None
+            return Response({
+                'student': student_id,
+                'rank': rank,
+                'count': len(ranking),
+                'entry': LeaderboardEntrySerializer(entry).data if entry else None,
+            })
+
+        offset = (page - 1) * page_size
+        entries = LeaderboardEntrySerializer(leaderboard.top(task.id, offset, page_size), many=True).data
+        return Response({
+            'count': len(ranking),
+            'page': page,
+            'results': [dict(entry, rank=offset + i + 1) for i, entry in enumerate(entries)],
+        })
+
+# Готовые задания, покрывающие набор терминов (GET): ?terms=1,2,3&min_coverage=0.5
+class TaskCoverageView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @read_replica
+    def get(self, request):
+        try:
+            term_ids = [int(value) for value in request.query_params.get('terms', '').split(',') if value]
+            min_coverage = float(request.query_params.get('min_coverage', 0))
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response({'error': 'Некорректные параметры запроса'}, status=status.HTTP_400_BAD_REQUEST)
+        if not term_ids:
+            return Response({'error': 'Не указаны термины'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'terms': sorted(set(term_ids)),
+            'results': coverage_report(term_ids, Task.visible_to(request.user), min_coverage, limit),
+        })
+
+# Ход перепроверки попыток задания (GET)
+class TaskRescoreStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticated, StudentTaskPermission]
+
+    def get(self, request, id):
+        task = get_object_or_404(Task, id=id)
+        self.check_object_permissions(request, task)
+        jobs = task.rescore_jobs.order_by('-creation_date')[:10]
+        return Response(RescoreJobSerializer(jobs, many=True).data, status=status.HTTP_200_OK)
+
 # Получение списка попыток и создание новой (GET, POST)
 class AttemptListView(APIView):
     permission_classes = [permissions.IsAuthenticated, StudentAttemptPermission]
 
+    @read_replica
     def get(self, request):
         if request.user.role == 'student':
-            attempts = Attempt.objects.filter(task__assigned_user=request.user)
+            attempts = Attempt.objects.filter(student=request.user)
         else:
             attempts = Attempt.objects.all()
             
@@ -204,14 +364,17 @@ class AttemptListView(APIView):
         serializer = AttemptSerializer(data=request.data)
         if serializer.is_valid():
             # Проверяем, что студент создает попытку только для своего задания
-            task = Task.objects.get(id=serializer.validated_data['task'].id)
-            if request.user.role == 'student' and task.assigned_user != request.user:
-                return Response(
-                    {'error': 'Вы можете создавать попытки только для своих заданий'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            attempt = serializer.save()
-            analyze_errors(attempt)
+            task = serializer.validated_data['task']
+            if request.user.role == 'student':
+                if not task.is_assigned_to(request.user):
+                    return Response(
+                        {'error': 'Вы можете создавать попытки только для своих заданий'},
+                        status=status.HTTP_403_FORBIDDEN
+                    )
+                # Сериализатор сохраняет попытку вместе с ошибками и метриками
+                serializer.save(student=request.user)
+            else:
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -230,8 +393,7 @@ class AttemptDetailView(APIView):
         self.check_object_permissions(request, attempt)
         serializer = AttemptSerializer(attempt, data=request.data)
         if serializer.is_valid():
-            attempt = serializer.save()
-            analyze_errors(attempt)
+            serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -243,6 +405,8 @@ class AttemptDetailView(APIView):
             )
         attempt = get_object_or_404(Attempt, id=id)
         attempt.delete()
+        # Удаленная попытка могла быть лучшей у ученика
+        leaderboard.refresh_entry(attempt.task_id, attempt.student_id)
         return Response({'message': f'Попытка с ID {id} успешно удалена'}, status=status.HTTP_204_NO_CONTENT)
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -256,6 +420,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return User.objects.filter(id=user.id)
 
     @action(detail=True, methods=['get'])
+    @read_replica
     def statistics(self, request, pk=None):
         user = self.get_object()
         if request.user.role == 'student' and request.user.id != int(pk):
@@ -354,28 +519,56 @@ class GenerateTextView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            # Генерируем текст
+            found_ids = [term.id for term in terms]
+
+            # Готовое задание покрывает термины - текст не генерируется
+            if request.data.get('reuse'):
+                try:
+                    threshold = float(request.data.get('reuse_threshold', settings.TERM_COVERAGE_REUSE_THRESHOLD))
+                except (TypeError, ValueError):
+                    return Response({"error": "Некорректный reuse_threshold"}, status=status.HTTP_400_BAD_REQUEST)
+                task = best_covering_task(found_ids, Task.visible_to(request.user), threshold)
+                if task is not None:
+                    logger.info(f"Генерация заменена готовым заданием {task.id}: покрыто {task.matched} из {len(terms)} терминов")
+                    generation_pool.log_request(found_ids, request.user, 'reused')
+                    return Response(reused_task_response(task, len(terms)))
+
+            # Готовый текст из пула выдается сразу, пул пополняется в фоне
             start_time = time.time()
+            if settings.GENERATION_POOL_ENABLED:
+                pooled_text = generation_pool.take(found_ids)
+                if pooled_text is not None:
+                    generation_pool.log_request(found_ids, request.user, 'pool')
+                    generation_pool.schedule_refill(found_ids)
+                    return Response({
+                        "text": pooled_text,
+                        "execution_time": time.time() - start_time,
+                        "from_pool": True,
+                        "near_duplicates": find_near_duplicates(pooled_text, Task.visible_to(request.user)),
+                    })
+
+            # Генерируем текст
             logger.info(f"Начало генерации текста. Термины: {[term.content for term in terms]}")
             
             try:
                 generator = get_generator()
                 response_text = generator.generate(terms)
-                
-                execution_time = time.time() - start_time
-                logger.info(f"Генерация текста завершена. Время выполнения: {execution_time:.2f} сек.")
-                
-                return Response({
-                    "text": response_text,
-                    "execution_time": execution_time
-                })
-                
             except Exception as e:
                 logger.error(f"Ошибка при генерации текста: {str(e)}")
                 return Response(
                     {"error": f"Ошибка генерации текста: {str(e)}"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
+
+            execution_time = time.time() - start_time
+            logger.info(f"Генерация текста завершена. Время выполнения: {execution_time:.2f} сек.")
+            response = Response({
+                "text": response_text,
+                "execution_time": execution_time,
+                "near_duplicates": find_near_duplicates(response_text, Task.visible_to(request.user)),
+            })
+            generation_pool.log_request(found_ids, request.user, 'generated')
+            return response
             
         except Exception as e:
             logger.error(f"Ошибка в API: {str(e)}")
@@ -383,3 +576,34 @@ class GenerateTextView(APIView):
                 {"error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+# Состояние генератора текста (бэкенды, маршрутизация, потоковая проверка)
+class GenerationStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsTeacherOrAdmin]
+
+    def get(self, request):
+        return Response(get_generator().status())
+
+# Метрики производительности в формате Prometheus (GET)
+class MetricsView(APIView):
+    # Prometheus не передает JWT: доступ ограничивается токеном METRICS_TOKEN,
+    # без токена эндпоинт скрыт, если не включен METRICS_PUBLIC
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        if not settings.METRICS_TOKEN:
+            if not settings.METRICS_PUBLIC:
+                return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+        elif request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+
+        # Счетчики потоковой генерации - только этого процесса и только если генератор уже создан
+        gauges = {}
+        if llm_generator._generator is not None:
+            for key, value in llm_generator._generator.stream_stats.snapshot().items():
+                gauges[f'generation_stream_{key}'] = ('Потоковая генерация (текущий процесс)', value)
+        return HttpResponse(
+            telemetry.render(telemetry.collect(), gauges),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
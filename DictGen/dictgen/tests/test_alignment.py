@@ -0,0 +1,40 @@
+import difflib
+from django.test import SimpleTestCase
+from main.alignment import ALGORITHMS, align
+from main.scoring import tokenize
+
+class AlignmentTests(SimpleTestCase):
+    def test_matches_difflib_on_short_texts(self):
+        """На коротких текстах опкоды совпадают с difflib"""
+        task = tokenize("вчера я ходил в магазин. купил хлеб, молоко и яблоки.")
+        attempt = tokenize("вчера я ходил в магозин. купил хлеб и яблоки.")
+        expected = difflib.SequenceMatcher(None, task, attempt).get_opcodes()
+
+        self.assertEqual(align(task, attempt, 'indel'), expected)
+        self.assertEqual(align(task, attempt, 'levenshtein'), expected)
+
+    def test_opcodes_cover_both_sequences(self):
+        """Опкоды без пропусков покрывают обе последовательности"""
+        task = tokenize("мама мыла раму. папа читал газету, а сын спал.")
+        attempt = tokenize("мама мыла. папа очень читал газеты а сын спал спал.")
+        for algorithm in ALGORITHMS:
+            opcodes = align(task, attempt, algorithm)
+            self.assertEqual(opcodes[0][1], 0)
+            self.assertEqual((opcodes[-1][2], opcodes[-1][4]), (len(task), len(attempt)))
+            for previous, current in zip(opcodes, opcodes[1:]):
+                self.assertEqual((previous[2], previous[4]), (current[1], current[3]))
+                # Соседние неравные блоки объединены
+                self.assertFalse(previous[0] != 'equal' and current[0] != 'equal')
+
+    def test_long_text_with_repeated_words(self):
+        """В длинном тексте с повторами находится только реальная ошибка"""
+        task = tokenize("и это было так, и это будет так. " * 300)
+        attempt = list(task)
+        attempt[1000] = 'эта'
+        opcodes = align(task, attempt, 'indel')
+
+        self.assertEqual([op for op in opcodes if op[0] != 'equal'], [('replace', 1000, 1001, 1000, 1001)])
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            align(['a'], ['b'], 'unknown')
@@ -0,0 +1,55 @@
+import json
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from main.models import User, Task, Error, Metric
+
+class AsyncAttemptSubmitTests(TestCase):
+    def setUp(self):
+        """Создание ученика и назначенного ему задания"""
+        self.user = User.objects.create_user(
+            username='student',
+            email='student@example.com',
+            password='test123',
+            first_name='Test',
+            last_name='User',
+            role='student'
+        )
+        self.task = Task.objects.create(
+            title='Тест',
+            content='Мама мыла раму. Папа читал газету.',
+            length=34,
+            min_words=5,
+            max_words=10,
+            min_sentences=2,
+            max_sentences=2,
+            user=self.user,
+            teacher=self.user,
+            assigned_user=self.user
+        )
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def post(self, payload, **headers):
+        return self.client.post(
+            '/api/attempts/async/',
+            data=json.dumps(payload),
+            content_type='application/json',
+            **headers
+        )
+
+    def test_submit_grades_attempt(self):
+        """Попытка проверяется и сохраняется вместе с ошибками и метриками"""
+        response = self.post(
+            {'task': self.task.id, 'content': 'Мама мыла рамы. Папа читал газету.', 'stage': 'submitted'},
+            HTTP_AUTHORIZATION=f'Bearer {self.token}'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Error.objects.count(), 1)
+        self.assertEqual(Error.objects.get().true_variant, 'раму')
+        self.assertLess(Metric.objects.get().accuracy, 1.0)
+        self.assertIsNotNone(response.json()['metrics'])
+
+    def test_requires_authentication(self):
+        """Без токена запрос отклоняется"""
+        response = self.post({'task': self.task.id, 'content': 'Текст'})
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,19 @@
+from django.test import SimpleTestCase
+from main.management.commands.benchmark_verification import (
+    Command, inflect_term, legacy_verify, lemma_verify, make_samples,
+)
+
+
+class BenchmarkVerificationTests(SimpleTestCase):
+    def test_inflect_term(self):
+        self.assertEqual(inflect_term('второе начало термодинамики', 'gent'), 'второго начала термодинамики')
+        self.assertEqual(inflect_term('энтропия', 'ablt'), 'энтропией')
+
+    def test_lemma_verifier_rejects_only_invalid_texts(self):
+        samples = make_samples(100, seed=0, invalid_rate=0.2)
+        command = Command()
+        legacy = command.evaluate(legacy_verify, samples)
+        lemma = command.evaluate(lemma_verify, samples)
+
+        self.assertEqual((lemma['false_rejects'], lemma['false_accepts']), (0, 0))
+        self.assertGreater(lemma['pass_rate'], legacy['pass_rate'])
@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.test import SimpleTestCase
+from main.bothub_client import BotHubClient, CircuitBreaker, CircuitOpenError
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Обработчик OpenAI-совместимого /chat/completions с заданным сценарием ответов"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests += 1
+        behavior = self.server.behaviors.pop(0) if self.server.behaviors else 'ok'
+
+        if behavior == 'hang':
+            # Клиент к этому моменту уже отключится по таймауту
+            time.sleep(2)
+            return
+        if behavior in ('error', 'bad_request'):
+            body = json.dumps({'error': {'message': 'boom'}}).encode()
+            self.send_response(500 if behavior == 'error' else 400)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for token in self.server.tokens:
+            chunk = {
+                'id': 'chatcmpl-test',
+                'object': 'chat.completion.chunk',
+                'created': 0,
+                'model': 'fake',
+                'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class BotHubClientTests(SimpleTestCase):
+    def setUp(self):
+        """Запуск локального фейкового OpenAI-сервера"""
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOpenAIHandler)
+        self.server.behaviors = []
+        self.server.tokens = ['Привет', ', ', 'мир']
+        self.server.requests = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def make_client(self, **kwargs):
+        kwargs.setdefault('backoff_base', 0)
+        return BotHubClient(
+            api_key='test',
+            base_url=f'http://127.0.0.1:{self.server.server_port}/v1',
+            **kwargs
+        )
+
+    def stream(self, client):
+        return "".join(client.stream_chat([{'role': 'user', 'content': 'test'}], model='fake'))
+
+    def test_stream_tokens(self):
+        """Текст собирается из потока"""
+        self.assertEqual(self.stream(self.make_client()), 'Привет, мир')
+
+    def test_retries_server_errors(self):
+        """Ошибки 5xx повторяются до успеха"""
+        self.server.behaviors = ['error', 'error', 'ok']
+        client = self.make_client(max_retries=2)
+
+        self.assertEqual(self.stream(client), 'Привет, мир')
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_read_timeout(self):
+        """Зависшее соединение прерывается по таймауту чтения"""
+        self.server.behaviors = ['hang']
+        client = self.make_client(read_timeout=0.3, max_retries=0)
+
+        start = time.monotonic()
+        with self.assertRaises(Exception):
+            self.stream(client)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_breaker_opens_and_rejects(self):
+        """После серии ошибок запросы отклоняются без обращения к серверу"""
+        self.server.behaviors = ['error', 'error']
+        client = self.make_client(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, recovery_timeout=60))
+
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                self.stream(client)
+        with self.assertRaises(CircuitOpenError):
+            self.stream(client)
+
+        self.assertEqual(self.server.requests, 2)
+        snapshot = client.breaker.snapshot()
+        self.assertEqual(snapshot['state'], CircuitBreaker.OPEN)
+        self.assertEqual(snapshot['total_rejected'], 1)
+
+    def test_breaker_recovers_after_timeout(self):
+        """После паузы пробный запрос замыкает выключатель"""
+        self.server.behaviors = ['error']
+        client = self.make_client(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, recovery_timeout=0.2))
+
+        with self.assertRaises(Exception):
+            self.stream(client)
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+        time.sleep(0.3)
+        self.assertEqual(client.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(self.stream(client), 'Привет, мир')
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_retries_count_as_one_failure(self):
+        """Запрос, не удавшийся после всех повторов, - одна ошибка для выключателя"""
+        self.server.behaviors = ['error'] * 3
+        client = self.make_client(max_retries=2, breaker=CircuitBreaker(failure_threshold=3, recovery_timeout=60))
+
+        with self.assertRaises(Exception):
+            self.stream(client)
+        self.assertEqual(self.server.requests, 3)
+        snapshot = client.breaker.snapshot()
+        self.assertEqual((snapshot['state'], snapshot['consecutive_failures']), (CircuitBreaker.CLOSED, 1))
+
+    def test_client_errors_do_not_open_breaker(self):
+        """Ответы 4xx не повторяются и не размыкают выключатель"""
+        self.server.behaviors = ['bad_request'] * 3
+        client = self.make_client(max_retries=2, breaker=CircuitBreaker(failure_threshold=1, recovery_timeout=60))
+
+        for _ in range(3):
+            with self.assertRaises(Exception):
+                self.stream(client)
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
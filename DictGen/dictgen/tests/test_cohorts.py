@@ -0,0 +1,91 @@
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from main.models import Attempt, Task, TaskAssignment, User
+
+
+class CohortAssignmentTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='test123', role='teacher'
+        )
+        self.students = [
+            User.objects.create_user(username=f's{i}', email=f's{i}@example.com', password='test123', role='student')
+            for i in range(3)
+        ]
+        self.outsider = User.objects.create_user(
+            username='outsider', email='outsider@example.com', password='test123', role='student'
+        )
+        self.task = Task.objects.create(
+            title='Диктант', content='Мама мыла раму.', length=15,
+            min_words=1, max_words=10, min_sentences=1, max_sentences=2,
+            user=self.teacher, teacher=self.teacher, is_public=False,
+        )
+
+    def auth(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    def assign_cohort(self):
+        response = self.client.post('/api/cohorts/', {
+            'name': '5А', 'students': [s.id for s in self.students],
+        }, content_type='application/json', **self.auth(self.teacher))
+        self.assertEqual(response.status_code, 201)
+        return self.client.post(
+            f'/api/tasks/{self.task.id}/assign/', {'cohort': response.json()['id']},
+            content_type='application/json', **self.auth(self.teacher)
+        )
+
+    def submit(self, student):
+        return self.client.post('/api/attempts/', {
+            'task': self.task.id, 'content': 'Мама мыла рамы.', 'stage': 'submitted',
+        }, content_type='application/json', **self.auth(student))
+
+    def test_cohort_fan_out(self):
+        """Одно задание назначается всей группе, повторное назначение ничего не дублирует"""
+        response = self.assign_cohort()
+        self.assertEqual(response.json(), {'assigned': 3, 'students': 3})
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertEqual(TaskAssignment.objects.filter(task=self.task).count(), 3)
+
+        response = self.assign_cohort()
+        self.assertEqual(response.json()['assigned'], 0)
+        self.assertEqual(TaskAssignment.objects.count(), 3)
+
+    def test_fan_out_query_count(self):
+        """Число запросов назначения не зависит от числа учеников"""
+        students = User.objects.bulk_create([
+            User(username=f'bulk{i}', email=f'bulk{i}@example.com', role='student') for i in range(30)
+        ])
+        with self.assertNumQueries(4):  # savepoint, существующие назначения, вставка, release
+            self.assertEqual(self.task.assign_students([s.id for s in students]), 30)
+
+    def test_student_access_through_assignment(self):
+        """Ученик группы видит задание и сдает попытку, остальные - нет"""
+        self.assign_cohort()
+
+        response = self.client.get('/api/tasks/', **self.auth(self.students[0]))
+        self.assertEqual([t['id'] for t in response.json()['results']], [self.task.id])
+        self.assertEqual(self.client.get('/api/tasks/', **self.auth(self.outsider)).json()['count'], 0)
+
+        response = self.submit(self.students[0])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['student'], self.students[0].id)
+        self.assertEqual(self.submit(self.students[1]).status_code, 201)
+        self.assertEqual(self.submit(self.outsider).status_code, 403)
+
+        # Попытки учеников одного задания разделены
+        response = self.client.get('/api/attempts/', **self.auth(self.students[0]))
+        self.assertEqual(response.json()['count'], 1)
+        other = Attempt.objects.get(student=self.students[1])
+        response = self.client.get(f'/api/attempts/{other.id}/', **self.auth(self.students[0]))
+        self.assertEqual(response.status_code, 403)
+
+    def test_other_teacher_cohort_not_found(self):
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='test123', role='teacher'
+        )
+        cohort = other.cohorts.create(name='6Б')
+        response = self.client.post(
+            f'/api/tasks/{self.task.id}/assign/', {'cohort': cohort.id},
+            content_type='application/json', **self.auth(self.teacher)
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,30 @@
+import random
+from django.test import SimpleTestCase
+from main.corpus import SIZES, inject_errors, make_corpus
+from main.scoring import find_errors
+
+class CorpusTests(SimpleTestCase):
+    def test_corpus_is_reproducible(self):
+        """Один и тот же seed дает один и тот же корпус"""
+        first = make_corpus(sizes=['paragraph'], samples_per_size=2, seed=7)
+        second = make_corpus(sizes=['paragraph'], samples_per_size=2, seed=7)
+
+        self.assertEqual(first, second)
+        self.assertGreaterEqual(first[0]['words'], SIZES['paragraph'])
+
+    def test_injects_requested_error_types(self):
+        """Ошибки вносятся с заданной частотой и находятся проверкой"""
+        text = make_corpus(sizes=['page'], samples_per_size=1, rates={}, seed=1)[0]['task_text']
+        attempt, injected = inject_errors(text, {'spelling': 0.02, 'missing': 0.01}, random.Random(1))
+
+        self.assertEqual(injected['spelling'], 6)
+        self.assertEqual(injected['missing'], 3)
+        self.assertEqual(injected['extra'], 0)
+        self.assertTrue(find_errors(text, attempt))
+
+    def test_zero_rates_keep_text(self):
+        """Без ошибок текст попытки совпадает с заданием"""
+        sample = make_corpus(sizes=['paragraph'], samples_per_size=1, rates={}, seed=3)[0]
+
+        self.assertEqual(sample['attempt_text'], sample['task_text'])
+        self.assertEqual(find_errors(sample['task_text'], sample['attempt_text']), [])
@@ -0,0 +1,55 @@
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from main.db_routing import PIN_COOKIE
+from main.models import Term, User
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DB_REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='test123', role='teacher'
+        )
+        # Реплика отстает: пользователь уже есть, термин еще не доехал
+        self.teacher.save(using='replica')
+        Term.objects.create(content='основной', subject='тест')
+        Term.objects.using('replica').create(content='реплика', subject='тест')
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.teacher).access_token}'}
+
+    def terms(self):
+        response = self.client.get('/api/terms/', **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return [term['content'] for term in response.json()['results']]
+
+    def test_list_reads_from_replica(self):
+        """Отмеченный список читается с реплики, остальные чтения - из основной БД"""
+        self.assertEqual(self.terms(), ['реплика'])
+        term = Term.objects.get(content='основной')
+        response = self.client.get(f'/api/terms/{term.id}/', **self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(f'/api/users/{self.teacher.id}/statistics/', **self.headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_reads_stick_to_primary_after_write(self):
+        """После записи пользователь читает свои данные из основной БД"""
+        response = self.client.post('/api/terms/', {'content': 'новый', 'subject': 'тест'}, **self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Term.objects.using('replica').filter(content='новый').exists())
+
+        self.assertEqual(sorted(self.terms()), ['новый', 'основной'])
+        # Закрепление передается в подписанной cookie, а не в кэше процесса
+        self.assertIn(PIN_COOKIE, self.client.cookies)
+        pin = self.client.cookies[PIN_COOKIE].value
+        del self.client.cookies[PIN_COOKIE]  # Окно закрепления истекло
+        self.assertEqual(self.terms(), ['реплика'])
+
+        # Поддельная cookie не закрепляет
+        self.client.cookies[PIN_COOKIE] = pin.replace(pin.split(':')[0], '999')
+        self.assertEqual(self.terms(), ['реплика'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_reads_primary(self):
+        self.assertEqual(self.terms(), ['основной'])
@@ -0,0 +1,70 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from main.error_storage import load_errors, pack_errors, unpack_errors
+from main.models import Attempt, Error, Task, User
+from main.serializers import AttemptSerializer, UserStatisticsSerializer
+
+ATTEMPT_TEXT = 'Мама мыла рамы, папа четал газету'
+
+
+class PackErrorsTests(SimpleTestCase):
+    def test_round_trip(self):
+        errors = [
+            {'error_type': 'spelling', 'position_start': 3, 'position_end': 9, 'true_variant': 'читал'},
+            {'error_type': 'missing', 'position_start': 70000, 'position_end': 70000, 'true_variant': 'ёлка'},
+            {'error_type': 'punctuation', 'position_start': 12, 'position_end': 13, 'true_variant': 'читал'},
+        ]
+        data = pack_errors(errors)
+
+        self.assertEqual(unpack_errors(data), errors)
+        self.assertEqual(unpack_errors(memoryview(data)), errors)
+        self.assertEqual(unpack_errors(pack_errors([])), [])
+        # Повторяющийся вариант хранится один раз
+        self.assertEqual(data.count('читал'.encode('utf-8')), 1)
+
+
+class ErrorStorageModeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='student', email='student@example.com', password='test123', role='student'
+        )
+        self.task = Task.objects.create(
+            title='Диктант', content='Мама мыла раму. Папа читал газету.', length=34,
+            min_words=1, max_words=10, min_sentences=1, max_sentences=2,
+            user=self.user, teacher=self.user, assigned_user=self.user,
+        )
+
+    def submit(self):
+        serializer = AttemptSerializer(data={'task': self.task.id, 'content': ATTEMPT_TEXT, 'stage': 'submitted'})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def snapshot(self, attempt):
+        errors = [(e.error_type, e.position_start, e.position_end, e.true_variant) for e in load_errors(attempt)]
+        return errors, AttemptSerializer(attempt).data['metrics'], UserStatisticsSerializer(self.user).data['error_statistics']
+
+    def test_packed_matches_rows(self):
+        """Упакованный режим не создает строк Error, а API возвращает то же самое"""
+        with override_settings(ERROR_STORAGE='rows'):
+            rows_attempt = self.submit()
+            expected = self.snapshot(Attempt.objects.get(id=rows_attempt.id))
+        self.assertGreater(Error.objects.count(), 1)
+        rows_attempt.delete()
+
+        with override_settings(ERROR_STORAGE='packed'):
+            attempt = Attempt.objects.get(id=self.submit().id)
+            self.assertEqual(self.snapshot(attempt), expected)
+        self.assertEqual(Error.objects.count(), 0)
+        self.assertIsNotNone(attempt.packed_errors)
+
+    def test_pack_errors_command(self):
+        """Команда переносит строки Error в поле попытки"""
+        with override_settings(ERROR_STORAGE='rows'):
+            attempt = self.submit()
+            expected = self.snapshot(Attempt.objects.get(id=attempt.id))
+
+        call_command('pack_errors', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(Error.objects.count(), 0)
+        self.assertEqual(self.snapshot(Attempt.objects.get(id=attempt.id)), expected)
@@ -0,0 +1,49 @@
+from django.test import TestCase
+from main.management.commands.exam_load_test import Command
+from main.models import Task, Term, User
+
+OPTIONS = {'prefix': 'exam', 'classes': 2, 'students': 3, 'terms': 4, 'password': 'secret123', 'seed': 0}
+
+
+class ExamLoadTestSeedTests(TestCase):
+    def test_seed_and_plan(self):
+        """Задание класса назначено его ученикам, данные удаляются по префиксу"""
+        command = Command()
+        command.seed(OPTIONS)
+        plan = command.load_plan('exam')
+
+        self.assertEqual(len(plan['students']), 6)
+        self.assertEqual(len(plan['teachers']), 2)
+        self.assertEqual(len(plan['terms']), 4)
+        self.assertEqual(Task.objects.filter(title__startswith='Экзамен').count(), 2)
+        task = Task.objects.get(id=plan['students'][0]['task'])
+        self.assertTrue(task.is_assigned_to(User.objects.get(username=plan['students'][0]['username'])))
+        self.assertNotEqual(plan['students'][0]['content'], task.content)
+
+        command.cleanup('exam')
+        self.assertFalse(User.objects.filter(username__startswith='exam_').exists())
+        self.assertFalse(Term.objects.filter(subject='exam_load').exists())
+
+    def test_seeded_student_can_submit(self):
+        """Ученик входит с общим паролем и отправляет попытку своего задания"""
+        command = Command()
+        command.seed(OPTIONS)
+        student = command.load_plan('exam')['students'][0]
+
+        response = self.client.post('/api/auth/login/', {'username': student['username'], 'password': 'secret123'})
+        self.assertEqual(response.status_code, 200)
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {response.json()['access']}"}
+        response = self.client.post('/api/attempts/', {
+            'task': student['task'], 'content': student['content'], 'stage': 'submitted',
+        }, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 201)
+
+    def test_summarize(self):
+        records = [(0.0, 0.1, 200), (0.5, 0.7, 200), (1.0, 1.2, 500), (1.5, 2.0, 'ReadTimeout')]
+        summary = Command().summarize(records)
+
+        self.assertEqual(summary['requests'], 4)
+        self.assertEqual(summary['errors'], {'500': 1, 'ReadTimeout': 1})
+        self.assertEqual(summary['error_rate'], 0.5)
+        self.assertAlmostEqual(summary['throughput_rps'], 2.0)
+        self.assertAlmostEqual(summary['max'], 0.2)
@@ -0,0 +1,112 @@
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from unittest.mock import MagicMock, patch
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from main import generation_pool
+from main.models import GenerationRequest, PooledText, Task, TaskTerm, Term, User
+
+
+class GenerationPoolTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='test123', role='teacher'
+        )
+        self.terms = [Term.objects.create(content=f'термин{i}', subject='физика') for i in range(3)]
+        self.ids = [t.id for t in self.terms]
+        self.generator = MagicMock()
+        self.generator.generate.side_effect = lambda terms: f'Текст {len(PooledText.objects.all())}.'
+
+    def test_popular_term_sets(self):
+        popular = generation_pool.term_key(self.ids[:2])
+        for _ in range(3):
+            generation_pool.log_request(reversed(self.ids[:2]), self.teacher, 'generated')
+        generation_pool.log_request(self.ids, self.teacher, 'generated')
+        # Задание с тем же набором терминов добавляет вес
+        task = Task.objects.create(
+            title='Задание', content='Текст.', length=6, min_words=1, max_words=10,
+            min_sentences=1, max_sentences=2, user=self.teacher, teacher=self.teacher,
+        )
+        TaskTerm.objects.bulk_create([TaskTerm(task=task, term=term) for term in self.terms])
+
+        self.assertEqual(
+            generation_pool.popular_term_sets(),
+            [(popular, 3), (generation_pool.term_key(self.ids), 2)],
+        )
+
+    def test_fill_respects_size_and_budget(self):
+        key = generation_pool.term_key(self.ids)
+        self.assertEqual(generation_pool.fill(key, 2, self.generator), 2)
+        self.assertEqual(generation_pool.fill(key, 2, self.generator), 0)
+        # Бюджет уже исчерпан - новые генерации не начинаются
+        self.assertEqual(generation_pool.fill(key, 5, self.generator, deadline=0.0), 0)
+
+        self.assertEqual(generation_pool.take(reversed(self.ids)), 'Текст 0.')
+        self.assertEqual(generation_pool.take(self.ids), 'Текст 1.')
+        self.assertIsNone(generation_pool.take(self.ids))
+
+    @patch('main.generation_pool.fill')
+    def test_refill_budget_counts_worker_thread_only(self, fill):
+        """Бюджет пополнения после запроса не зависит от CPU потоков запросов"""
+        done = threading.Event()
+        fill.side_effect = lambda *args, **kwargs: done.set()
+        generation_pool._submit(generation_pool.term_key(self.ids))
+        self.assertTrue(done.wait(5))
+        self.assertIs(fill.call_args.kwargs['clock'], time.thread_time)
+
+    def test_run_cycle(self):
+        generation_pool.log_request(self.ids, self.teacher, 'generated')
+        generation_pool.log_request(self.ids[:1], self.teacher, 'generated')
+        stats = generation_pool.run_cycle(cpu_budget=60, size=2, sets=10, generator=self.generator)
+        self.assertEqual((stats['sets'], stats['generated'], stats['failed']), (2, 4, 0))
+        self.assertEqual(PooledText.objects.filter(term_key=generation_pool.term_key(self.ids)).count(), 2)
+
+    @patch('main.generation_pool._submit')
+    def test_refill_only_when_enabled_in_pool_hours(self, submit):
+        with self.captureOnCommitCallbacks(execute=True):
+            generation_pool.schedule_refill(self.ids)
+            with self.settings(GENERATION_POOL_REFILL=True, GENERATION_POOL_HOURS='1-6'), \
+                    patch('main.generation_pool.timezone.localtime', return_value=datetime(2024, 1, 1, 12)):
+                generation_pool.schedule_refill(self.ids)
+        submit.assert_not_called()
+
+    def test_pool_hours(self):
+        at = lambda hour: datetime(2024, 1, 1, hour, tzinfo=dt_timezone.utc)
+        self.assertTrue(generation_pool.in_pool_hours(at(3), '1-6'))
+        self.assertFalse(generation_pool.in_pool_hours(at(6), '1-6'))
+        self.assertTrue(generation_pool.in_pool_hours(at(23), '22-4'))
+        self.assertFalse(generation_pool.in_pool_hours(at(12), '22-4'))
+        self.assertTrue(generation_pool.in_pool_hours(at(12), ''))
+
+    @override_settings(GENERATION_POOL_ENABLED=True, GENERATION_POOL_REFILL=True, GENERATION_POOL_HOURS='')
+    @patch('main.generation_pool._submit')
+    @patch('main.views.get_generator')
+    def test_generate_text_serves_from_pool(self, get_generator, submit):
+        get_generator.return_value.generate.return_value = 'Новый текст.'
+        PooledText.objects.create(term_key=generation_pool.term_key(self.ids), content='Готовый текст.')
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.teacher).access_token}'}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/generate-text/', {'terms': self.ids}, content_type='application/json', **headers
+            ).json()
+        self.assertEqual((response['text'], response['from_pool']), ('Готовый текст.', True))
+        submit.assert_called_once_with(generation_pool.term_key(self.ids))
+        get_generator.assert_not_called()
+
+        # Пул пуст - текст генерируется
+        response = self.client.post('/api/generate-text/', {'terms': self.ids}, content_type='application/json', **headers).json()
+        self.assertEqual(response['text'], 'Новый текст.')
+        self.assertEqual(list(GenerationRequest.objects.order_by('id').values_list('source', flat=True)), ['pool', 'generated'])
+
+    @patch('main.views.get_generator')
+    def test_log_failure_does_not_fail_generation(self, get_generator):
+        """Ошибка записи журнала не превращает готовый текст в ошибку запроса"""
+        get_generator.return_value.generate.return_value = 'Новый текст.'
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.teacher).access_token}'}
+
+        with patch.object(GenerationRequest.objects, 'create', side_effect=RuntimeError('журнал недоступен')):
+            response = self.client.post('/api/generate-text/', {'terms': self.ids}, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['text'], 'Новый текст.')
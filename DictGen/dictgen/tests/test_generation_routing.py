@@ -0,0 +1,83 @@
+import time
+from django.test import SimpleTestCase
+from main.generation_backends import GenerationBackend
+from main.generation_routing import HedgedStream, LatencyRouter
+
+class Term:
+    def __init__(self, content):
+        self.content = content
+
+class DelayedBackend(GenerationBackend):
+    """Отдает текст по словам после задержки первого токена"""
+
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+        self.cancelled = False
+
+    def stream(self, terms, cancel):
+        if cancel.wait(self.delay):
+            self.cancelled = True
+            return
+        for word in "Энтропия растет. Это важно. Конец.".split(' '):
+            yield word + ' '
+
+class FailingBackend(GenerationBackend):
+    name = 'failing'
+
+    def stream(self, terms, cancel):
+        raise RuntimeError('нет соединения')
+        yield
+
+
+class LatencyRouterTests(SimpleTestCase):
+    def test_orders_by_latency_and_errors(self):
+        """Быстрый бэкенд идет первым, пока у него нет ошибок"""
+        slow, fast = DelayedBackend('slow', 0), DelayedBackend('fast', 0)
+        router = LatencyRouter([slow, fast], min_samples=3)
+        self.assertEqual([b.name for b in router.order()], ['slow', 'fast'])
+
+        for _ in range(3):
+            router.record('slow', 0.5, 2.0, ok=True)
+            router.record('fast', 0.1, 1.0, ok=True)
+        self.assertEqual([b.name for b in router.order()], ['fast', 'slow'])
+
+        for _ in range(3):
+            router.record('fast', None, 0.1, ok=False)
+        self.assertEqual([b.name for b in router.order()], ['slow', 'fast'])
+
+
+class HedgedStreamTests(SimpleTestCase):
+    def test_hedge_wins_and_cancels_loser(self):
+        """Запасной бэкенд запускается по таймауту, основной отменяется"""
+        primary, secondary = DelayedBackend('primary', 5), DelayedBackend('secondary', 0)
+        router = LatencyRouter([primary, secondary])
+        stream = HedgedStream([primary, secondary], [Term('энтропия')], router, hedge_after=0.05)
+
+        start = time.monotonic()
+        text = ''.join(stream)
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(stream.winner, 'secondary')
+        self.assertIn('Конец.', text)
+        time.sleep(0.1)
+        self.assertTrue(primary.cancelled)
+        self.assertEqual(router.stats['primary'].requests, 0)
+
+    def test_no_hedge_for_fast_primary(self):
+        """Быстрый основной бэкенд не порождает второй запрос"""
+        primary, secondary = DelayedBackend('primary', 0), DelayedBackend('secondary', 0)
+        stream = HedgedStream([primary, secondary], [Term('энтропия')], LatencyRouter([primary, secondary]), hedge_after=1)
+        ''.join(stream)
+
+        self.assertEqual(stream.started, ['primary'])
+
+    def test_error_starts_next_backend(self):
+        """Ошибка основного бэкенда сразу запускает запасной"""
+        failing, backup = FailingBackend(), DelayedBackend('backup', 0)
+        router = LatencyRouter([failing, backup])
+        stream = HedgedStream([failing, backup], [Term('энтропия')], router, hedge_after=10)
+        ''.join(stream)
+
+        self.assertEqual(stream.winner, 'backup')
+        self.assertEqual(router.stats['failing'].errors, 1)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from main import leaderboard
+from main.models import Attempt, Metric, Task, User
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='test123', role='teacher'
+        )
+        self.students = [
+            User.objects.create_user(username=f's{i}', email=f's{i}@example.com', password='test123', role='student')
+            for i in range(4)
+        ]
+        self.task = Task.objects.create(
+            title='Диктант', content='Мама мыла раму.', length=15,
+            min_words=1, max_words=10, min_sentences=1, max_sentences=2,
+            user=self.teacher, teacher=self.teacher,
+        )
+        self.start = timezone.now()
+        # Кэш рейтингов общий для процесса, а ID заданий в тестах повторяются
+        leaderboard._rankings.clear()
+
+    def grade(self, student, accuracy, minutes=0):
+        """Проверенная попытка с заданной точностью и временем проверки"""
+        attempt = Attempt.objects.create(task=self.task, student=student, content='...', stage='submitted')
+        metric = Metric.objects.create(attempt=attempt, levenshtein=0, wer=0, cer=0, per=0, accuracy=accuracy)
+        Metric.objects.filter(id=metric.id).update(creation_date=self.start + timedelta(minutes=minutes))
+        with self.captureOnCommitCallbacks(execute=True):
+            leaderboard.refresh_entry(self.task.id, student.id)
+        return attempt
+
+    def get(self, user, **params):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get(
+            f'/api/tasks/{self.task.id}/leaderboard/', params, HTTP_AUTHORIZATION=f'Bearer {token}'
+        ).json()
+
+    def test_order_and_ranks(self):
+        """Точность по убыванию, при равной - кто раньше; место ученика совпадает с местом в списке"""
+        s0, s1, s2, s3 = self.students
+        self.grade(s0, 0.8, minutes=1)
+        self.grade(s1, 0.9, minutes=5)
+        self.grade(s2, 0.8, minutes=0)
+        self.grade(s3, 0.8, minutes=0)  # Та же точность и время - выше меньший ID попытки
+
+        data = self.get(self.teacher, page_size=3)
+        self.assertEqual(data['count'], 4)
+        self.assertEqual([(e['rank'], e['username']) for e in data['results']], [(1, 's1'), (2, 's2'), (3, 's3')])
+        self.assertEqual(self.get(self.teacher, page=2, page_size=3)['results'][0]['username'], 's0')
+        for rank, student in enumerate([s1, s2, s3, s0], start=1):
+            self.assertEqual(self.get(self.teacher, student=student.id)['rank'], rank)
+
+    def test_incremental_updates(self):
+        """Лучшая попытка заменяет запись, худшая - нет, удаление лучшей возвращает прежнюю"""
+        s0, s1 = self.students[:2]
+        self.grade(s0, 0.7)
+        self.grade(s1, 0.8)
+        self.assertEqual(leaderboard.get_ranking(self.task.id).rank(s0.id), 2)
+
+        best = self.grade(s0, 0.95, minutes=1)
+        self.grade(s0, 0.5, minutes=2)
+        ranking = leaderboard.get_ranking(self.task.id)
+        self.assertEqual((ranking.rank(s0.id), ranking.rank(s1.id)), (1, 2))
+        self.assertEqual(self.task.leaderboard.get(student=s0).attempt_id, best.id)
+
+        best.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            leaderboard.refresh_entry(self.task.id, s0.id)
+        self.assertEqual(leaderboard.get_ranking(self.task.id).rank(s0.id), 2)
+        # Кэш процесса совпадает с рейтингом, прочитанным из БД
+        self.assertEqual(leaderboard.get_ranking(self.task.id).keys, leaderboard._load(self.task.id, 0).keys)
+
+    def test_rebuild_and_other_process_changes(self):
+        """Изменение версии в БД (другой процесс, перепроверка) сбрасывает кэш рейтинга"""
+        s0, s1 = self.students[:2]
+        self.grade(s0, 0.9)
+        self.grade(s1, 0.8)
+        self.assertEqual(leaderboard.get_ranking(self.task.id).rank(s1.id), 2)
+
+        Metric.objects.filter(attempt__student=s1).update(accuracy=0.99)
+        self.assertEqual(leaderboard.rebuild(self.task.id), 2)
+        self.assertEqual(leaderboard.get_ranking(self.task.id).rank(s1.id), 1)
+
+    def test_student_sees_own_rank_only(self):
+        s0, s1 = self.students[:2]
+        self.grade(s0, 0.9)
+        self.grade(s1, 0.8)
+
+        data = self.get(s1, student=s0.id)
+        self.assertEqual((data['student'], data['rank'], data['count']), (s1.id, 2, 2))
+        self.assertNotIn('results', data)
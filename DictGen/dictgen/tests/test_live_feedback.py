@@ -0,0 +1,155 @@
+import json
+import random
+import threading
+from unittest.mock import patch
+from asgiref.testing import ApplicationCommunicator
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from main.corpus import make_corpus
+from main.live_alignment import LiveAlignmentSession
+from main.live_feedback import CLOSE_TOO_LARGE, CLOSE_UNAUTHORIZED, LIVE_PATH, websocket_application
+from main.models import Task, User
+from main.scoring import find_errors, tokenize_with_offsets
+
+
+class LiveAlignmentSessionTests(SimpleTestCase):
+    def test_typing_matches_full_check(self):
+        """После набора текста по кусочкам ошибки совпадают с полной проверкой"""
+        rng = random.Random(0)
+        sample = make_corpus(sizes=['paragraph'], samples_per_size=1, seed=1)[0]
+        session = LiveAlignmentSession(sample['task_text'])
+        target = sample['attempt_text']
+        pos = 0
+        while pos < len(target):
+            n = rng.randint(1, 5)
+            session.apply(len(session.text), len(session.text), target[pos:pos + n])
+            pos += n
+
+        self.assertEqual(session.text, target)
+        self.assertEqual(session.spans, tokenize_with_offsets(target))
+        self.assertEqual(session.errors(final=True), find_errors(sample['task_text'], target))
+
+    def test_edit_in_middle(self):
+        """Исправление слова в середине текста убирает ошибку и сдвигает позиции"""
+        session = LiveAlignmentSession('Кот сидел на окне. Кот спал на окне.')
+        session.reset('Кот сидел на акне. Кот спал на окне.')
+        self.assertEqual([e['true_variant'] for e in session.errors()], ['окне'])
+
+        session.apply(13, 17, 'подоконнике')
+        session.apply(13, 24, 'окне')
+        self.assertEqual(session.errors(), [])
+
+        session.apply(0, 3, 'Котик')
+        error, = session.errors()
+        self.assertEqual(session.text[error['position_start']:error['position_end']], 'Котик')
+
+    def test_untyped_tail_not_reported(self):
+        """Ненабранный конец задания не считается ошибкой до final"""
+        session = LiveAlignmentSession('Мама мыла раму. Папа читал газету.')
+        session.apply(0, 0, 'Мама мыла')
+        self.assertEqual(session.errors(), [])
+        self.assertEqual(session.pending, 2)
+        self.assertEqual(len(session.errors(final=True)), 1)
+
+    def test_text_length_limited(self):
+        session = LiveAlignmentSession('Кот.', max_length=10)
+        with self.assertRaises(ValueError):
+            session.apply(0, 0, 'x' * 11)
+
+
+class LiveFeedbackSocketTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='student', email='student@example.com', password='test123', role='student'
+        )
+        self.task = Task.objects.create(
+            title='Тест', content='Мама мыла раму.', length=15,
+            min_words=1, max_words=10, min_sentences=1, max_sentences=1,
+            user=self.user, teacher=self.user, assigned_user=self.user,
+        )
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def communicator(self, token):
+        return ApplicationCommunicator(websocket_application, {
+            'type': 'websocket',
+            'path': LIVE_PATH,
+            'query_string': f'task={self.task.id}&token={token}'.encode(),
+        })
+
+    async def test_edits_return_errors(self):
+        """Правки применяются по порядку, ответ содержит ошибки текста"""
+        communicator = self.communicator(self.token)
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual((await communicator.receive_output())['type'], 'websocket.accept')
+
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(
+            {'type': 'reset', 'text': 'Мама мила', 'seq': 1}
+        )})
+        response = json.loads((await communicator.receive_output())['text'])
+        self.assertEqual(response['seq'], 1)
+        self.assertEqual([e['error_type'] for e in response['errors']], ['spelling'])
+
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(
+            {'type': 'edit', 'start': 6, 'end': 7, 'text': 'ы', 'length': 9, 'seq': 2}
+        )})
+        response = json.loads((await communicator.receive_output())['text'])
+        self.assertEqual(response['errors'], [])
+        self.assertEqual(response['pending'], 2)
+
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(
+            {'type': 'edit', 'start': 50, 'end': 50, 'text': 'x'}
+        )})
+        self.assertEqual(json.loads((await communicator.receive_output())['text'])['type'], 'resync')
+
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait()
+
+    async def test_reset_runs_outside_event_loop(self):
+        """Полная проверка (reset) выполняется вне потока цикла событий, небольшая правка - в нем"""
+        threads = []
+        reset, apply = LiveAlignmentSession.reset, LiveAlignmentSession.apply
+
+        def record(method):
+            def wrapper(session, *args):
+                threads.append(threading.get_ident())
+                return method(session, *args)
+            return wrapper
+
+        communicator = self.communicator(self.token)
+        with patch.object(LiveAlignmentSession, 'reset', record(reset)), \
+                patch.object(LiveAlignmentSession, 'apply', record(apply)):
+            await communicator.send_input({'type': 'websocket.connect'})
+            await communicator.receive_output()
+            threads.clear()
+            for message in ({'type': 'reset', 'text': 'Мама мила'}, {'type': 'edit', 'start': 6, 'end': 7, 'text': 'ы'}):
+                await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(message)})
+                await communicator.receive_output()
+        self.assertNotEqual(threads[0], threading.get_ident())
+        self.assertEqual(threads[1], threading.get_ident())
+
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait()
+
+    @override_settings(LIVE_MAX_TEXT_LENGTH=10)
+    async def test_too_long_text_closes_connection(self):
+        """Слишком длинный текст не вызывает бесконечного цикла resync/reset"""
+        communicator = self.communicator(self.token)
+        await communicator.send_input({'type': 'websocket.connect'})
+        await communicator.receive_output()
+
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps({'type': 'reset', 'text': 'x' * 11})})
+        self.assertEqual(json.loads((await communicator.receive_output())['text'])['type'], 'too_large')
+        self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': CLOSE_TOO_LARGE})
+
+    async def test_invalid_token_rejected(self):
+        communicator = self.communicator('invalid')
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+
+    async def test_inactive_user_rejected(self):
+        """Токен удаленного или неактивного пользователя не принимается"""
+        self.user.is_active = False
+        await self.user.asave()
+        communicator = self.communicator(self.token)
+        await communicator.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
@@ -0,0 +1,56 @@
+import asyncio
+from django.test import SimpleTestCase
+from main.generation_backends import GenerationError, StubBackend
+from main.llm_generator import TextGenerator
+from main.models import Term
+
+TERMS = [Term(content='энтропия'), Term(content='теплота')]
+
+class TextGeneratorTests(SimpleTestCase):
+    def generator(self, *backends):
+        generator = TextGenerator(list(backends))
+        generator.hedge_after = 0
+        return generator
+
+    def test_generates_text_with_all_terms(self):
+        """Текст заглушки проходит проверку с первой попытки"""
+        trace = {}
+        text = self.generator(StubBackend(seed=1, pattern=['ok'])).generate(TERMS, trace)
+
+        self.assertIn('энтропия', text)
+        self.assertIn('теплота', text)
+        self.assertEqual(trace['attempts'], 1)
+        self.assertEqual(trace['backend'], 'stub')
+        self.assertIsNotNone(trace['ttft'])
+
+    def test_retries_after_errors_and_invalid_text(self):
+        """Ошибки и непрошедший проверку текст ведут к повторным попыткам"""
+        trace = {}
+        text = self.generator(StubBackend(pattern=['midstream', 'invalid', 'ok'])).generate(TERMS, trace)
+
+        self.assertIn('энтропия', text)
+        self.assertEqual(trace['attempts'], 3)
+        self.assertEqual(trace['passed'], 1)
+
+    def test_raises_when_all_attempts_fail(self):
+        """После исчерпания попыток генерация завершается ошибкой"""
+        generator = self.generator(StubBackend(pattern=['invalid']))
+
+        with self.assertRaises(GenerationError):
+            generator.generate(TERMS)
+        self.assertEqual(generator.stream_stats.snapshot()['requests'], generator.max_attempts)
+
+    def test_falls_back_to_next_backend(self):
+        """При ошибке основного бэкенда используется следующий"""
+        trace = {}
+        generator = self.generator(StubBackend(name='primary', pattern=['error']), StubBackend(name='backup', pattern=['ok']))
+
+        generator.generate(TERMS, trace)
+        self.assertEqual(trace['backend'], 'backup')
+        self.assertEqual(generator.router.stats['primary'].errors, 1)
+
+    def test_agenerate(self):
+        """Асинхронная генерация дает тот же текст, что и синхронная"""
+        generator = self.generator(StubBackend(seed=2, pattern=['ok']))
+
+        self.assertEqual(asyncio.run(generator.agenerate(TERMS)), generator.generate(TERMS))
@@ -0,0 +1,59 @@
+import io
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from django.test import SimpleTestCase
+from main.logger import JsonFormatter, PreparedQueueHandler, RequestIdFilter, SamplingFilter, request_id
+
+
+def make_record(name, level=logging.INFO, msg='сообщение', args=None, exc_info=None):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, exc_info)
+
+
+class SamplingFilterTests(SimpleTestCase):
+    def test_rates_apply_to_child_loggers_below_warning(self):
+        """Правило логгера действует на потомков; предупреждения не отбрасываются"""
+        sampling = SamplingFilter({'main.llm_generator': 0.0, 'main': 1.0})
+        self.assertFalse(sampling.filter(make_record('main.llm_generator')))
+        self.assertFalse(sampling.filter(make_record('main.llm_generator.prompt')))
+        self.assertTrue(sampling.filter(make_record('main.llm_generator', logging.WARNING)))
+        self.assertTrue(sampling.filter(make_record('main.views')))
+
+
+class QueuedJsonLoggingTests(SimpleTestCase):
+    def test_record_keeps_request_id_and_traceback(self):
+        """Через очередь доходят ID запроса, сообщение с аргументами и трейсбек"""
+        records = queue.SimpleQueue()
+        handler = PreparedQueueHandler(records)
+        handler.addFilter(RequestIdFilter())
+        stream = io.StringIO()
+        output = logging.StreamHandler(stream)
+        output.setFormatter(JsonFormatter('%(levelname)s %(message)s %(request_id)s'))
+        listener = logging.handlers.QueueListener(records, output)
+        listener.start()
+
+        token = request_id.set('req-1')
+        try:
+            try:
+                raise ValueError('ошибка')
+            except ValueError:
+                handler.handle(make_record('main', logging.ERROR, 'попытка %s', (5,), exc_info=sys.exc_info()))
+        finally:
+            request_id.reset(token)
+        listener.stop()
+
+        record = json.loads(stream.getvalue())
+        self.assertEqual(record['message'], 'попытка 5')
+        self.assertEqual(record['request_id'], 'req-1')
+        self.assertIn('ValueError: ошибка', record['exc_info'])
+
+
+class RequestIdMiddlewareTests(SimpleTestCase):
+    def test_request_id_echoed_or_generated(self):
+        response = self.client.get('/', HTTP_X_REQUEST_ID='abc-123')
+        self.assertEqual(response['X-Request-ID'], 'abc-123')
+
+        response = self.client.get('/', HTTP_X_REQUEST_ID='bad id\n')
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.test import SimpleTestCase
+from main.model_download import check_model_file, download_model, verify_model_file, manifest_path
+
+PAYLOAD = os.urandom(256 * 1024 + 123)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Отдает PAYLOAD с поддержкой заголовка Range и SHA-256 в X-Linked-Etag, как Hugging Face"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('X-Linked-Etag', f'"{PAYLOAD_SHA256}"')
+        self.send_header('Content-Length', str(len(PAYLOAD)))
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get('Range'))
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header:
+            start = int(range_header.split('=')[1].split('-')[0])
+            if start >= len(PAYLOAD):
+                self.send_response(416)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}')
+        else:
+            self.send_response(200)
+        body = PAYLOAD[start:]
+        self.send_header('X-Linked-Etag', f'"{PAYLOAD_SHA256}"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ModelDownloadTests(SimpleTestCase):
+    def setUp(self):
+        """Локальный HTTP-сервер и временная директория кэша"""
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.path = os.path.join(self.cache_dir, 'model.gguf')
+        self.url = f'http://127.0.0.1:{self.server.server_port}/model.gguf'
+        self.sha256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+    def read(self, path):
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def test_download_writes_verified_file(self):
+        """Файл скачивается, проверяется и получает манифест"""
+        download_model(self.url, self.path, expected_sha256=self.sha256, chunk_size=4096)
+
+        self.assertEqual(self.read(self.path), PAYLOAD)
+        self.assertFalse(os.path.exists(self.path + '.part'))
+        self.assertTrue(os.path.exists(manifest_path(self.path)))
+        self.assertTrue(verify_model_file(self.path, self.sha256))
+
+    def test_resume_partial_download(self):
+        """Недокачанный файл продолжается с места обрыва"""
+        with open(self.path + '.part', 'wb') as file:
+            file.write(PAYLOAD[:100000])
+
+        download_model(self.url, self.path, expected_sha256=self.sha256)
+
+        self.assertEqual(self.server.requests, ['bytes=100000-'])
+        self.assertEqual(self.read(self.path), PAYLOAD)
+
+    def test_hash_mismatch_rejected(self):
+        """Файл с неверным хэшем не попадает на место модели"""
+        with self.assertRaises(ValueError):
+            download_model(self.url, self.path, expected_sha256='0' * 64)
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.path + '.part'))
+
+    def test_verified_file_not_downloaded_again(self):
+        """Проверенный файл повторно не скачивается"""
+        download_model(self.url, self.path, expected_sha256=self.sha256)
+        download_model(self.url, self.path, expected_sha256=self.sha256)
+
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_concurrent_downloads_share_one_request(self):
+        """Одновременные вызовы скачивают файл один раз"""
+        threads = [
+            threading.Thread(target=download_model, args=(self.url, self.path, self.sha256))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.read(self.path), PAYLOAD)
+
+    def test_modified_file_fails_verification(self):
+        """Изменение файла после скачивания обнаруживается"""
+        download_model(self.url, self.path, expected_sha256=self.sha256)
+        with open(self.path, 'r+b') as file:
+            file.write(b'corrupted')
+
+        self.assertFalse(verify_model_file(self.path, self.sha256))
+
+    def test_server_hash_saved_in_manifest(self):
+        """Без заданного хэша файл проверяется по хэшу из заголовков сервера"""
+        download_model(self.url, self.path)
+        self.assertTrue(verify_model_file(self.path))
+
+        with open(self.path, 'r+b') as file:
+            file.write(b'corrupted')
+        self.assertFalse(check_model_file(self.path))
+        # Временные файлы манифеста не остаются
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ['model.gguf', 'model.gguf.lock', 'model.gguf.manifest.json'])
+
+    def test_truncated_legacy_file_replaced(self):
+        """Недокачанный файл без манифеста не принимается и скачивается заново"""
+        with open(self.path, 'wb') as file:
+            file.write(PAYLOAD[:1000])
+
+        # Сравнивать не с чем - файл не считается проверенным
+        self.assertFalse(verify_model_file(self.path))
+        self.assertFalse(check_model_file(self.path, url=self.url))
+
+        download_model(self.url, self.path)
+        self.assertEqual(self.read(self.path), PAYLOAD)
+        self.assertTrue(check_model_file(self.path, url=self.url))
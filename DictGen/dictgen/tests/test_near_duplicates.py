@@ -0,0 +1,78 @@
+from unittest.mock import AsyncMock, patch
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from main import generation_pool, near_duplicates
+from main.models import PooledText, Task, TaskLSHBucket, Term, User
+
+LECTURE = (
+    'Энтропия характеризует меру беспорядка в термодинамической системе. '
+    'При необратимых процессах в изолированной системе энтропия возрастает, '
+    'а в состоянии равновесия она достигает максимума. Второе начало термодинамики '
+    'формулирует этот закон для всех макроскопических систем.'
+)
+# Та же лекция с одним измененным предложением
+VARIANT = LECTURE.replace('достигает максимума', 'становится максимальной')
+OTHER = (
+    'Фотосинтез протекает в хлоропластах растительных клеток. Энергия света '
+    'превращается в энергию химических связей глюкозы, а кислород выделяется в атмосферу.'
+)
+
+
+class NearDuplicateTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='test123', role='teacher'
+        )
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.teacher).access_token}'}
+
+    def create(self, title, content):
+        return self.client.post('/api/tasks/', {
+            'title': title, 'content': content, 'length': len(content),
+            'min_words': 1, 'max_words': 100, 'min_sentences': 1, 'max_sentences': 10,
+            'user': self.teacher.id, 'teacher': self.teacher.id,
+        }, content_type='application/json', **self.headers)
+
+    def test_signature_estimates_jaccard(self):
+        first, second = near_duplicates.shingles(LECTURE), near_duplicates.shingles(VARIANT)
+        jaccard = len(first & second) / len(first | second)
+        estimate = near_duplicates.similarity(near_duplicates.signature(LECTURE), near_duplicates.signature(VARIANT))
+        self.assertAlmostEqual(estimate, jaccard, delta=0.15)
+        self.assertIsNone(near_duplicates.signature('...'))
+
+    def test_saved_near_duplicate_is_flagged(self):
+        original = self.create('Энтропия', LECTURE).json()
+        self.assertEqual(original['near_duplicates'], [])
+        self.assertEqual(TaskLSHBucket.objects.filter(task_id=original['id']).count(), near_duplicates.BANDS)
+
+        duplicates = self.create('Энтропия 2', VARIANT).json()['near_duplicates']
+        self.assertEqual([d['id'] for d in duplicates], [original['id']])
+        self.assertGreaterEqual(duplicates[0]['similarity'], 0.5)
+        self.assertEqual(self.create('Фотосинтез', OTHER).json()['near_duplicates'], [])
+
+    def test_lookup_after_content_change(self):
+        task_id = self.create('Энтропия', LECTURE).json()['id']
+        response = self.client.put(
+            f'/api/tasks/{task_id}/', {'content': OTHER}, content_type='application/json', **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(near_duplicates.find_near_duplicates(LECTURE, threshold=0.5), [])
+        self.assertEqual([d['id'] for d in near_duplicates.find_near_duplicates(OTHER)], [task_id])
+        # Поиск только среди переданных заданий
+        self.assertEqual(near_duplicates.find_near_duplicates(OTHER, Task.objects.none()), [])
+
+    @override_settings(GENERATION_POOL_ENABLED=True, GENERATION_POOL_REFILL=False)
+    @patch('main.async_views.get_generator')
+    @patch('main.views.get_generator')
+    def test_generated_text_flagged_in_both_views(self, get_generator, get_async_generator):
+        """Синхронная и асинхронная генерация отмечают похожие задания, в том числе для текста из пула"""
+        original = self.create('Энтропия', LECTURE).json()
+        term = Term.objects.create(content='энтропия', subject='физика')
+        get_generator.return_value.generate.return_value = VARIANT
+        get_async_generator.return_value.agenerate = AsyncMock(return_value=VARIANT)
+
+        for url in ('/api/generate-text/', '/api/generate-text/async/'):
+            PooledText.objects.create(term_key=generation_pool.term_key([term.id]), content=VARIANT)
+            for from_pool in (True, False):
+                response = self.client.post(url, {'terms': [term.id]}, content_type='application/json', **self.headers).json()
+                self.assertEqual(response.get('from_pool', False), from_pool)
+                self.assertEqual([d['id'] for d in response['near_duplicates']], [original['id']])
@@ -0,0 +1,61 @@
+from django.test import SimpleTestCase
+from main.prefix_cache import PromptPrefixCache
+
+class CharModel:
+    """Посимвольная модель с тем же учетом контекста, что и у ctransformers"""
+    BOS = 1
+
+    def __init__(self, reply):
+        self.reply = reply
+        self._context = []
+        self.evaluated = 0
+
+    def tokenize(self, text, add_bos_token=None):
+        bos = [self.BOS] if add_bos_token is not False else []
+        return bos + [ord(c) for c in text]
+
+    def detokenize(self, tokens, decode=True):
+        text = ''.join(chr(t) for t in tokens)
+        return text if decode else text.encode()
+
+    def prepare_inputs_for_generation(self, tokens, reset=None):
+        n = min(len(tokens) - 1, len(self._context))
+        length = 0
+        while length < n and tokens[length] == self._context[length]:
+            length += 1
+        self._context = self._context[:length]
+        return tokens[length:]
+
+    def eval(self, tokens):
+        self.evaluated += len(tokens)
+        self._context.extend(tokens)
+
+    def generate(self, tokens, **sampling):
+        self.eval(self.prepare_inputs_for_generation(tokens))
+        for token in self.tokenize(self.reply, add_bos_token=False):
+            self.eval([token])
+            yield token
+
+
+class PromptPrefixCacheTests(SimpleTestCase):
+    def test_prefix_evaluated_once(self):
+        """Статическая часть промпта вычисляется один раз"""
+        model = CharModel('Ответ.')
+        cache = PromptPrefixCache(model, 'Инструкция. ')
+
+        cache.warm()
+        after_warm = model.evaluated
+        self.assertEqual(''.join(cache.generate('альфа', max_new_tokens=100, stop=[])), 'Ответ.')
+        self.assertEqual(model.evaluated - after_warm, len('альфа') + len('Ответ.'))
+
+        before = model.evaluated
+        ''.join(cache.generate('бета', max_new_tokens=100, stop=[]))
+        self.assertEqual(model.evaluated - before, len('бета') + len('Ответ.'))
+        self.assertEqual(cache.snapshot()['requests'], 2)
+
+    def test_stop_sequence_and_token_limit(self):
+        """Стоп-последовательность и лимит токенов обрезают ответ"""
+        cache = PromptPrefixCache(CharModel('Текст[INST] лишнее'), 'Инструкция. ')
+
+        self.assertEqual(''.join(cache.generate('x', max_new_tokens=100, stop=['[INST]'])), 'Текст')
+        self.assertEqual(''.join(cache.generate('x', max_new_tokens=3, stop=['[INST]'])), 'Тек')
@@ -0,0 +1,74 @@
+import os
+import pstats
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from main.models import User
+from main.profiling import list_profiles, profile_paths
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            PROFILING_ENABLED=True, PROFILE_DIR=self.directory.name, PROFILE_MAX_FILES=2
+        )
+        self.settings_override.enable()
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='test123', role='admin'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='test123', role='student'
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.directory.cleanup()
+
+    def get(self, user, **headers):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get('/api/tasks/', HTTP_AUTHORIZATION=f'Bearer {token}', **headers)
+
+    def test_admin_header_saves_profile(self):
+        """Заголовок администратора сохраняет профиль под ID запроса"""
+        response = self.get(self.admin, HTTP_X_PROFILE='1', HTTP_X_REQUEST_ID='req-42')
+
+        profile, = list_profiles()
+        self.assertEqual(response['X-Profile-ID'], profile['id'])
+        self.assertEqual((profile['request_id'], profile['path'], profile['reason']), ('req-42', '/api/tasks/', 'header'))
+
+        output = StringIO()
+        call_command('profiles', 'show', profile['id'], stdout=output)
+        self.assertIn('function calls', output.getvalue())
+
+    async def test_async_profile_contains_sync_view(self):
+        """Под ASGI профиль снимается в потоке синхронного представления"""
+        token = RefreshToken.for_user(self.admin).access_token
+        response = await self.async_client.get(
+            '/api/tasks/', headers={'Authorization': f'Bearer {token}', 'X-Profile': '1'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        functions = pstats.Stats(profile_paths(response['X-Profile-ID'])[0]).stats
+        self.assertTrue(any(
+            name == 'get' and filename.endswith(os.path.join('main', 'views.py'))
+            for filename, _, name in functions
+        ))
+
+    def test_student_header_ignored(self):
+        response = self.get(self.student, HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-ID', response)
+        self.assertEqual(list_profiles(), [])
+
+    def test_old_profiles_evicted(self):
+        """Сверх PROFILE_MAX_FILES хранятся только новые профили"""
+        ids = []
+        for i in range(3):
+            ids.append(self.get(self.admin, HTTP_X_PROFILE='1', HTTP_X_REQUEST_ID=f'req-{i}')['X-Profile-ID'])
+            # Время изменения файла определяет порядок удаления
+            prof = os.path.join(self.directory.name, f'{ids[-1]}.prof')
+            os.utime(prof, (1000 + i, 1000 + i))
+
+        self.assertEqual(sorted(p['id'] for p in list_profiles()), sorted(ids[1:]))
@@ -0,0 +1,86 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.test import TestCase, override_settings
+from main.models import Attempt, Error, Metric, Task, User
+from main.rescoring import enqueue_rescore, run_job
+from main.scoring import grade_texts
+
+
+@override_settings(RESCORE_IN_BACKGROUND=False, RESCORE_CHUNK_SIZE=2, RESCORE_THROTTLE=0)
+class RescoreJobTests(TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.user = User.objects.create(
+            username='teacher', email='teacher@example.com', first_name='Иван', last_name='Петров', role='teacher'
+        )
+        self.task = Task.objects.create(
+            title='Диктант', content='Кот сидел на окне.', length=18,
+            min_words=1, max_words=10, min_sentences=1, max_sentences=2,
+            user=self.user, teacher=self.user,
+        )
+        self.attempts = []
+        for content in ('Кот сидел на окне.', 'Кот сидел на акне.', 'Кот спал на окне.'):
+            attempt = Attempt.objects.create(task=self.task, content=content, stage='submitted')
+            errors, values = grade_texts(self.task.content, content)
+            Error.objects.bulk_create([Error(attempt=attempt, **e) for e in errors])
+            Metric.objects.create(attempt=attempt, **values)
+            self.attempts.append(attempt)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_errors_and_metrics_replaced(self):
+        """После изменения текста ошибки и метрики пересчитываются по новому тексту"""
+        self.task.content = 'Кот спал на окне.'
+        self.task.save()
+        job = run_job(enqueue_rescore(self.task).id, executor=self.executor)
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.total, job.processed, job.failed), (3, 3, 0))
+        for attempt in self.attempts:
+            errors, values = grade_texts(self.task.content, attempt.content)
+            self.assertEqual(Error.objects.filter(attempt=attempt).count(), len(errors))
+            self.assertEqual(Metric.objects.get(attempt=attempt).accuracy, values['accuracy'])
+        self.assertEqual(Metric.objects.count(), 3)
+
+    def test_missing_metrics_created(self):
+        """Попытки без метрик получают их при перепроверке"""
+        Metric.objects.filter(attempt=self.attempts[0]).delete()
+        run_job(enqueue_rescore(self.task).id, executor=self.executor)
+        self.assertTrue(Metric.objects.filter(attempt=self.attempts[0]).exists())
+
+    def test_new_edit_supersedes_active_job(self):
+        """Новое изменение задания вытесняет незавершенную перепроверку"""
+        first = enqueue_rescore(self.task)
+        second = enqueue_rescore(self.task)
+
+        first = run_job(first.id, executor=self.executor)
+        self.assertEqual(first.status, 'superseded')
+        self.assertEqual(first.processed, 0)
+        self.assertEqual(run_job(second.id, executor=self.executor).status, 'completed')
+
+    @override_settings(RESCORE_CHUNK_SIZE=100, RESCORE_MAX_IN_FLIGHT=1)
+    def test_in_flight_limited(self):
+        """Перепроверка занимает в общем пуле не больше RESCORE_MAX_IN_FLIGHT задач"""
+        executor, lock = self.executor, threading.Lock()
+        in_flight = {'now': 0, 'max': 0}
+
+        def grade(*args):
+            with lock:
+                in_flight['now'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['now'])
+            try:
+                time.sleep(0.05)
+                return grade_texts(*args)
+            finally:
+                with lock:
+                    in_flight['now'] -= 1
+
+        class CountingExecutor:
+            def submit(self, fn, *args):
+                return executor.submit(grade, *args)
+
+        job = run_job(enqueue_rescore(self.task).id, executor=CountingExecutor())
+        self.assertEqual((job.status, job.processed), ('completed', 3))
+        self.assertEqual(in_flight['max'], 1)
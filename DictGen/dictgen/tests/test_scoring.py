@@ -0,0 +1,46 @@
+from django.test import SimpleTestCase
+from main.scoring import find_errors, tokenize, tokenize_with_offsets
+
+class TokenizeWithOffsetsTests(SimpleTestCase):
+    def test_offsets_point_into_original_text(self):
+        """Позиции токенов указывают в исходный текст, токены - в нижнем регистре"""
+        text = "Мама мыла раму, а Папа - нет!"
+        spans = tokenize_with_offsets(text)
+
+        self.assertEqual([t for t, _, _ in spans], tokenize(text.lower()))
+        for token, start, end in spans:
+            self.assertEqual(text[start:end].lower(), token)
+
+
+class ErrorPositionTests(SimpleTestCase):
+    def test_repeated_word_position(self):
+        """Ошибка во втором вхождении слова указывает на второе вхождение"""
+        task = "Кот сидел на окне. Кот спал на окне."
+        attempt = "Кот сидел на окне. Кот спал на акне."
+        errors = find_errors(task, attempt)
+
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(attempt[errors[0]['position_start']:errors[0]['position_end']], 'акне')
+        self.assertEqual(errors[0]['position_start'], attempt.rindex('акне'))
+
+    def test_extra_and_missing_positions(self):
+        """Лишние слова выделяются точно, пропуск - сразу после предыдущего токена"""
+        task = "Купил хлеб, молоко и яблоки."
+        attempt = "Купил Хлеб и яблоки и и."
+        errors = find_errors(task, attempt)
+
+        missing, extra = errors
+        self.assertEqual(missing['position_start'], attempt.index('Хлеб') + len('Хлеб'))
+        self.assertEqual(missing['position_start'], missing['position_end'])
+        self.assertEqual(attempt[extra['position_start']:extra['position_end']], 'и и')
+        self.assertEqual(extra['position_start'], attempt.index('и и.'))
+
+    def test_punctuation_span(self):
+        """Замена с соседним знаком препинания покрывает точный фрагмент текста"""
+        task = "Вчера шел дождь. Сегодня солнце."
+        attempt = "Вчера шел дощь, сегодня солнце."
+        errors = find_errors(task, attempt)
+
+        for error in errors:
+            self.assertLessEqual(error['position_end'], len(attempt))
+        self.assertEqual(attempt[errors[0]['position_start']:errors[0]['position_end']], 'дощь,')
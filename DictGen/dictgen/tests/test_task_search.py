@@ -0,0 +1,51 @@
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from main.models import Task, TaskTerm, Term, User
+
+
+class TaskSearchTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='test123', role='teacher'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='test123', role='student'
+        )
+        self.photosynthesis = self.task('Фотосинтез', 'Растения поглощают свет.', difficulty='hard')
+        self.cells = self.task('Клетка', 'Фотосинтез идет в хлоропластах клетки.', text_complexity='scientific')
+        self.history = self.task('Петр Первый', 'Реформы начала века.', is_public=False)
+        self.term = Term.objects.create(content='хлоропласт', subject='биология')
+        TaskTerm.objects.create(task=self.cells, term=self.term)
+
+    def task(self, title, content, **fields):
+        fields = {'difficulty': 'easy', 'text_complexity': 'narrative', 'is_public': True, **fields}
+        return Task.objects.create(
+            title=title, content=content, length=len(content),
+            min_words=1, max_words=10, min_sentences=1, max_sentences=2,
+            user=self.teacher, teacher=self.teacher, **fields,
+        )
+
+    def search(self, user, **params):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get('/api/tasks/', params, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def ids(self, user, **params):
+        return [task['id'] for task in self.search(user, **params).json()['results']]
+
+    def test_query_ranks_title_matches_first(self):
+        self.assertEqual(self.ids(self.teacher, q='фотосинтез'), [self.photosynthesis.id, self.cells.id])
+        # Все слова запроса должны встретиться в задании
+        self.assertEqual(self.ids(self.teacher, q='фотосинтез клетки'), [self.cells.id])
+
+    def test_filters(self):
+        self.assertEqual(self.ids(self.teacher, q='фотосинтез', difficulty='hard'), [self.photosynthesis.id])
+        self.assertEqual(
+            sorted(self.ids(self.teacher, text_complexity='scientific,narrative')),
+            [self.photosynthesis.id, self.cells.id, self.history.id],
+        )
+        self.assertEqual(self.ids(self.teacher, terms=str(self.term.id)), [self.cells.id])
+        self.assertEqual(self.search(self.teacher, terms='abc').status_code, 400)
+
+    def test_student_searches_visible_tasks_only(self):
+        self.assertEqual(self.ids(self.student, q='реформы'), [])
+        self.assertEqual(self.ids(self.teacher, q='реформы'), [self.history.id])
@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import time
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from main import telemetry
+from main.models import User
+
+
+class RenderTests(SimpleTestCase):
+    def test_histogram_is_cumulative(self):
+        """Корзины гистограммы накопительные, +Inf равна числу наблюдений"""
+        registry = telemetry.Registry()
+        for value in (0.002, 0.02, 100):
+            registry.observe('stage_duration_seconds', value, stage='scoring.align')
+        text = telemetry.render(registry.dump())
+
+        self.assertIn('# TYPE dictgen_stage_duration_seconds histogram', text)
+        self.assertIn('dictgen_stage_duration_seconds_bucket{stage="scoring.align",le="0.0025"} 1', text)
+        self.assertIn('dictgen_stage_duration_seconds_bucket{stage="scoring.align",le="60"} 2', text)
+        self.assertIn('dictgen_stage_duration_seconds_bucket{stage="scoring.align",le="+Inf"} 3', text)
+        self.assertIn('dictgen_stage_duration_seconds_count{stage="scoring.align"} 3', text)
+
+    def test_collect_sums_process_files(self):
+        """Метрики других процессов суммируются с метриками текущего"""
+        other = telemetry.Registry()
+        other.inc('generation_attempts_total', 2, backend='stub', outcome='passed')
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, '1.json'), 'w') as file:
+                json.dump(other.dump(), file)
+            telemetry.inc('generation_attempts_total', backend='stub', outcome='passed')
+            total = telemetry.collect(directory)
+
+        key = json.dumps(['generation_attempts_total', [['backend', 'stub'], ['outcome', 'passed']]])
+        self.assertGreaterEqual(total[key], 3)
+
+
+    def test_expired_process_files_removed(self):
+        """Файлы завершившихся процессов и давно не обновлявшиеся файлы удаляются и не учитываются"""
+        dead_pid = next(pid for pid in range(4_000_000, 4_100_000) if not telemetry._pid_alive(pid))
+        other = telemetry.Registry()
+        other.inc('generation_attempts_total', 5, backend='dead', outcome='passed')
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_FILE_TTL=60):
+            paths = [os.path.join(directory, name) for name in (f'{dead_pid}.json', '1.json')]
+            for path in paths:
+                with open(path, 'w') as file:
+                    json.dump(other.dump(), file)
+            os.utime(paths[1], (time.time() - 120, time.time() - 120))
+            total = telemetry.collect(directory)
+            self.assertEqual(os.listdir(directory), [])
+
+        key = json.dumps(['generation_attempts_total', [['backend', 'dead'], ['outcome', 'passed']]])
+        self.assertNotIn(key, total)
+
+    def test_flush_in_background(self):
+        """Запись метрики не пишет файл сама, его сбрасывает фоновый поток"""
+        registry = telemetry.Registry(flush_in_background=True)
+        self.addCleanup(registry.stop)
+        with tempfile.TemporaryDirectory() as directory, \
+                self.settings(METRICS_ENABLED=True, METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=0.05):
+            registry.inc('generation_attempts_total', backend='stub', outcome='passed')
+            path = os.path.join(directory, f'{os.getpid()}.json')
+            for _ in range(100):
+                if os.path.exists(path):
+                    break
+                time.sleep(0.02)
+            registry.stop()
+            with registry._flush_lock:  # Дожидаемся начатого сброса
+                pass
+            with open(path) as file:
+                self.assertEqual(json.load(file), registry.dump())
+
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='test123', role='teacher'
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    @override_settings(METRICS_PUBLIC=True)
+    def test_request_latency_and_queries_by_route(self):
+        """Запросы учитываются по шаблону маршрута вместе с числом SQL-запросов"""
+        self.client.get('/api/tasks/12345/', **self.auth)
+        text = self.client.get('/metrics').content.decode()
+
+        self.assertIn(
+            'dictgen_http_request_duration_seconds_count{method="GET",route="api/tasks/<int:id>/",status="404"}', text
+        )
+        line = next(l for l in text.splitlines() if l.startswith('dictgen_http_db_queries_sum{route="api/tasks/<int:id>/"}'))
+        self.assertGreater(float(line.split()[-1]), 0)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_hidden_without_token(self):
+        """Без METRICS_TOKEN эндпоинт закрыт, пока не включен METRICS_PUBLIC"""
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with self.settings(METRICS_PUBLIC=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
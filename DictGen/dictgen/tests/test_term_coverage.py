@@ -0,0 +1,69 @@
+from unittest.mock import patch
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from main.models import Task, TaskTerm, Term, User
+from main.term_coverage import covering_tasks
+
+
+class TermCoverageTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='test123', role='teacher'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='test123', role='student'
+        )
+        self.terms = [Term.objects.create(content=f'термин{i}', subject='физика') for i in range(5)]
+        t0, t1, t2, t3, t4 = self.terms
+        self.full = self.task('Все три', [t0, t1, t2, t3])     # Покрывает 3 из 3, один лишний
+        self.exact = self.task('Ровно три', [t0, t1, t2])      # Покрывает 3 из 3 без лишних
+        self.partial = self.task('Два', [t0, t1, t4])
+        self.private = self.task('Скрытое', [t0, t1, t2, t4], is_public=False)
+        self.task('Другое', [t4])
+
+    def task(self, title, terms, **fields):
+        task = Task.objects.create(
+            title=title, content=f'Текст: {title}.', length=10,
+            min_words=1, max_words=10, min_sentences=1, max_sentences=2,
+            user=self.teacher, teacher=self.teacher, **fields,
+        )
+        TaskTerm.objects.bulk_create([TaskTerm(task=task, term=term) for term in terms])
+        return task
+
+    def headers(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    def test_ranking(self):
+        ids = [t.id for t in self.terms[:3]]
+        ranked = list(covering_tasks(ids, Task.objects.filter(is_public=True)))
+        self.assertEqual([t.id for t in ranked], [self.exact.id, self.full.id, self.partial.id])
+        self.assertEqual([(t.matched, t.term_count) for t in ranked], [(3, 3), (3, 4), (2, 3)])
+        self.assertEqual(len(covering_tasks(ids, min_coverage=0.7)), 3)  # exact, full, private
+
+    def test_endpoint_respects_visibility(self):
+        ids = ','.join(str(t.id) for t in self.terms[:3])
+        response = self.client.get('/api/tasks/coverage/', {'terms': ids, 'min_coverage': 0.5}, **self.headers(self.student))
+        results = response.json()['results']
+        self.assertEqual([r['id'] for r in results], [self.exact.id, self.full.id, self.partial.id])
+        self.assertEqual(results[2]['coverage'], 0.667)
+        response = self.client.get('/api/tasks/coverage/', {'terms': 'x'}, **self.headers(self.student))
+        self.assertEqual(response.status_code, 400)
+
+    @patch('main.views.get_generator')
+    def test_generate_text_reuses_covering_task(self, get_generator):
+        get_generator.return_value.generate.return_value = 'Новый текст.'
+        terms = [t.id for t in self.terms[:3]]
+        response = self.client.post(
+            '/api/generate-text/', {'terms': terms, 'reuse': True}, content_type='application/json', **self.headers(self.teacher)
+        ).json()
+        self.assertEqual(response['text'], self.exact.content)
+        self.assertEqual(response['reused_task']['coverage'], 1.0)
+        get_generator.assert_not_called()
+
+        # Ни одно задание не покрывает все термины - текст генерируется
+        terms = [t.id for t in self.terms[2:]]
+        response = self.client.post(
+            '/api/generate-text/', {'terms': terms, 'reuse': True}, content_type='application/json', **self.headers(self.teacher)
+        ).json()
+        self.assertEqual(response['text'], 'Новый текст.')
+        self.assertNotIn('reused_task', response)
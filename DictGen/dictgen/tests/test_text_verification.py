@@ -0,0 +1,106 @@
+from django.test import SimpleTestCase
+from main.text_verification import StreamingVerifier, TermMatcher, has_loop, split_sentences
+
+def feed_words(verifier, text):
+    """Подает текст в верификатор по словам, как поток токенов"""
+    verdict = StreamingVerifier.CONTINUE
+    for i, word in enumerate(text.split(' ')):
+        verdict = verifier.feed(word if i == 0 else ' ' + word)
+        if verdict != StreamingVerifier.CONTINUE:
+            break
+    return verdict
+
+class StreamingVerifierTests(SimpleTestCase):
+    def test_stops_when_requirements_met(self):
+        """Генерация останавливается после третьего предложения со всеми терминами"""
+        verifier = StreamingVerifier(['энтропия', 'теплота'])
+        verdict = feed_words(
+            verifier,
+            "Энтропия растет. Теплота переходит к холодному телу. Это важно. Лишнее предложение. Еще одно."
+        )
+
+        self.assertEqual(verdict, StreamingVerifier.DONE)
+        self.assertEqual(verifier.sentence_count, 3)
+        self.assertEqual(verifier.result_text, "Энтропия растет. Теплота переходит к холодному телу. Это важно.")
+
+    def test_continues_until_terms_appear(self):
+        """Без всех терминов генерация продолжается до их появления"""
+        verifier = StreamingVerifier(['энтропия', 'теплота'])
+        verdict = feed_words(verifier, "Энтропия растет. Это важно. Так и есть. Теплота уходит. Конец.")
+
+        self.assertEqual(verdict, StreamingVerifier.DONE)
+        self.assertEqual(verifier.sentence_count, 4)
+
+    def test_aborts_after_max_sentences_without_terms(self):
+        """После шестого предложения без термина генерация прерывается"""
+        verifier = StreamingVerifier(['энтропия'])
+        verdict = feed_words(verifier, "Один. Два. Три. Четыре. Пять. Шесть. Семь.")
+
+        self.assertEqual(verdict, StreamingVerifier.ABORT)
+        self.assertEqual(verifier.wasted_tokens(accepted=False), verifier.tokens)
+
+    def test_aborts_on_repeated_sentence(self):
+        """Повтор длинного предложения подряд означает зацикливание модели"""
+        verifier = StreamingVerifier(['энтропия'])
+        verdict = feed_words(
+            verifier, "Энтропия растет в изолированной системе. Энтропия растет в изолированной системе. Дальше."
+        )
+
+        self.assertEqual(verdict, StreamingVerifier.ABORT)
+
+    def test_short_repeat_is_not_loop(self):
+        """Повтор короткого предложения допустим и принимается обеими проверками"""
+        text = "Итак. Энтропия растет. Итак. Теплота уходит."
+        verifier = StreamingVerifier(['энтропия', 'теплота'], min_sentences=4)
+        self.assertEqual(feed_words(verifier, text + " Дальше."), StreamingVerifier.DONE)
+        self.assertFalse(has_loop(split_sentences("Итак. Итак. Энтропия растет.")))
+        self.assertTrue(has_loop(split_sentences("Энтропия растет в этой системе. Энтропия растет в этой системе.")))
+
+    def test_finish_counts_last_sentence(self):
+        """Последнее предложение без пробела учитывается по окончании потока"""
+        verifier = StreamingVerifier(['энтропия'], stop_when_satisfied=False)
+        feed_words(verifier, "Энтропия растет. Это важно. Конец.")
+
+        self.assertEqual(verifier.sentence_count, 2)
+        self.assertEqual(verifier.finish(), StreamingVerifier.CONTINUE)
+        self.assertEqual(verifier.sentence_count, 3)
+        self.assertEqual(verifier.wasted_tokens(accepted=True), 0)
+
+    def test_waits_for_next_word_at_boundary(self):
+        """Конец предложения определяется только после начала следующего слова"""
+        verifier = StreamingVerifier(['энтропия'])
+        for chunk in ['Энтропия растет.', ' Это', ' важно, т.', ' е.', ' очень', ' важно!']:
+            verifier.feed(chunk)
+        self.assertEqual(verifier.sentence_count, 1)
+        self.assertEqual(verifier.finish(), StreamingVerifier.CONTINUE)
+        self.assertEqual(verifier.sentence_count, 2)
+
+    def test_inflected_terms_satisfy_stream(self):
+        verifier = StreamingVerifier(['энтропия', 'второе начало термодинамики'])
+        verdict = feed_words(
+            verifier,
+            "Рост энтропии неизбежен. Об этом говорит закон. Это следствие второго начала термодинамики. Дальше."
+        )
+        self.assertEqual(verdict, StreamingVerifier.DONE)
+
+
+class SentenceAndTermTests(SimpleTestCase):
+    def test_split_sentences(self):
+        text = (
+            "Теорему доказал А. Н. Колмогоров в 1933 г. Он ввел аксиомы, т. е. основные правила. "
+            "Число 3.14 - приближение π! Почему? «Эврика!» - воскликнул Архимед... и побежал домой"
+        )
+        self.assertEqual(split_sentences(text), [
+            "Теорему доказал А. Н. Колмогоров в 1933 г.",
+            "Он ввел аксиомы, т. е. основные правила.",
+            "Число 3.14 - приближение π!",
+            "Почему?",
+            "«Эврика!» - воскликнул Архимед... и побежал домой",
+        ])
+
+    def test_term_matcher(self):
+        matcher = TermMatcher(['энтропия', 'идеальный газ', 'КПД', 'закон Бойля-Мариотта'])
+        text = "В идеальном газе по закону Бойля-Мариотта давление растет, а энтропию считают отдельно."
+        self.assertEqual(matcher.missing(text), ['КПД'])
+        # Слова многословного термина должны идти подряд
+        self.assertEqual(matcher.found("Газ был идеальный.", ['идеальный газ']), [])